@@ -0,0 +1,132 @@
+""" File:  benchmarkPreprocessing.py
+    Description:  Throughput benchmark of the preprocessing scripts on synthetic raw chat data .csv files
+    (see syntheticChats.py) of each size in CHAT_COUNTS, so a change to the preprocessing can be checked to
+    help rather than hurt without the real transcripts.
+
+    Each size is timed through the stages of STAGES, each run in a fresh Python process so its peak resident
+    set size (RSS) is its own:
+    1) "read":  rawChatReader.readChatRecords,
+    2) "split dialogs":  1) and processChatCSV_wholeChats.generateTranscriptDialogs,
+    3) "clean and tag chats":  2) and processChatCSV_wholeChats.cleanChatBatch on every chat,
+    4) "clean questions":  1), processChatCSV_onlyQuestions.generateTranscriptDialogs and cleanQuestionBatch,
+    and end to end by the main() of each of the scripts processChatCSV_wholeChats.py,
+    processChatCSV_onlyQuestions.py and processChatCSV_allCorpora.py, which also write the output files.
+    Each stage includes the stages it reads its chats through, as the scripts stream the chats through them.
+
+    Every run starts with a cold lemma cache and, unless WITH_CHAT_CACHE, without the chat cache, in its own
+    directory under BENCHMARK_DIRECTORY where the synthetic .csv files and the output files are kept.  The
+    peak RSS includes the interpreter, nltk and the tagger, which are reported on their own as "imports", and
+    the pages of the memory-mapped .csv file that were read.
+    Stages that tag every chat take an hour or more per million chats, so shorten CHAT_COUNTS or STAGES for
+    a quick comparison.
+
+    Run it from this directory:  python benchmarkPreprocessing.py
+    It prints the chats/sec and peak RSS of every stage and size and saves them to BENCHMARK_RESULTS_FILE_NAME.
+    The resource module it reads the peak RSS with is only on Unix-like systems.
+"""
+
+import contextlib
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+from timeit import default_timer as timer
+
+import chatStreams
+import rawChatReader
+import syntheticChats
+import processChatCSV_wholeChats as wholeChats
+import processChatCSV_onlyQuestions as onlyQuestions
+import processChatCSV_allCorpora as allCorpora
+
+# "constants"
+CHAT_COUNTS = [1000, 10000, 100000, 1000000]
+RANDOM_SEED = syntheticChats.RANDOM_SEED
+BENCHMARK_DIRECTORY = "benchmark"
+BENCHMARK_RESULTS_FILE_NAME = os.path.join(BENCHMARK_DIRECTORY, "benchmark_results.csv")
+WITH_CHAT_CACHE = False  # True times the scripts with a cold chat cache, i.e., also writing every chat to it
+
+STAGES = ["imports", "read", "split dialogs", "clean and tag chats", "clean questions",
+          "processChatCSV_wholeChats", "processChatCSV_onlyQuestions", "processChatCSV_allCorpora"]
+
+
+def peakRssMegabytes():
+    """ Returns the peak resident set size of this process so far in MB. """
+    peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # bytes on macOS, kilobytes on Linux
+        return peakRss / 2**20
+    return peakRss / 2**10
+
+def runStage(stage, csvFileName, runDirectory):
+    """ Runs stage on the chats of csvFileName in this (fresh) process, with runDirectory as the working
+        directory, and returns [seconds, peak RSS in MB].  What the stage prints is discarded. """
+    wholeChats.getTagger()
+
+    csvFileName = os.path.abspath(csvFileName)
+    os.makedirs(runDirectory, exist_ok=True)
+    os.chdir(runDirectory)  # the output files, lemma cache and chat cache of the scripts are written here
+    if not WITH_CHAT_CACHE:
+        wholeChats.chatCache = None
+    for module in [wholeChats, onlyQuestions, allCorpora]:
+        module.INPUT_CSV_FILE_NAME = csvFileName
+
+    with open(os.devnull, "w") as devNull, contextlib.redirect_stdout(devNull):
+        start = timer()
+        runStageChats(stage, csvFileName)
+        seconds = timer() - start
+    return [seconds, peakRssMegabytes()]
+
+def runStageChats(stage, csvFileName):
+    """ Streams the chats of csvFileName through stage. """
+    if stage == "read":
+        for chatRecord in rawChatReader.readChatRecords(csvFileName):
+            pass
+    elif stage == "split dialogs":
+        for transcriptDialog in wholeChats.generateTranscriptDialogs(rawChatReader.readChatRecords(csvFileName)):
+            pass
+    elif stage == "clean and tag chats":
+        transcriptDialogs = wholeChats.generateTranscriptDialogs(rawChatReader.readChatRecords(csvFileName))
+        chatsToClean = (transcriptDialog for transcriptDialog in transcriptDialogs if transcriptDialog[1] is not None)
+        for batch in chatStreams.chunked(chatsToClean, wholeChats.CHATS_PER_BATCH):
+            wholeChats.cleanChatBatch(batch)
+    elif stage == "clean questions":
+        transcriptDialogs = onlyQuestions.generateTranscriptDialogs(rawChatReader.readChatRecords(csvFileName))
+        questionList = (transcriptDialog for transcriptDialog in transcriptDialogs if transcriptDialog[1] is not None)
+        for batch in chatStreams.chunked(questionList, onlyQuestions.QUESTIONS_PER_BATCH):
+            onlyQuestions.cleanQuestionBatch(batch)
+    elif stage != "imports":
+        sys.modules[stage].main()
+
+def timeStage(stage, csvFileName, runDirectory):
+    """ Returns runStage's [seconds, peak RSS in MB] for stage, run in a new process. """
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(runStage, (stage, csvFileName, runDirectory))
+
+def main():
+    os.makedirs(BENCHMARK_DIRECTORY, exist_ok=True)
+    resultsFile = open(BENCHMARK_RESULTS_FILE_NAME, "w")
+    resultsFile.write("chats,stage,seconds,chats per second,peak RSS MB\n")
+    for chatCount in CHAT_COUNTS:
+        csvFileName = os.path.join(BENCHMARK_DIRECTORY, "synthetic_chats_%d_%d.csv" % (chatCount, RANDOM_SEED))
+        if not os.path.exists(csvFileName):
+            syntheticChats.writeSyntheticChats(csvFileName, chatCount, RANDOM_SEED)
+        print("\n%d chats, %.1f MB in %s" % (chatCount, os.path.getsize(csvFileName) / 2**20, csvFileName))
+        print("  %-30s %10s %12s %14s" % ("stage", "seconds", "chats/sec", "peak RSS MB"))
+        for stage in STAGES:
+            runDirectory = os.path.join(BENCHMARK_DIRECTORY, "run_%d" % chatCount)
+            seconds, peakRss = timeStage(stage, csvFileName, runDirectory)
+            if stage == "imports":
+                print("  %-30s %10s %12s %14.1f" % (stage, "", "", peakRss))
+                resultsFile.write("%d,%s,,,%.1f\n" % (chatCount, stage, peakRss))
+            else:
+                chatsPerSecond = chatCount / max(seconds, 1e-9)
+                print("  %-30s %10.2f %12.0f %14.1f" % (stage, seconds, chatsPerSecond, peakRss))
+                resultsFile.write("%d,%s,%.3f,%.1f,%.1f\n" % (chatCount, stage, seconds, chatsPerSecond, peakRss))
+            resultsFile.flush()
+            shutil.rmtree(runDirectory)  # so the next stage starts with cold caches too
+    resultsFile.close()
+    print("\nResults saved to", BENCHMARK_RESULTS_FILE_NAME)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+""" File:  benchmarkRemoveTags.py
+    Description:  Benchmark checking that the linear-time removeTags of tagStripping.py (used by the
+    preprocessing scripts) gives exactly the same result as the original quadratic removeTags (kept below
+    as removeTagsOriginal), and timing both on pathological messages with thousands of tags:
+    1) pasted links, i.e., many closed <a href=...>...</a> spans,
+    2) unclosed <span ...> tags,
+    3) unclosed tags that all have different names,
+    4) deeply nested <span ...> tags, and
+    5) '<' characters that never start a tag.
+    Randomly generated short strings full of '<', '</', '>' and spaces are compared too.
+
+    Run it from this directory:  python benchmarkRemoveTags.py
+    It prints the time taken by both versions on each input and any mismatch, and exits with status 1 on a
+    mismatch.
+"""
+
+import random
+import sys
+from timeit import default_timer as timer
+
+from tagStripping import removeTags
+
+TAG_COUNTS = [1000, 4000, 16000]
+NUMBER_OF_RANDOM_STRINGS = 20000
+RANDOM_SEED = 7
+
+# pieces the random strings are built from
+PIECES = ["<", "</", ">", " ", "a", "b", "span", "/", "x", "<a ", "</a>", "<span ", "</span>", "< ", "</>"]
+
+
+def removeTagsOriginal(fileStr):
+    """ The original removeTags of the preprocessing scripts. """
+    current = 0
+    while True:
+        #print("Next char:",fileStr[current])
+        openAngleBracketIndex = fileStr.find('<',current)
+        if openAngleBracketIndex == -1:
+            break
+        spaceIndex = fileStr.find(' ', openAngleBracketIndex+1)
+        if spaceIndex == -1:
+            break
+        else:
+            current = spaceIndex
+        endStr = "</"+fileStr[openAngleBracketIndex+1:spaceIndex]+'>'
+
+        endIndex = fileStr.find(endStr, spaceIndex)
+        if endIndex == -1:
+            current = spaceIndex
+        else:
+            endIndex = endIndex+len(endStr)
+
+            #print(openAngleBracketIndex, endStr, endIndex+len(endStr))
+            fileStr = fileStr[:openAngleBracketIndex]+ \
+                      fileStr[endIndex:]
+            #print(fileStr)
+            current = openAngleBracketIndex
+    return fileStr
+
+def pathologicalMessages(tagCount):
+    """ Returns a list of [description, message] pairs, each message with tagCount tags. """
+    return [["pasted links", "see " + "<a href=\"https://example.com/x\">link</a> and " * tagCount],
+            ["unclosed spans", "<span style=\"color:red\"> word " * tagCount],
+            ["unclosed distinct tags", "".join("<tag%d x> word " % i for i in range(tagCount))],
+            ["nested spans", "<span class=\"a\">" * tagCount + "text" + "</span>" * tagCount],
+            ["'<' without a tag", "1 < 2 and " * tagCount + "</a>"]]
+
+def randomStrings(count, seed):
+    """ Returns a list of count random strings built from PIECES. """
+    rand = random.Random(seed)
+    return ["".join(rand.choice(PIECES) for piece in range(rand.randint(0, 20))) for i in range(count)]
+
+def main():
+    mismatchCount = 0
+    for fileStr in randomStrings(NUMBER_OF_RANDOM_STRINGS, RANDOM_SEED):
+        if removeTags(fileStr) != removeTagsOriginal(fileStr):
+            mismatchCount += 1
+            if mismatchCount <= 3:
+                print("MISMATCH for:", repr(fileStr))
+    print("%d random strings compared, %d mismatches" % (NUMBER_OF_RANDOM_STRINGS, mismatchCount))
+
+    print("\n%-25s %8s %12s %12s %9s" % ("message", "tags", "original s", "linear s", "speed-up"))
+    for tagCount in TAG_COUNTS:
+        for description, message in pathologicalMessages(tagCount):
+            start = timer()
+            expected = removeTagsOriginal(message)
+            originalTime = timer() - start
+            start = timer()
+            result = removeTags(message)
+            linearTime = timer() - start
+            if result != expected:
+                mismatchCount += 1
+                print("MISMATCH for the", description, "message with", tagCount, "tags")
+            print("%-25s %8d %12.4f %12.4f %8.1fx"
+                  % (description, tagCount, originalTime, linearTime, originalTime / max(linearTime, 1e-9)))
+
+    if mismatchCount > 0:
+        print("\nFAILED:", mismatchCount, "mismatches")
+        sys.exit(1)
+    print("\nAll results identical")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+""" File:  binaryCorpus.py
+    Description:  A compact binary copy of a preprocessed corpus, e.g., wholeChatsFile.csv, written by the
+    preprocessing scripts next to the .csv and .txt files so the topic modeling scripts can memory-map it
+    instead of splitting every line of text and building their own vocabulary;  corpusLoader.py in the top
+    directory of the repository loads their corpus from it when it is up to date.  A corpus <name> is stored
+    in four files:
+    1) <name>_vocab.txt with one word per line, the word of token id i on line i (counting from 0),
+    2) <name>_token_ids.int32 with the token ids of every document one after the other,
+    3) <name>_doc_offsets.int64 with the index in the token ids of the start of each document and then the
+       total number of token ids, so document d is token ids [offset d, offset d+1), and
+    4) <name>_csv_line_index.int32 with the chat line # in the original .csv file of each document.
+    The numbers are little-endian.  Document d is line d of <name>.csv, including documents left without
+    words, and its tokens are the words of that line split on white space, in the same order.
+
+    The files are appended to, so the chats added by an incremental run of a preprocessing script are
+    appended to the binary corpus too.  When such a run rewrites lines of the .csv file of chats that changed,
+    writeCsvCorpus writes the binary corpus again from the .csv file.  loadBinaryCorpus memory-maps the three arrays with
+    numpy, so loading does not copy or parse them.
+"""
+
+import os
+import sys
+from array import array
+
+VOCABULARY_SUFFIX = "_vocab.txt"
+TOKEN_IDS_SUFFIX = "_token_ids.int32"
+DOC_OFFSETS_SUFFIX = "_doc_offsets.int64"
+CSV_LINE_INDEX_SUFFIX = "_csv_line_index.int32"
+
+BUFFERED_TOKEN_IDS = 1 << 16  # token ids held in memory before they are written out
+
+
+def corpusName(csvFileName):
+    """ Returns the name of the binary corpus of the corpus .csv file csvFileName, e.g., "wholeChatsFile". """
+    return os.path.splitext(csvFileName)[0]
+
+def corpusFileNames(name):
+    """ Returns the names of the four files of the binary corpus name. """
+    return [name + VOCABULARY_SUFFIX, name + TOKEN_IDS_SUFFIX, name + DOC_OFFSETS_SUFFIX,
+            name + CSV_LINE_INDEX_SUFFIX]
+
+def writeArray(arrayFile, values):
+    """ Writes the array values to arrayFile little-endian. """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(arrayFile)
+
+class BinaryCorpusWriter:
+
+    def __init__(self, name, appendToFiles=False):
+        """ Starts writing the binary corpus name, adding to its files if appendToFiles. """
+        vocabularyFileName, tokenIdsFileName, docOffsetsFileName, csvLineIndexFileName = corpusFileNames(name)
+        self.wordIds = {}
+        self.tokenCount = 0  # token ids already written out
+        if appendToFiles:
+            vocabularyFile = open(vocabularyFileName, "r", encoding="utf-8")
+            for word in vocabularyFile:
+                self.wordIds[word.rstrip("\n")] = len(self.wordIds)
+            vocabularyFile.close()
+            self.tokenCount = os.path.getsize(tokenIdsFileName) // 4
+        fileMode = "ab" if appendToFiles else "wb"
+        self.vocabularyFile = open(vocabularyFileName, fileMode)
+        self.tokenIdsFile = open(tokenIdsFileName, fileMode)
+        self.docOffsetsFile = open(docOffsetsFileName, fileMode)
+        self.csvLineIndexFile = open(csvLineIndexFileName, fileMode)
+
+        self.newWords = []
+        self.tokenIds = array("i")
+        self.docOffsets = array("q")
+        self.csvLineIndex = array("i")
+        if not appendToFiles:
+            self.docOffsets.append(0)
+
+    def addDocument(self, csvLineIndex, text):
+        """ Adds the words of text, the cleaned text of chat line # csvLineIndex, as the next document. """
+        wordIds = self.wordIds
+        for word in text.split():
+            wordId = wordIds.get(word)
+            if wordId is None:
+                wordId = wordIds[word] = len(wordIds)
+                self.newWords.append(word)
+            self.tokenIds.append(wordId)
+        self.docOffsets.append(self.tokenCount + len(self.tokenIds))
+        self.csvLineIndex.append(csvLineIndex)
+        if len(self.tokenIds) >= BUFFERED_TOKEN_IDS:
+            self.flush()
+
+    def flush(self):
+        """ Writes out the buffered words, token ids, offsets and line #s. """
+        self.vocabularyFile.write("".join(word + "\n" for word in self.newWords).encode("utf-8"))
+        writeArray(self.tokenIdsFile, self.tokenIds)
+        writeArray(self.docOffsetsFile, self.docOffsets)
+        writeArray(self.csvLineIndexFile, self.csvLineIndex)
+        self.tokenCount += len(self.tokenIds)
+        self.newWords = []
+        self.tokenIds = array("i")
+        self.docOffsets = array("q")
+        self.csvLineIndex = array("i")
+
+    def close(self):
+        self.flush()
+        for corpusFile in [self.vocabularyFile, self.tokenIdsFile, self.docOffsetsFile, self.csvLineIndexFile]:
+            corpusFile.close()
+
+def writeCsvCorpus(name, csvFileName):
+    """ Writes the binary corpus name of the corpus .csv file csvFileName, whose lines are the chat line #,
+        a comma and the cleaned text of a chat. """
+    corpusWriter = BinaryCorpusWriter(name)
+    csvFile = open(csvFileName, "r")
+    for line in csvFile:
+        csvLineIndex, text = line.rstrip("\n").split(",", 1)
+        corpusWriter.addDocument(int(csvLineIndex), text)
+    csvFile.close()
+    corpusWriter.close()
+
+def loadBinaryCorpus(name):
+    """ Returns [vocabulary, tokenIds, docOffsets, csvLineIndex] of the binary corpus name:  the list of
+        words by token id and numpy arrays memory-mapping the other three files. """
+    import numpy as np  # only needed by the scripts reading the corpus
+
+    vocabularyFileName, tokenIdsFileName, docOffsetsFileName, csvLineIndexFileName = corpusFileNames(name)
+    vocabularyFile = open(vocabularyFileName, "r", encoding="utf-8")
+    vocabulary = [word.rstrip("\n") for word in vocabularyFile]
+    vocabularyFile.close()
+
+    arrays = []
+    for fileName, dtype in [[tokenIdsFileName, "<i4"], [docOffsetsFileName, "<i8"], [csvLineIndexFileName, "<i4"]]:
+        if os.path.getsize(fileName) == 0:  # an empty file cannot be memory-mapped
+            arrays.append(np.zeros(0, dtype=dtype))
+        else:
+            arrays.append(np.memmap(fileName, dtype=dtype, mode="r"))
+    return [vocabulary] + arrays
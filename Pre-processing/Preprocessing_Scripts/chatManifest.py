@@ -0,0 +1,99 @@
+""" File:  chatManifest.py
+    Description:  The manifest of the chats already written to the output files of a preprocessing script,
+    used to preprocess only the chats newly appended to the raw chat data .csv file.
+
+    Each chat is identified by its excel index (the transIndex of the line the chat starts on in the .csv
+    file), which starts its line of the output .csv file, and its content by a hash of its Timestamp,
+    initial question and dialog.  The manifest file has one "excel index,Timestamp,content hash" line per
+    chat, in the order the chats were written, so it has as many lines as the output files with a line per
+    chat.  A chat whose content changed, e.g., edited in place or moved by reordering the lines of the .csv
+    file, is processed again and appended like a new chat, and rewriteChangedChats then moves its new lines
+    to where its old lines were, so the output files have one line per chat as after processing all chats.
+"""
+
+import hashlib
+import os
+
+READ_CHUNK_BYTES = 1 << 20  # bytes read at a time when counting lines
+
+
+def chatKey(transcriptDialog):
+    """ Returns the manifest line identifying the chat of the transcriptDialogList item transcriptDialog,
+        [excel index, initial question, dialog list, Timestamp], and its content, without the newline. """
+    transIndex, initialQuestion, dialogList, timeStamp = transcriptDialog
+    content = "\0".join([timeStamp, str(initialQuestion)] + dialogList)
+    return str(transIndex) + "," + timeStamp + "," + hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def chatId(key):
+    """ Returns the excel index, as a string, of the chat of the manifest line key. """
+    return key.split(",", 1)[0]
+
+def readManifest(fileName):
+    """ Returns a dict from the excel index of each chat in the manifest fileName to its manifest line. """
+    manifestFile = open(fileName, "r")
+    chatKeys = {}
+    for line in manifestFile:
+        key = line.rstrip("\n")
+        chatKeys[chatId(key)] = key
+    manifestFile.close()
+    return chatKeys
+
+def generateUnprocessedChats(transcriptDialogs, processedChats, changedChatIds):
+    """ Generator that yields the transcriptDialogList items of transcriptDialogs that are not in
+        processedChats, the readManifest of the output files, with the same content, i.e., the new chats and
+        the chats whose content changed.  The excel index of each chat whose content changed is added to the
+        set changedChatIds. """
+    for transcriptDialog in transcriptDialogs:
+        key = chatKey(transcriptDialog)
+        processedKey = processedChats.get(chatId(key))
+        if processedKey != key:
+            if processedKey is not None:
+                changedChatIds.add(chatId(key))
+            yield transcriptDialog
+
+def countLines(fileName):
+    """ Returns the number of lines of fileName. """
+    lineCount = 0
+    countedFile = open(fileName, "rb")
+    for chunk in iter(lambda: countedFile.read(READ_CHUNK_BYTES), b""):
+        lineCount += chunk.count(b"\n")
+    countedFile.close()
+    return lineCount
+
+def canAppend(manifestFileName, outputFileNames, chatLineFileNames):
+    """ Returns True if the manifest and all the output files it lists chats of exist and the manifest lists
+        as many chats as each of chatLineFileNames, the output files with one line per chat, has lines, so new
+        chats can be appended to the output files.  The counts differ, e.g., once another script has
+        rewritten the output files without this manifest. """
+    if not all(os.path.exists(fileName) for fileName in [manifestFileName] + outputFileNames + chatLineFileNames):
+        return False
+    chatCount = countLines(manifestFileName)
+    return all(countLines(fileName) == chatCount for fileName in chatLineFileNames)
+
+def rewriteChangedChats(manifestFileName, chatLineFileNames, changedChatIds):
+    """ Rewrites the manifest and the output files chatLineFileNames, with one line per chat, after new
+        lines of the chats with excel index in changedChatIds were appended to them:  the last lines of each
+        such chat replace its first (old) lines and its other lines are removed.  A changed chat with only
+        its old lines, i.e., not written again, is removed. """
+    fileNames = [manifestFileName] + chatLineFileNames
+    fileLines = []
+    for fileName in fileNames:
+        lineFile = open(fileName, "r")
+        fileLines.append(lineFile.readlines())
+        lineFile.close()
+    chatIds = [chatId(key) for key in fileLines[0]]
+    lastLineIndexes = {}
+    for lineIndex, lineChatId in enumerate(chatIds):
+        if lineChatId in changedChatIds:
+            lastLineIndexes[lineChatId] = lineIndex
+    keptLineIndexes = []
+    for lineIndex, lineChatId in enumerate(chatIds):
+        if lineChatId not in changedChatIds:
+            keptLineIndexes.append(lineIndex)
+        elif lineChatId in lastLineIndexes and lastLineIndexes[lineChatId] != lineIndex:
+            keptLineIndexes.append(lastLineIndexes[lineChatId])  # the new lines in place of the old
+            del lastLineIndexes[lineChatId]
+    for fileName, lines in zip(fileNames, fileLines):
+        lineFile = open(fileName, "w")
+        lineFile.writelines(lines[lineIndex] for lineIndex in keptLineIndexes)
+        lineFile.close()
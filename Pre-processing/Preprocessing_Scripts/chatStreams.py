@@ -0,0 +1,136 @@
+""" File:  chatStreams.py
+    Description:  Helpers shared by the preprocessing scripts for streaming chats through the
+    read -> split dialog -> clean -> write stages one chat at a time.  Each stage is a generator,
+    so memory use does not grow with the size of the raw chat export and the first cleaned chats
+    are written as soon as they are ready.
+
+    pipelinedBatchMap runs the stages at the same time instead of in turn:  the chats are read in a thread
+    of their own, cleaned by worker processes and written in another thread, with bounded queues between
+    the stages so memory use stays flat.  Reading from a slow network share then does not hold up the
+    writing, nor the other way round.
+"""
+
+import itertools
+import queue
+import threading
+from collections import deque
+
+QUEUE_POLL_SECONDS = 0.1  # how often a stage waiting on a full queue checks whether the next stage stopped
+
+
+def chunked(items, chunkSize):
+    """ Generator that yields lists of up to chunkSize consecutive items from the iterable items. """
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, chunkSize))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+def orderedParallelBatchMap(pool, batchFunction, items, batchSize, maxPendingBatches):
+    """ Generator yielding batchFunction(batch) for each list of batchSize consecutive items of the
+        iterable items, in the original order, with the calls spread over the worker processes of pool.
+
+        Unlike pool.imap, which reads all of items ahead of the workers, at most maxPendingBatches
+        batches are handed to the pool at a time, so items can be a generator over an arbitrarily
+        large chat export.  A couple of batches per worker process keeps every worker busy.
+    """
+    pendingBatches = deque()
+    for batch in chunked(items, batchSize):
+        pendingBatches.append(pool.apply_async(batchFunction, (batch,)))
+        if len(pendingBatches) >= maxPendingBatches:
+            yield pendingBatches.popleft().get()
+    while len(pendingBatches) > 0:
+        yield pendingBatches.popleft().get()
+
+def pipelinedBatchMap(pool, batchFunction, items, batchSize, maxPendingBatches, consumer, maxQueuedBatches):
+    """ Returns consumer(results) where results are the orderedParallelBatchMap results of batchFunction
+        over items, with the three stages overlapped:  items is iterated in a thread of its own (see
+        readAhead), this thread hands the batches to the worker processes of pool and consumer, e.g., the
+        function writing the cleaned chats, runs in another thread (see consumeInThread).  Up to
+        maxQueuedBatches batches wait between reading and cleaning and between cleaning and consumer.
+    """
+    items = readAhead(items, batchSize, maxQueuedBatches)
+    results = orderedParallelBatchMap(pool, batchFunction, items, batchSize, maxPendingBatches)
+    return consumeInThread(consumer, results, maxQueuedBatches)
+
+def readAhead(items, chunkSize, maxQueuedChunks):
+    """ Generator yielding the items of the iterable items, which is iterated in a thread of its own up to
+        maxQueuedChunks lists of chunkSize items ahead, so reading the items overlaps what is done with
+        them.  An exception raised by items is raised here. """
+    chunkQueue = queue.Queue(maxQueuedChunks)
+    stopped = threading.Event()  # set when the items are no longer wanted
+
+    def readChunks():
+        try:
+            for chunk in chunked(items, chunkSize):
+                if not putUnlessStopped(chunkQueue, chunk, stopped):
+                    return
+        except BaseException as error:
+            putUnlessStopped(chunkQueue, error, stopped)
+        else:
+            putUnlessStopped(chunkQueue, None, stopped)
+
+    reader = threading.Thread(target=readChunks, name="read stage", daemon=True)
+    reader.start()
+    try:
+        for chunk in queuedItems(chunkQueue):
+            yield from chunk
+    finally:
+        stopped.set()
+        reader.join()
+
+def consumeInThread(consumer, items, maxQueuedItems):
+    """ Returns consumer(iterator) run in a thread of its own on an iterator over the items of the iterable
+        items, which this thread puts on a queue of up to maxQueuedItems items as fast as consumer takes
+        them.  An exception raised by consumer is raised here, and one raised by items is raised in
+        consumer too so it stops. """
+    itemQueue = queue.Queue(maxQueuedItems)
+    stopped = threading.Event()  # set when consumer has returned or raised
+    outcome = []
+
+    def consume():
+        try:
+            outcome.append(consumer(queuedItems(itemQueue)))
+        except BaseException as error:
+            outcome.append(error)
+        finally:
+            stopped.set()
+
+    consumerThread = threading.Thread(target=consume, name="write stage", daemon=True)
+    consumerThread.start()
+    try:
+        for item in items:
+            if not putUnlessStopped(itemQueue, item, stopped):
+                break
+        putUnlessStopped(itemQueue, None, stopped)
+    except BaseException as error:
+        putUnlessStopped(itemQueue, error, stopped)
+        raise
+    finally:
+        consumerThread.join()
+    if isinstance(outcome[0], BaseException):
+        raise outcome[0]
+    return outcome[0]
+
+def queuedItems(itemQueue):
+    """ Generator yielding the items put on itemQueue by another thread up to None, which ends them, raising
+        an exception put on it instead of an item. """
+    while True:
+        item = itemQueue.get()
+        if item is None:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def putUnlessStopped(itemQueue, item, stopped):
+    """ Puts item on itemQueue, waiting while it is full, and returns True, or returns False without putting
+        it once stopped is set. """
+    while not stopped.is_set():
+        try:
+            itemQueue.put(item, timeout=QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
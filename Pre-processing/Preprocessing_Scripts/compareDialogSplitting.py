@@ -0,0 +1,120 @@
+""" File:  compareDialogSplitting.py
+    Description:  Test harness checking that the regular expression based generateTranscriptDialogList
+    of each preprocessing script splits transcripts into exactly the same dialogList as the original
+    character-by-character scan (kept below as generateTranscriptDialogListCharScan), and timing both.
+
+    The transcripts compared are:
+    1) the real chats of INPUT_CSV_FILE_NAME, if the raw chat data .csv file is in this directory, and
+    2) synthetic transcripts with time-stamps, near-miss time-stamps, overlapping time-stamps, non-ASCII
+       digits and time-stamps at the very start and end of the transcript.
+
+    Run it from this directory:  python compareDialogSplitting.py
+    It prints the number of transcripts compared and any mismatch, and exits with status 1 on a mismatch.
+"""
+
+import os
+import random
+import sys
+from timeit import default_timer as timer
+
+import rawChatReader
+import processChatCSV_wholeChats
+import processChatCSV_wholeChats_POS_N_ADJ
+import processChatCSV_wholeChats_POS_N_ADJ_V
+import processChatCSV_onlyQuestions
+
+INPUT_CSV_FILE_NAME = processChatCSV_wholeChats.INPUT_CSV_FILE_NAME
+NUMBER_OF_SYNTHETIC_TRANSCRIPTS = 20000
+RANDOM_SEED = 7
+
+SCRIPT_MODULES = [processChatCSV_wholeChats, processChatCSV_wholeChats_POS_N_ADJ,
+                  processChatCSV_wholeChats_POS_N_ADJ_V, processChatCSV_onlyQuestions]
+
+# pieces the synthetic transcripts are built from
+WORDS = ["library", "article", "interlibrary", "loan", "hours", "Hi,", "help", "you?", "https://example.com/a:b",
+         "3:45", "10:30am", "1:23:45", "12:3:45", "12:34:5", "12:34:56:78:90", "ab:cd:ef", "12:ab:34",
+         "\u00b9\u00b2:\u00b3\u2074:\u2075\u2076", "\u2460\u2461:\u2462\u2463:\u2464\u2465", "\u0661\u0662:\u0663\u0664:\u0665\u0666",
+         "caf\u00e9", "<a href=\"x\">link</a>", "&#x27;", ":", "::", "1:", "::12"]
+NAMES = ["Jordan", "Patron", "Librarian", "Alex Smith"]
+
+
+def generateTranscriptDialogListCharScan(trans):
+    """ The original character-by-character version of generateTranscriptDialogList. """
+    transStr = " ".join(trans)  # merge transcript back to a single string
+
+    #split by time-stamps to get a dialogList
+    transTimeIndexList = []
+    for index in range(2,len(transStr)-6):
+        if transStr[index] == ":" and transStr[index+3] == ":" and transStr[index+1:index+3].isdigit() and transStr[index+4:index+6].isdigit():
+            transTimeIndexList.append(index-2)
+    dialogList = []
+    for i in range(len(transTimeIndexList)-1):
+        dialogList.append(transStr[transTimeIndexList[i]:transTimeIndexList[i+1]])
+    if len(transTimeIndexList) == 0:
+        dialogList.append(transStr)
+    else:
+        dialogList.append(transStr[transTimeIndexList[-1]:])
+
+    return dialogList
+
+def generateSyntheticTranscripts(count, seed):
+    """ Returns a list of count synthetic transcripts, each a list of lines like rawChatReader.transcriptLines
+        returns. """
+    rand = random.Random(seed)
+    transcripts = []
+    for i in range(count):
+        lines = ["%d/%d/2019 %d:%02d,%d,,%d,\"" % (rand.randint(1, 12), rand.randint(1, 28), rand.randint(0, 23),
+                                                  rand.randint(0, 59), rand.randint(0, 900), rand.randint(0, 9))]
+        for turn in range(rand.randint(0, 8)):
+            message = " ".join(rand.choice(WORDS) for word in range(rand.randint(0, 10)))
+            lines.append("%02d:%02d:%02d - %s: %s" % (rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59),
+                                                      rand.choice(NAMES), message))
+        if rand.random() < 0.2:  # time-stamp at the very end or glued to the front of the transcript
+            lines.append("%02d:%02d:%02d" % (rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59)))
+        if rand.random() < 0.1:
+            lines = [rand.choice(["", "1", "12:34:5", "12:34:56", "a12:34:56", ":12:34"])] + lines[1:]
+        transcripts.append(lines)
+    return transcripts
+
+def compareSplitting(transcripts, description):
+    """ Compares every script's generateTranscriptDialogList with the original on transcripts.
+        Returns the number of mismatches. """
+    start = timer()
+    expectedDialogLists = [generateTranscriptDialogListCharScan(trans) for trans in transcripts]
+    charScanTime = timer() - start
+    print("\n%s: %d transcripts, character scan %.3f s" % (description, len(transcripts), charScanTime))
+
+    mismatchCount = 0
+    for module in SCRIPT_MODULES:
+        start = timer()
+        dialogLists = [module.generateTranscriptDialogList(trans) for trans in transcripts]
+        regexTime = timer() - start
+        moduleMismatches = 0
+        for trans, expected, dialogList in zip(transcripts, expectedDialogLists, dialogLists):
+            if dialogList != expected:
+                moduleMismatches += 1
+                if moduleMismatches <= 3:
+                    print("MISMATCH in", module.__name__, "for transcript:", trans)
+        print("  %-45s regex %.3f s (%.1fx faster), %d mismatches"
+              % (module.__name__, regexTime, charScanTime / max(regexTime, 1e-9), moduleMismatches))
+        mismatchCount += moduleMismatches
+    return mismatchCount
+
+def main():
+    mismatchCount = 0
+    if os.path.exists(INPUT_CSV_FILE_NAME):
+        realTranscripts = [rawChatReader.transcriptLines(chatRecord[rawChatReader.TRANSCRIPT])
+                           for chatRecord in rawChatReader.readChatRecords(INPUT_CSV_FILE_NAME)]
+        mismatchCount += compareSplitting(realTranscripts, "Real transcripts from " + INPUT_CSV_FILE_NAME)
+    else:
+        print("No", INPUT_CSV_FILE_NAME, "in this directory so only synthetic transcripts are compared")
+    syntheticTranscripts = generateSyntheticTranscripts(NUMBER_OF_SYNTHETIC_TRANSCRIPTS, RANDOM_SEED)
+    mismatchCount += compareSplitting(syntheticTranscripts, "Synthetic transcripts")
+
+    if mismatchCount > 0:
+        print("\nFAILED:", mismatchCount, "mismatches")
+        sys.exit(1)
+    print("\nAll dialogLists identical")
+
+if __name__ == "__main__":
+    main()
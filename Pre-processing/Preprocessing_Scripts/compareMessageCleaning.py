@@ -0,0 +1,218 @@
+""" File:  compareMessageCleaning.py
+    Description:  Test harness checking that splitMessageIntoSentences of the whole chat scripts and
+    cleanInitialQuestion of processChatCSV_onlyQuestions.py, which clean messages with messageCleaning.py,
+    give exactly the same tokens as the original character-by-character versions (kept below as
+    splitMessageIntoSentencesCharLoop and cleanInitialQuestionCharLoop), and timing both per message.
+
+    The messages compared are:
+    1) the messages of the real chats of INPUT_CSV_FILE_NAME, if the raw chat data .csv file is in this
+       directory, and
+    2) synthetic messages with time-stamps and names, HTML entities and tags, URLs, upper case, accented
+       and other non-ASCII letters, digits and sentence punctuation.
+
+    The results are compared with the scripts' lemmatizers.  For timing, the lemmatizers are replaced by
+    one returning each word as it is, so the times are those of cleaning the messages.
+
+    Run it from this directory:  python compareMessageCleaning.py
+    It prints the number of messages compared, the times and any mismatch, and exits with status 1 on a
+    mismatch.
+"""
+
+import os
+import random
+import sys
+from timeit import default_timer as timer
+
+import gensim
+
+import rawChatReader
+import tagStripping
+import processChatCSV_wholeChats
+import processChatCSV_wholeChats_POS_N_ADJ
+import processChatCSV_wholeChats_POS_N_ADJ_V
+import processChatCSV_onlyQuestions
+
+INPUT_CSV_FILE_NAME = processChatCSV_wholeChats.INPUT_CSV_FILE_NAME
+NUMBER_OF_SYNTHETIC_MESSAGES = 20000
+RANDOM_SEED = 7
+
+WHOLE_CHATS_MODULES = [processChatCSV_wholeChats, processChatCSV_wholeChats_POS_N_ADJ,
+                       processChatCSV_wholeChats_POS_N_ADJ_V]
+
+# pieces the synthetic messages are built from
+WORDS = ["Library", "article", "interlibrary", "loans", "hours", "Hi,", "help", "you?", "Thanks!", "e.g.",
+         "https://example.com/search?q=library&amp;page=2", "don&#x27;t", "and&#x2F;or", "&nbsp;", "&quot;quoted&quot;",
+         "<a href=\"https://example.com\">link</a>", "<span style=\"x\">", "</span>", "3:45", "10:30am", "2019",
+         "caf\u00e9", "na\u00efve", "\u00fcber", "stra\u00dfe", "\u0130stanbul", "\u00c5ngstr\u00f6m", "\u2460", "x\u00a0y",
+         "a\u2003b", "snake_case", "o'clock", "re-enter", "supercalifragilisticexpialidocious", "pneumonoultramicroscopic" * 2,
+         "a", "I", "...", "!?", "-", "\t", "\n"]
+NAMES = ["Jordan", "Patron", "Librarian", "Alex Smith"]
+
+
+class UnchangedWordLemmatizer:
+    """ Stands in for the scripts' lemmatizers while timing. """
+
+    def lemmatize(self, word, pos='n'):
+        return word
+
+def splitMessageIntoSentencesCharLoop(module, question):
+    """ The original character-by-character splitMessageIntoSentences of the whole chat script module. """
+    cleanQuestion = ""
+    question = question.lower()
+
+    colonCount = question.count(":")
+
+    if colonCount >= 3:  # time-stamp ##:##:## - person: question
+        colonOneIndex = question.find(":")
+        colonTwoIndex = question.find(":", colonOneIndex+1)
+        colonThreeIndex = question.find(":", colonTwoIndex+1)
+        question = question[colonThreeIndex+1:]
+    elif colonCount >= 1:
+        colonOneIndex = question.find(":")
+        question = question[colonOneIndex+1:]
+
+    question = question.replace('&#x27;', "'")
+    question = question.replace('&#x2F;', " ")
+    question = question.replace('&nbsp;', " ")
+    question = question.replace('&quot;','"')
+
+    ### HERE CLEAN UP <xyz ......</xyz>, e.g., <a href.....</a>, <span ... </span>
+
+    question = tagStripping.removeTags(question)
+    question = question.replace('.','Z')
+    question = question.replace('!','Z')
+    question = question.replace('?','Z')
+
+    sentenceTokensList = []
+    sentenceList = question.split("Z")
+    for question in sentenceList:
+        wordList = question.split()
+        cleanQuestion = ""
+        for word in wordList:
+            cleanWord = ""
+            for char in word:
+                if char >= 'a' and char <= 'z':
+                    cleanWord += char
+            if len(cleanWord) > 0 and len(cleanWord) < 30:  #upper bound to eliminate url's
+                cleanQuestion += module.lemmatizer.lemmatize(cleanWord) + " "
+        sentenceTokensList.append(gensim.utils.simple_preprocess(str(cleanQuestion), deacc=True))
+    return sentenceTokensList
+
+def cleanInitialQuestionCharLoop(question):
+    """ The original character-by-character cleanInitialQuestion of processChatCSV_onlyQuestions.py. """
+    module = processChatCSV_onlyQuestions
+    cleanQuestion = ""
+    question = question.lower()
+
+    colonCount = question.count(":")
+
+    if colonCount >= 3:  # time-stamp ##:##:## - person: question
+        colonOneIndex = question.find(":")
+        colonTwoIndex = question.find(":", colonOneIndex+1)
+        colonThreeIndex = question.find(":", colonTwoIndex+1)
+        question = question[colonThreeIndex+1:]
+    elif colonCount >= 1:
+        colonOneIndex = question.find(":")
+        question = question[colonOneIndex+1:]
+
+    question = question.replace('&#x27;', "'")
+    question = question.replace('&#x2F;', " ")
+    question = question.replace('&nbsp;', " ")
+    question = question.replace('&quot;','"')
+
+    ### HERE CLEAN UP <xyz ......</xyz>, e.g., <a href.....</a>, <span ... </span>
+    question = tagStripping.removeTags(question)
+
+    wordList = question.split()
+    for word in wordList:
+        cleanWord = ""
+        for char in word:
+            if char >= 'a' and char <= 'z':
+                cleanWord += char
+        if len(cleanWord) > 0:
+            cleanWord = module.lemmatizer.lemmatize(cleanWord)
+            if cleanWord not in module.stopWordsDict:
+                cleanQuestion += cleanWord + " "
+    return cleanQuestion[:-1]  # drop the trailing space
+
+def generateSyntheticMessages(count, seed):
+    """ Returns a list of count synthetic chat messages. """
+    rand = random.Random(seed)
+    messages = []
+    for i in range(count):
+        message = " ".join(rand.choice(WORDS) for word in range(rand.randint(0, 40)))
+        if rand.random() < 0.7:
+            message = "%02d:%02d:%02d - %s: %s" % (rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59),
+                                                  rand.choice(NAMES), message)
+        messages.append(message)
+    return messages
+
+def realMessages(inFile):
+    """ Returns the initial question and dialog messages of the chats in the raw chat data .csv file. """
+    messages = []
+    for transcriptDialog in processChatCSV_wholeChats.generateTranscriptDialogs(rawChatReader.readChatRecords(inFile)):
+        if transcriptDialog[1] is not None:
+            messages.extend(processChatCSV_wholeChats.chatMessages(transcriptDialog))
+    return messages
+
+def timeCleaning(module, messages, cleanFunction):
+    """ Returns the seconds cleanFunction takes to clean messages with the lemmatizer of module replaced
+        by an UnchangedWordLemmatizer. """
+    lemmatizer = module.lemmatizer
+    module.lemmatizer = UnchangedWordLemmatizer()
+    start = timer()
+    for message in messages:
+        cleanFunction(message)
+    seconds = timer() - start
+    module.lemmatizer = lemmatizer
+    return seconds
+
+def timeAndCompare(description, module, messages, cleanFunction, originalFunction):
+    """ Compares the results of cleanFunction and originalFunction, which both lemmatize with the lemmatizer
+        of module, over messages, times them and returns the number of messages they clean differently. """
+    originalResults = [originalFunction(message) for message in messages]
+    results = [cleanFunction(message) for message in messages]
+    originalTime = timeCleaning(module, messages, originalFunction)
+    cleanTime = timeCleaning(module, messages, cleanFunction)
+
+    mismatchCount = 0
+    for message, expected, result in zip(messages, originalResults, results):
+        if result != expected:
+            mismatchCount += 1
+            if mismatchCount <= 3:
+                print("MISMATCH in", description, "for message:", repr(message))
+    print("  %-63s %7.1f us %7.1f us per message (%.1fx faster), %d mismatches"
+          % (description, 1e6 * originalTime / max(len(messages), 1), 1e6 * cleanTime / max(len(messages), 1),
+             originalTime / max(cleanTime, 1e-9), mismatchCount))
+    return mismatchCount
+
+def compareCleaning(messages, description):
+    """ Compares every script's message cleaning with the original on messages.  Returns the number of
+        mismatches. """
+    print("\n%s: %d messages, character loop and fused cleaning times" % (description, len(messages)))
+    mismatchCount = 0
+    for module in WHOLE_CHATS_MODULES:
+        mismatchCount += timeAndCompare(module.__name__ + ".splitMessageIntoSentences", module, messages,
+                                        module.splitMessageIntoSentences,
+                                        lambda message: splitMessageIntoSentencesCharLoop(module, message))
+    mismatchCount += timeAndCompare("processChatCSV_onlyQuestions.cleanInitialQuestion", processChatCSV_onlyQuestions,
+                                    messages, processChatCSV_onlyQuestions.cleanInitialQuestion,
+                                    cleanInitialQuestionCharLoop)
+    return mismatchCount
+
+def main():
+    mismatchCount = 0
+    if os.path.exists(INPUT_CSV_FILE_NAME):
+        mismatchCount += compareCleaning(realMessages(INPUT_CSV_FILE_NAME), "Real messages from " + INPUT_CSV_FILE_NAME)
+    else:
+        print("No", INPUT_CSV_FILE_NAME, "in this directory so only synthetic messages are compared")
+    syntheticMessages = generateSyntheticMessages(NUMBER_OF_SYNTHETIC_MESSAGES, RANDOM_SEED)
+    mismatchCount += compareCleaning(syntheticMessages, "Synthetic messages")
+
+    if mismatchCount > 0:
+        print("\nFAILED:", mismatchCount, "mismatches")
+        sys.exit(1)
+    print("\nAll cleaned messages identical")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+""" File:  contentCache.py
+    Description:  A content-addressed on-disk cache of the intermediate results of a preprocessing stage for
+    each chat, so rerunning a script (or running another script with the same earlier stages) only
+    recomputes the stages whose inputs changed.
+
+    Each entry is keyed by the SHA-256 hash of the stage's settings, i.e., everything besides the chat's text
+    that affects the stage's result, followed by the chat's text.  Changing a setting therefore changes every
+    key and the stale entries are simply never looked up again.  Entries are stored as JSON in
+    <directory>/<first two hex digits of the key>/<key>.json, each written to a temporary file and renamed
+    so worker processes can share the cache.
+"""
+
+import hashlib
+import json
+import os
+
+
+class ContentCache:
+
+    def __init__(self, directory, settings):
+        """ directory is where the entries are stored and settings a string of the stage's settings. """
+        self.directory = directory
+        self.settings = settings
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, texts):
+        """ Returns the key of the entry for the list of strings texts, e.g., the messages of a chat. """
+        content = self.settings + "\n" + "\x1e".join(texts)  # record separator between the texts
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def fileName(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """ Returns the value stored for key, or None if there is none. """
+        try:
+            entryFile = open(self.fileName(key), 'r', encoding='utf-8')
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        value = json.load(entryFile)
+        entryFile.close()
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """ Stores the JSON serializable value for key. """
+        fileName = self.fileName(key)
+        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+        tempFileName = fileName + ".%d.tmp" % os.getpid()
+        entryFile = open(tempFileName, 'w', encoding='utf-8')
+        json.dump(value, entryFile, separators=(',', ':'))
+        entryFile.close()
+        os.replace(tempFileName, fileName)
+
+    def takeStats(self):
+        """ Returns [hits, misses] since the previous call and starts counting again. """
+        stats = [self.hits, self.misses]
+        self.hits = 0
+        self.misses = 0
+        return stats
+
+def printStats(hits, misses, directory):
+    """ Displays the cache hit/miss statistics of a run. """
+    print("Chat cache: %d hits, %d misses (%.1f%% hit rate) in %s"
+          % (hits, misses, 100.0 * hits / max(hits + misses, 1), directory))
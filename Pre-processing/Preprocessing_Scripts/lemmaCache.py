@@ -0,0 +1,88 @@
+""" File:  lemmaCache.py
+    Description:  A bounded least-recently-used cache in front of nltk.WordNetLemmatizer() used by the
+    preprocessing scripts.  Chat vocabulary is very repetitive, so most (word, POS) pairs have been
+    lemmatized before and need not go back to WordNet.
+
+    LemmaCache has the same lemmatize(word, pos) method as the lemmatizer it wraps, so it is a drop-in
+    replacement for it.  It counts cache hits and misses, and its contents can be saved to a text file
+    at the end of a run and loaded at the start of the next one so later runs start warm.  The file has
+    one tab separated "word  POS  lemma" line per entry, least recently used first.
+"""
+
+import os
+from collections import OrderedDict
+
+
+class LemmaCache:
+
+    def __init__(self, lemmatizer, maxSize):
+        """ lemmatizer is the nltk.WordNetLemmatizer() whose results are cached and maxSize the maximum
+            number of (word, POS) entries kept. """
+        self.lemmatizer = lemmatizer
+        self.maxSize = maxSize
+        self.lemmaDict = OrderedDict()  # (word, POS) -> lemma, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.newEntries = []  # entries added since the last takeStats()
+
+    def lemmatize(self, word, pos='n'):
+        """ Returns the lemma of word for the POS pos ('n', 'v', 'a' or 'r') like WordNetLemmatizer.lemmatize. """
+        key = (word, pos)
+        lemma = self.lemmaDict.get(key)
+        if lemma is not None:
+            self.hits += 1
+            self.lemmaDict.move_to_end(key)
+            return lemma
+        self.misses += 1
+        lemma = self.lemmatizer.lemmatize(word, pos)
+        self.addEntry(key, lemma)
+        self.newEntries.append((word, pos, lemma))
+        return lemma
+
+    def addEntry(self, key, lemma):
+        """ Adds or refreshes an entry, evicting the least recently used entry if the cache is full. """
+        self.lemmaDict[key] = lemma
+        self.lemmaDict.move_to_end(key)
+        if len(self.lemmaDict) > self.maxSize:
+            self.lemmaDict.popitem(last=False)
+
+    def addEntries(self, entries):
+        """ Adds a list of (word, POS, lemma) entries, e.g., the new entries of a worker process's cache. """
+        for word, pos, lemma in entries:
+            self.addEntry((word, pos), lemma)
+
+    def takeStats(self):
+        """ Returns [hits, misses, newEntries] since the previous call and starts counting again.
+            Worker processes send these back with each batch of chats so the main process can report
+            the hit rate and save the entries the workers added. """
+        stats = [self.hits, self.misses, self.newEntries]
+        self.hits = 0
+        self.misses = 0
+        self.newEntries = []
+        return stats
+
+    def load(self, fileName):
+        """ Loads the entries saved by save(), if the file exists. """
+        if not os.path.exists(fileName):
+            return
+        cacheFile = open(fileName, 'r', encoding='utf-8')
+        for line in cacheFile:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 3:
+                self.addEntry((fields[0], fields[1]), fields[2])
+        cacheFile.close()
+
+    def save(self, fileName):
+        """ Saves the entries to fileName, replacing the file only once it is completely written. """
+        tempFileName = fileName + ".tmp"
+        cacheFile = open(tempFileName, 'w', encoding='utf-8')
+        for (word, pos), lemma in self.lemmaDict.items():
+            cacheFile.write(word + "\t" + pos + "\t" + lemma + "\n")
+        cacheFile.close()
+        os.replace(tempFileName, fileName)
+
+def printStats(hits, misses, cacheSize, fileName):
+    """ Displays the lemma cache hit/miss statistics of a run. """
+    lookups = hits + misses
+    print("Lemma cache: %d hits, %d misses (%.1f%% hit rate), %d entries saved to %s"
+          % (hits, misses, 100.0 * hits / max(lookups, 1), cacheSize, fileName))
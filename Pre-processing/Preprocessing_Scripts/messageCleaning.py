@@ -0,0 +1,74 @@
+""" File:  messageCleaning.py
+    Description:  Cleans up the text of chat messages for the preprocessing scripts.  Each step runs over
+    the whole message at once in C (str and bytes methods, precompiled regular expressions and translate
+    tables) instead of looping over its characters in Python:
+    1) messageText lower cases a message, removes its time-stamp and name, e.g., '13:45:42 - Jordan:',
+       decodes the HTML entities and removes the <xyz ......</xyz> spans (see tagStripping.py),
+    2) sentenceWords splits it into sentences at each '.', '!' and '?' and each sentence into words keeping
+       only the letters a to z of each word, or cleanWords does the same without splitting sentences, and
+    3) simplePreprocess turns the (lemmatized) words of a sentence into the tokens
+       gensim.utils.simple_preprocess gives.
+"""
+
+import re
+import gensim
+
+import tagStripping
+
+# HTML entities found in the chats and what they are replaced with;  '/' is replaced with a space since
+# it is used to separate words
+ENTITY_PATTERN = re.compile(r"&#x27;|&#x2F;|&nbsp;|&quot;")
+ENTITY_REPLACEMENTS = {'&#x27;': "'", '&#x2F;': " ", '&nbsp;': " ", '&quot;': '"'}
+
+# every ASCII character except the letters a to z and the space between words, and the same without the
+# '.', '!' and '?' ending sentences, which are all translated to '.'
+NON_LETTER_BYTES = bytes(char for char in range(128) if not (ord('a') <= char <= ord('z') or char == ord(' ')))
+NON_SENTENCE_LETTER_BYTES = bytes(char for char in NON_LETTER_BYTES if char not in b".!?")
+SENTENCE_END_TABLE = bytes.maketrans(b"!?", b"..")
+
+LOWER_CASE_LETTERS_PATTERN = re.compile(r"[a-z]*")
+
+# lengths of the tokens kept by gensim.utils.simple_preprocess
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 15
+
+
+def messageText(question):
+    """ Returns the lower cased text of a message without its time-stamp and name, HTML entities and tags. """
+    question = question.lower()
+
+    colonCount = question.count(":")
+
+    if colonCount >= 3:  # time-stamp ##:##:## - person: question
+        colonOneIndex = question.find(":")
+        colonTwoIndex = question.find(":", colonOneIndex+1)
+        colonThreeIndex = question.find(":", colonTwoIndex+1)
+        question = question[colonThreeIndex+1:]
+    elif colonCount >= 1:
+        colonOneIndex = question.find(":")
+        question = question[colonOneIndex+1:]
+
+    if '&' in question:
+        question = ENTITY_PATTERN.sub(lambda match: ENTITY_REPLACEMENTS[match.group()], question)
+
+    ### HERE CLEAN UP <xyz ......</xyz>, e.g., <a href.....</a>, <span ... </span>
+    return tagStripping.removeTags(question)
+
+def sentenceWords(text):
+    """ Returns the list of words of each sentence of text, split at each '.', '!' and '?', keeping only the
+        letters a to z of each word and dropping words left empty.  White space is made single spaces,
+        non-ASCII characters are dropped by encoding and the other characters by one translate. """
+    text = " ".join(text.split()).encode('ascii', 'ignore').translate(SENTENCE_END_TABLE, NON_SENTENCE_LETTER_BYTES)
+    return [sentence.split() for sentence in text.decode('ascii').split(".")]
+
+def cleanWords(text):
+    """ Returns the words of text like sentenceWords but without splitting it into sentences. """
+    text = " ".join(text.split()).encode('ascii', 'ignore').translate(None, NON_LETTER_BYTES)
+    return text.decode('ascii').split()
+
+def simplePreprocess(words):
+    """ Returns the same tokens as gensim.utils.simple_preprocess(" ".join(words), deacc=True).  If the words
+        are only lower case letters a to z they are the tokens, so only other words go through gensim. """
+    if LOWER_CASE_LETTERS_PATTERN.fullmatch("".join(words)):
+        return [word for word in words if MIN_TOKEN_LENGTH <= len(word) <= MAX_TOKEN_LENGTH]
+    return gensim.utils.simple_preprocess(" ".join(words), deacc=True)
@@ -0,0 +1,234 @@
+""" File:  processChatCSV_allCorpora.py
+    Description:  Writes all four preprocessed corpora in a single pass over the raw chat data .csv file:
+    1) wholeChatsFile.csv and wholeChatsFile.txt as processChatCSV_wholeChats.py does,
+    2) wholeChatsFilePOS_N_ADJ.csv and wholeChatsFilePOS_N_ADJ.txt as processChatCSV_wholeChats_POS_N_ADJ.py does,
+    3) wholeChatsFilePOS_N_ADJ_V.csv and wholeChatsFilePOS_N_ADJ_V.txt as processChatCSV_wholeChats_POS_N_ADJ_V.py
+       does, and
+    4) onlyQuestionsFile.csv and onlyQuestionsFile.txt as processChatCSV_onlyQuestions.py does.
+
+    Running the four scripts one after the other reads the raw chat data .csv file, splits every transcript
+    into its dialog and POS tags every token four times over.  Here each chat is read, split and tagged once;
+    the three whole chat corpora only differ in which POS they keep, so each tagged word is lemmatized once
+    and added to every corpus whose POS_LIST includes its POS.  The output files are identical to the ones
+    the four scripts write.
+
+    The cleaning functions and settings (output file names, POS_LISTs, stop words) are those of the four
+    scripts, which are imported, so the corpora written here cannot drift apart from theirs.  The tagged
+    sentences of the chats are read from and added to the chat cache the whole chat scripts share.
+
+    Takes as input raw chat data .csv file:
+    original_without_identifiable_info_chat_transcripts_9942_041015_053119.csv
+    It containing only columns:
+    Timestamp, Duration (seconds), Initial Question, Message Count, Transcript
+
+    Setting NUMBER_OF_WORKERS above 1 cleans the chats in a pool of worker processes.  The chats are
+    written back in their original order so the output files are identical to a serial run.
+
+    Setting PIPELINED to True runs the stages at the same time (see chatStreams.pipelinedBatchMap):  the
+    chats are read and split in a thread, cleaned by the NUMBER_OF_WORKERS worker processes and written in
+    another thread, with up to PIPELINE_QUEUE_BATCHES batches waiting between the stages.  The output files
+    are the same.
+
+    The binary corpora of token ids (see binaryCorpus.py) the four scripts write with WRITE_BINARY_CORPUS
+    are written here too, and so are the manifests of the whole chat corpora (see chatManifest.py), so a
+    later INCREMENTAL run of a whole chat script appends to the files written here.
+
+    Setting PROFILE_STAGES to True records the wall time, calls and tracemalloc peak of each stage (see
+    stageProfiler.py) and writes them to PROFILE_REPORT_FILE_NAME as JSON at the end of the run.
+"""
+
+import multiprocessing
+import sys
+
+import binaryCorpus
+import chatManifest
+import chatStreams
+import contentCache
+import lemmaCache
+import messageCleaning
+import rawChatReader
+import stageProfiler
+import tagStripping
+import processChatCSV_wholeChats as wholeChats
+import processChatCSV_wholeChats_POS_N_ADJ as wholeChatsPOS_N_ADJ
+import processChatCSV_wholeChats_POS_N_ADJ_V as wholeChatsPOS_N_ADJ_V
+import processChatCSV_onlyQuestions as onlyQuestions
+
+# "constants"
+INPUT_CSV_FILE_NAME = wholeChats.INPUT_CSV_FILE_NAME
+
+# [.csv file name, .txt file name, POS_LIST, binary corpus name or None, manifest file name] of each whole chat corpus
+WHOLE_CHATS_CORPORA = [[module.WHOLE_CHATS_OUTPUT_FILE_NAME, module.WHOLE_CHATS_OUTPUT_FILE_NAME_TXT, module.POS_LIST,
+                        module.BINARY_CORPUS_NAME if module.WRITE_BINARY_CORPUS else None, module.MANIFEST_FILE_NAME]
+                       for module in [wholeChats, wholeChatsPOS_N_ADJ, wholeChatsPOS_N_ADJ_V]]
+
+NUMBER_OF_WORKERS = 1  # worker processes used to clean chats, 1 cleans them serially in this process
+CHATS_PER_BATCH = 20  # chats POS tagged together in one call and handed to a worker process at a time
+PIPELINED = False  # True reads and writes the chats in threads of their own while worker processes clean them
+PIPELINE_QUEUE_BATCHES = 8  # batches of chats waiting between the stages when PIPELINED
+
+LEMMA_CACHE_FILE_NAME = wholeChats.LEMMA_CACHE_FILE_NAME
+
+PROFILE_STAGES = False  # True records the time, calls and memory of each stage, at some cost in speed
+PROFILE_REPORT_FILE_NAME = "allCorpora_profile.json"
+
+# the initial questions are lemmatized through the same lemma cache as the whole chats
+onlyQuestions.lemmatizer = wholeChats.lemmatizer
+
+
+def main():
+    if PROFILE_STAGES:
+        profileStages()
+    wholeChats.lemmatizer.load(LEMMA_CACHE_FILE_NAME)
+    chatRecords = rawChatReader.readChatRecords(INPUT_CSV_FILE_NAME)
+    transcriptDialogs = wholeChats.generateTranscriptDialogs(chatRecords)  # the whole dialog is tagged
+    chatsToWrite = (transcriptDialog for transcriptDialog in transcriptDialogs
+                    if transcriptDialog[1] is not None)
+
+    if PIPELINED:
+        with multiprocessing.Pool(NUMBER_OF_WORKERS, initializer=initCleaningWorker) as pool:
+            wholeChatsCount, questionCount = chatStreams.pipelinedBatchMap(pool, cleanChatBatch, chatsToWrite,
+                                                                           CHATS_PER_BATCH, 2 * NUMBER_OF_WORKERS,
+                                                                           writeAllCorpora, PIPELINE_QUEUE_BATCHES)
+    elif NUMBER_OF_WORKERS > 1:
+        with multiprocessing.Pool(NUMBER_OF_WORKERS, initializer=initCleaningWorker) as pool:
+            cleanedBatches = chatStreams.orderedParallelBatchMap(pool, cleanChatBatch, chatsToWrite,
+                                                                 CHATS_PER_BATCH, 2 * NUMBER_OF_WORKERS)
+            wholeChatsCount, questionCount = writeAllCorpora(cleanedBatches)
+    else:
+        cleanedBatches = map(cleanChatBatch, chatStreams.chunked(chatsToWrite, CHATS_PER_BATCH))
+        wholeChatsCount, questionCount = writeAllCorpora(cleanedBatches)
+
+    print("Whole Chats Count:", wholeChatsCount)
+    print("Total Question Count:", questionCount)
+    if PROFILE_STAGES:
+        stageProfiler.writeReport(PROFILE_REPORT_FILE_NAME, __file__)
+
+def profileStages():
+    """ Starts the stage profiler in this process and instruments the stages of this script. """
+    stageProfiler.start()
+    stageProfiler.instrument(rawChatReader, ["readChatRecords"])
+    stageProfiler.instrument(onlyQuestions, ["cleanInitialQuestion"])
+    stageProfiler.instrument(wholeChats, ["generateTranscriptDialogs", "generateTranscriptDialogList", "tagChatBatch",
+                                          "splitMessageIntoSentences", "tagSentences"])
+    stageProfiler.instrument(sys.modules[__name__], ["cleanChat", "writeAllCorpora"])
+    stageProfiler.instrument(messageCleaning, ["messageText", "sentenceWords", "cleanWords", "simplePreprocess"])
+    stageProfiler.instrument(tagStripping, ["removeTags"])
+    stageProfiler.instrument(wholeChats.lemmatizer, ["lemmatize"])
+
+def initCleaningWorker():
+    """ Runs once in each worker process so every worker holds its own POS tagger and lemmatizer. """
+    wholeChats.initCleaningWorker()
+    onlyQuestions.lemmatizer = wholeChats.lemmatizer
+    if PROFILE_STAGES:
+        profileStages()
+
+def cleanChat(chatTaggedSentences):
+    """ Returns the cleaned text of a chat for each corpus of WHOLE_CHATS_CORPORA.  chatTaggedSentences holds
+        the POS tagged sentences of each message of the chat.  Each corpus keeps exactly the words
+        processChatCSV_wholeChats.preprocess keeps with that corpus's POS_LIST. """
+    lemmatizer = wholeChats.lemmatizer
+    posLists = [corpus[2] for corpus in WHOLE_CHATS_CORPORA]
+    chatsCleaned = ["" for posList in posLists]
+    for messageTaggedSentences in chatTaggedSentences:
+        masterWordLists = [[] for posList in posLists]
+        for taggedSentence in messageTaggedSentences:
+            for tok, pos in taggedSentence:
+                if tok in wholeChats.stopWordsDict:
+                    continue
+                simplePos = wholeChats.simplify(pos)
+                lemma = None
+                for masterWordList, posList in zip(masterWordLists, posLists):
+                    if simplePos in posList:
+                        if lemma is None:
+                            lemma = lemmatizer.lemmatize(tok, simplePos)
+                        masterWordList.append(lemma)
+        for i in range(len(posLists)):
+            chatsCleaned[i] += " ".join(masterWordLists[i]) + " "  # separate end of this line with start of next line
+    return chatsCleaned
+
+def cleanChatBatch(transcriptDialogBatch):
+    """ Cleans a batch of chats (transcriptDialogList items) for all the corpora and returns [cleanedChats,
+        taggedTokenCount, taggingSeconds, lemmaStats, chatCacheStats, stageStats] where cleanedChats holds for
+        each chat its excel index, its manifest line (see chatManifest.chatKey), the list of its cleaned texts
+        for the WHOLE_CHATS_CORPORA and its cleaned initial question.
+        The chats are cleaned and POS tagged, or read from the chat cache, by
+        processChatCSV_wholeChats.tagChatBatch.
+    """
+    batchTaggedSentences, taggedTokenCount, taggingSeconds = wholeChats.tagChatBatch(transcriptDialogBatch)
+
+    cleanedChats = []
+    for transcriptDialog, chatTaggedSentences in zip(transcriptDialogBatch, batchTaggedSentences):
+        cleanedChats.append((transcriptDialog[0], chatManifest.chatKey(transcriptDialog),
+                             cleanChat(chatTaggedSentences), onlyQuestions.cleanInitialQuestion(transcriptDialog[1])))
+    return [cleanedChats, taggedTokenCount, taggingSeconds, wholeChats.lemmatizer.takeStats(),
+            wholeChats.takeChatCacheStats(), stageProfiler.takeStats()]
+
+def writeAllCorpora(cleanedBatches):
+    """ Writes the cleaned chats of each cleanChatBatch result in cleanedBatches to the .csv and .txt files of
+        every corpus and the manifests of the whole chat corpora, skipping initial questions with nothing left
+        after cleaning.  Reports the tagging speed and lemma cache hit rate, saves the lemma cache and returns
+        [whole chats written, questions written]. """
+    lemmatizer = wholeChats.lemmatizer
+    corpusFiles = [[open(csvFileName, "w"), open(txtFileName, "w"), open(manifestFileName, "w")]
+                   for csvFileName, txtFileName, posList, binaryCorpusName, manifestFileName in WHOLE_CHATS_CORPORA]
+    corpusWriters = [binaryCorpus.BinaryCorpusWriter(binaryCorpusName) if binaryCorpusName is not None else None
+                     for csvFileName, txtFileName, posList, binaryCorpusName, manifestFileName in WHOLE_CHATS_CORPORA]
+    questionFile = open(onlyQuestions.QUESTION_ONLY_OUTPUT_FILE_NAME, "w")
+    questionTxtFile = open(onlyQuestions.QUESTION_ONLY_OUTPUT_FILE_NAME_TXT, "w")
+    questionCorpusWriter = None
+    if onlyQuestions.WRITE_BINARY_CORPUS:
+        questionCorpusWriter = binaryCorpus.BinaryCorpusWriter(onlyQuestions.BINARY_CORPUS_NAME)
+    wholeChatsCount = 0
+    questionCount = 0
+    totalTaggedTokens = 0
+    totalTaggingSeconds = 0.0
+    lemmaHits = 0
+    lemmaMisses = 0
+    chatCacheHits = 0
+    chatCacheMisses = 0
+    for cleanedChats, taggedTokenCount, taggingSeconds, lemmaStats, chatCacheStats, stageStats in cleanedBatches:
+        for transIndex, manifestKey, chatsCleaned, cleanQuestion in cleanedChats:
+            for (csvFile, txtFile, manifestFile), corpusWriter, chatCleaned in zip(corpusFiles, corpusWriters,
+                                                                                  chatsCleaned):
+                csvFile.write(str(transIndex)+","+chatCleaned+"\n")
+                txtFile.write(chatCleaned+"\n")
+                manifestFile.write(manifestKey+"\n")
+                if corpusWriter is not None:
+                    corpusWriter.addDocument(transIndex, chatCleaned)
+            wholeChatsCount += 1
+            if len(cleanQuestion) > 0:
+                questionFile.write(str(transIndex)+","+cleanQuestion+"\n")
+                questionTxtFile.write(cleanQuestion+"\n")
+                if questionCorpusWriter is not None:
+                    questionCorpusWriter.addDocument(transIndex, cleanQuestion)
+                questionCount += 1
+        totalTaggedTokens += taggedTokenCount
+        totalTaggingSeconds += taggingSeconds
+        lemmaHits += lemmaStats[0]
+        lemmaMisses += lemmaStats[1]
+        lemmatizer.addEntries(lemmaStats[2])  # lemmas found by the worker processes
+        chatCacheHits += chatCacheStats[0]
+        chatCacheMisses += chatCacheStats[1]
+        stageProfiler.addStats(stageStats)  # stages run by the worker processes
+    for csvFile, txtFile, manifestFile in corpusFiles:
+        csvFile.close()
+        txtFile.close()
+        manifestFile.close()
+    for corpusWriter in corpusWriters + [questionCorpusWriter]:
+        if corpusWriter is not None:
+            corpusWriter.close()
+    questionFile.close()
+    questionTxtFile.close()
+    lemmatizer.save(LEMMA_CACHE_FILE_NAME)
+
+    # with several worker processes the seconds are summed over the workers, i.e., this is tokens/sec per worker
+    print("POS tagged %d tokens in %.2f seconds: %.0f tokens/sec"
+          % (totalTaggedTokens, totalTaggingSeconds, totalTaggedTokens / max(totalTaggingSeconds, 1e-9)))
+    lemmaCache.printStats(lemmaHits, lemmaMisses, len(lemmatizer.lemmaDict), LEMMA_CACHE_FILE_NAME)
+    if wholeChats.chatCache is not None:
+        contentCache.printStats(chatCacheHits, chatCacheMisses, wholeChats.CHAT_CACHE_DIRECTORY)
+    return [wholeChatsCount, questionCount]
+
+if __name__ == "__main__":
+    main()  # start main running
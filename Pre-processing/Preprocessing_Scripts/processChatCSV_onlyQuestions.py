@@ -18,8 +18,9 @@
     It containing only columns:
     Timestamp, Duration (seconds), Initial Question, Message Count, Transcript
     and produces a list-of-lists called transcriptDialogList with a format:
-    [[<excel index int>, "Initial question string", [Transcript split by chat responses which including initial
-    question]], ...]
+    [[<excel index int>, "Initial question string"], ...]
+    When the Initial Question column is empty, the Transcript is split by chat responses lazily, one turn at a
+    time, and only as far as the first turn taken to be the initial question.
 
     This transcriptDialogList is used to write two text files with one chat dialog per line.
     It writes each processed chat keeping only POS of nouns and adjectives to two text files:
@@ -27,10 +28,41 @@
        chat line # in original .csv, initial question of chat, and
     2) onlyQuestionsFile.txt with only the processed initial question of each chat one per line
 
+    The chats are streamed through the read -> split dialog -> clean -> write stages one at a time,
+    so memory use stays flat however large the raw chat export is.  The .csv file is memory-mapped and
+    its quoted, multi-line fields parsed by rawChatReader.py.
+
+    Setting NUMBER_OF_WORKERS above 1 cleans the questions in a pool of worker processes.  The questions
+    are written back in their original order so the output files are identical to a serial run.
+
+    Setting PIPELINED to True runs the stages at the same time (see chatStreams.pipelinedBatchMap):  the
+    chats are read in a thread, their questions cleaned by the NUMBER_OF_WORKERS worker processes and
+    written in another thread, with up to PIPELINE_QUEUE_BATCHES batches waiting between the stages.  The
+    output files are the same.
+
+    Lemmatization goes through a bounded LRU cache keyed on (word, POS) (see lemmaCache.py) which is
+    saved to LEMMA_CACHE_FILE_NAME at the end of a run so the next run starts warm.
+
+    With WRITE_BINARY_CORPUS the questions are also written as a binary corpus of token ids (see
+    binaryCorpus.py), the files BINARY_CORPUS_NAME followed by _vocab.txt, _token_ids.int32, _doc_offsets.int64
+    and _csv_line_index.int32, which the topic modeling scripts can memory-map.
+
+    Setting PROFILE_STAGES to True records the wall time, calls and tracemalloc peak of each stage, e.g.,
+    generateTranscriptDialogTurns, removeTags, lemmatization and writing the output files (see
+    stageProfiler.py), and writes them to PROFILE_REPORT_FILE_NAME as JSON at the end of the run.
 """
+import sys
+import multiprocessing
 import nltk
 
-lemmatizer = nltk.WordNetLemmatizer()
+import binaryCorpus
+import chatStreams
+import lemmaCache
+import messageCleaning
+import rawChatReader
+import stageProfiler
+import tagStripping
+import timeStamps
 
 
 # "constants"
@@ -42,6 +74,22 @@ QUESTION_ONLY_OUTPUT_FILE_NAME_TXT = "onlyQuestionsFile.txt"
 
 STOP_WORD_FILE_NAME = "stop_words.txt"
 
+NUMBER_OF_WORKERS = 1  # worker processes used to clean questions, 1 cleans them serially in this process
+QUESTIONS_PER_BATCH = 50  # number of questions cleaned together and handed to a worker process at a time
+PIPELINED = False  # True reads and writes the questions in threads of their own while worker processes clean them
+PIPELINE_QUEUE_BATCHES = 8  # batches of questions waiting between the stages when PIPELINED
+
+LEMMA_CACHE_FILE_NAME = "lemma_cache.txt"
+LEMMA_CACHE_SIZE = 100000  # maximum number of (word, POS) lemmas cached
+
+WRITE_BINARY_CORPUS = True  # also write the questions as token ids with a vocabulary file (see binaryCorpus.py)
+BINARY_CORPUS_NAME = binaryCorpus.corpusName(QUESTION_ONLY_OUTPUT_FILE_NAME)
+
+PROFILE_STAGES = False  # True records the time, calls and memory of each stage, at some cost in speed
+PROFILE_REPORT_FILE_NAME = QUESTION_ONLY_OUTPUT_FILE_NAME.replace(".csv", "_profile.json")
+
+lemmatizer = lemmaCache.LemmaCache(nltk.WordNetLemmatizer(), LEMMA_CACHE_SIZE)
+
 def getStopWords(stopWordFileName):
     stopWordDict = {}
     stopWordFile = open(stopWordFileName, 'r')
@@ -57,198 +105,162 @@ stopWordsDict = getStopWords(STOP_WORD_FILE_NAME)
 
 
 def main():
-    transcriptList = readRawChats(INPUT_CSV_FILE_NAME)
+    if PROFILE_STAGES:
+        profileStages()
+    lemmatizer.load(LEMMA_CACHE_FILE_NAME)
+    chatRecords = rawChatReader.readChatRecords(INPUT_CSV_FILE_NAME)
+    transcriptDialogs = generateTranscriptDialogs(chatRecords)
+    questionList = (transcriptDialog for transcriptDialog in transcriptDialogs
+                    if transcriptDialog[1] is not None)
+    if PIPELINED:
+        with multiprocessing.Pool(NUMBER_OF_WORKERS, initializer=initCleaningWorker) as pool:
+            questionCount = chatStreams.pipelinedBatchMap(pool, cleanQuestionBatch, questionList,
+                                                          QUESTIONS_PER_BATCH, 2 * NUMBER_OF_WORKERS,
+                                                          writeCleanQuestions, PIPELINE_QUEUE_BATCHES)
+    elif NUMBER_OF_WORKERS > 1:
+        with multiprocessing.Pool(NUMBER_OF_WORKERS, initializer=initCleaningWorker) as pool:
+            cleanedBatches = chatStreams.orderedParallelBatchMap(pool, cleanQuestionBatch, questionList,
+                                                                 QUESTIONS_PER_BATCH, 2 * NUMBER_OF_WORKERS)
+            questionCount = writeCleanQuestions(cleanedBatches)
+    else:
+        cleanedBatches = map(cleanQuestionBatch, chatStreams.chunked(questionList, QUESTIONS_PER_BATCH))
+        questionCount = writeCleanQuestions(cleanedBatches)
 
-    print("\nlen(transcriptList)", len(transcriptList))
+    print("Total Question Count:", questionCount)
+    if PROFILE_STAGES:
+        stageProfiler.writeReport(PROFILE_REPORT_FILE_NAME, __file__)
+
+def profileStages():
+    """ Starts the stage profiler in this process and instruments the stages of this script. """
+    stageProfiler.start()
+    stageProfiler.instrument(rawChatReader, ["readChatRecords"])
+    stageProfiler.instrument(sys.modules[__name__], ["generateTranscriptDialogs", "generateTranscriptDialogTurns",
+                                                     "cleanInitialQuestion", "writeCleanQuestions"])
+    stageProfiler.instrument(messageCleaning, ["messageText", "cleanWords"])
+    stageProfiler.instrument(tagStripping, ["removeTags"])
+    stageProfiler.instrument(lemmatizer, ["lemmatize"])
+
+def generateTranscriptDialogs(chatRecords):
+    """ Generator that finds the initial question of each chat yielded by rawChatReader.readChatRecords and
+        yields [<excel index int>, "Initial question string"] for it, i.e., the items of the
+        transcriptDialogList described above one at a time.  The Transcript is only split into its chat
+        dialog when the Initial Question column is empty, and then only up to the initial question.
+    """
     initialQuestionCount = 0
     transIndex = 2  # Assumes Excel .cvs had a column-header in line 1
-    transcriptDialogList = []
-    for trans in transcriptList:
-        transDialogList = generateTranscriptDialogList(trans)
-        initialQuestion = findInitialQuestion(trans, transIndex)
-        if initialQuestion == None:
-            initialQuestion = findInitialQuestionInDialog(transDialogList,transIndex)           
+    for chatRecord in chatRecords:
+        initialQuestion = chatRecord[rawChatReader.INITIAL_QUESTION]
+        if initialQuestion == "":
+            transcript = chatRecord[rawChatReader.TRANSCRIPT]
+            dialogTurns = generateTranscriptDialogTurns(rawChatReader.transcriptLines(transcript))
+            initialQuestion = findInitialQuestionInDialog(dialogTurns,transIndex)
         else:
             initialQuestionCount+= 1
-            
-        transcriptDialogList.append([transIndex, initialQuestion, transDialogList])
+
+        yield [transIndex, initialQuestion]
         transIndex += 1
 
+    print("\nNumber of chats read:", transIndex - 2)
     print("Number of initial questions from Initial Question column of .csv:", initialQuestionCount)
-    
+
+def writeCleanQuestions(cleanedBatches):
+    """ Writes each (excel index, cleaned initial question) pair of the cleanQuestions of each
+        cleanQuestionBatch result in cleanedBatches to the question files, skipping questions with nothing
+        left after cleaning.  Saves the lemma cache and returns the number of questions written. """
     questionFile = open(QUESTION_ONLY_OUTPUT_FILE_NAME, "w")
     questionTxtFile = open(QUESTION_ONLY_OUTPUT_FILE_NAME_TXT, "w")
+    corpusWriter = None
+    if WRITE_BINARY_CORPUS:
+        corpusWriter = binaryCorpus.BinaryCorpusWriter(BINARY_CORPUS_NAME)
     questionCount = 0
-    for transcriptDialog in transcriptDialogList:
-        if transcriptDialog[1] is not None:
-            questionCount = writeInitialQuestion(transcriptDialog[0], questionFile, questionTxtFile, transcriptDialog[1], questionCount)
-
-    print("Total Question Count:", questionCount)
+    lemmaHits = 0
+    lemmaMisses = 0
+    for cleanQuestions, lemmaStats, stageStats in cleanedBatches:
+        for chatIndexInCSV, cleanQuestion in cleanQuestions:
+            if len(cleanQuestion) > 0:
+                questionFile.write(str(chatIndexInCSV)+","+cleanQuestion+"\n")
+                questionTxtFile.write(cleanQuestion+"\n")
+                if corpusWriter is not None:
+                    corpusWriter.addDocument(chatIndexInCSV, cleanQuestion)
+                questionCount += 1
+        lemmaHits += lemmaStats[0]
+        lemmaMisses += lemmaStats[1]
+        lemmatizer.addEntries(lemmaStats[2])  # lemmas found by the worker processes
+        stageProfiler.addStats(stageStats)  # stages run by the worker processes
     questionFile.close()
     questionTxtFile.close()
-    
-    return transcriptDialogList
-
-def readRawChats(inFile):
-    """
-        Reads .csv file and split into transcripts by splitting on the Timestamp which includes the Date.
-        The returned transcriptList is a list-of-lists where each "outer" list item contains information about
-        a single chat.  
-    """
-
-    inFile = open(inFile, "r")  # NOTE .csv file assumed to have column-headings line
-
-    dateAtStartCount = 0
-    transcriptList = []
-    currentTranscriptLines = []
-
-    for line in inFile:
-        frontOfLine = line[:6]
-        if frontOfLine.count("/") == 2:
-            dateAtStartCount += 1
-            if dateAtStartCount == 1: #ignore header line
-                currentTranscriptLines = [line.strip()]
-            else:
-                transcriptList.append(currentTranscriptLines)
-                currentTranscriptLines = [line.strip()]
-        else:
-            currentTranscriptLines.append(line.strip())
-    transcriptList.append(currentTranscriptLines)
-    
-    return transcriptList
+    if corpusWriter is not None:
+        corpusWriter.close()
+    lemmatizer.save(LEMMA_CACHE_FILE_NAME)
+    lemmaCache.printStats(lemmaHits, lemmaMisses, len(lemmatizer.lemmaDict), LEMMA_CACHE_FILE_NAME)
+    return questionCount
 
+def generateTranscriptDialogTurns(trans):
+    """ Generator that yields the chat dialog of the transcript lines trans one turn at a time, i.e., the
+        items of generateTranscriptDialogList(trans).  Each turn is yielded as soon as the time-stamp starting
+        the next one is found, so the transcript is only scanned as far as the turns asked for. """
+    transStr = " ".join(trans)  # merge transcript back to a single string
 
-def findInitialQuestion(transList, transIndex):
-    """
-        Takes in transList which is a list of strings containing the information about a single chat.
-        The index 0 string will contain the Initial Question field, which it returns if it exists; otherwise
-        None is returned."
-    """
-    
-    firstCommaIndex = transList[0].find(",")
-    if firstCommaIndex == -1:
-        print("First comma not found")
-        return None
+    #split by time-stamps to get the dialog turns
+    turnStart = None
+    for timeStampIndex in timeStamps.generateTimeStampIndexes(transStr):
+        if turnStart is not None:
+            yield transStr[turnStart:timeStampIndex]
+        turnStart = timeStampIndex
+    if turnStart is None:
+        yield transStr
     else:
-        secondCommaIndex = transList[0].find(",",firstCommaIndex+1)
-        if secondCommaIndex == -1:
-            print("Second comma not found")
-            return None
-        else:
-            thirdCommaIndex = transList[0].find(",",secondCommaIndex+1)
-            if thirdCommaIndex == -1:
-
-                thirdCommaIndex = len(transList[0])-1
-           
-            if secondCommaIndex + 1 == thirdCommaIndex:
-                return None
-            else:
-                return transList[0][secondCommaIndex+1:thirdCommaIndex]
+        yield transStr[turnStart:]
 
 def generateTranscriptDialogList(trans):
-    transcriptDialogList = []
-    transStr = " ".join(trans)  # merge transcript back to a single string
-
-    #split by time-stamps to get a dialogList
-    transTimeIndexList = []
-    for index in range(2,len(transStr)-6):
-        if transStr[index] == ":" and transStr[index+3] == ":" and transStr[index+1:index+3].isdigit() and transStr[index+4:index+6].isdigit():
-            transTimeIndexList.append(index-2)
-    dialogList = []
-    for i in range(len(transTimeIndexList)-1):
-        dialogList.append(transStr[transTimeIndexList[i]:transTimeIndexList[i+1]])
-    if len(transTimeIndexList) == 0:
-        dialogList.append(transStr)
-    else:
-        dialogList.append(transStr[transTimeIndexList[-1]:])
-    
-    return dialogList    
+    """ Returns the chat dialog of the transcript lines trans split by time-stamps into its turns. """
+    return list(generateTranscriptDialogTurns(trans))
 
-def findInitialQuestionInDialog(dialogList, chatIndex):
+def findInitialQuestionInDialog(dialogTurns, chatIndex):
     """ If the 'Initial question' column in the .csv file was empty, this function is called
-        to find and return the initial question from the chat dialog."""
-
-    for i in range(len(dialogList)):
-        helpYouCount = dialogList[i].lower().count("help you")
-        welcomeCount = dialogList[i].lower().count("welcome")
-        infoDeskCount = dialogList[i].lower().count("info desk")
+        to find and return the initial question from the chat dialog.  dialogTurns may be a generator, e.g.,
+        generateTranscriptDialogTurns, as no turn after the initial question is asked for."""
+
+    for dialogTurn in dialogTurns:
+        lowerDialogTurn = dialogTurn.lower()
+        helpYouCount = lowerDialogTurn.count("help you")
+        welcomeCount = lowerDialogTurn.count("welcome")
+        infoDeskCount = lowerDialogTurn.count("info desk")
         try:
-            if helpYouCount == 0 and welcomeCount == 0 and infoDeskCount == 0 and len(dialogList[i]) >= 40:
-                #questionFile.write(str(chatIndex)+" in ["+str(i)+"]"+dialogList[i]+"\n")
-                return dialogList[i]
+            if helpYouCount == 0 and welcomeCount == 0 and infoDeskCount == 0 and len(dialogTurn) >= 40:
+                #questionFile.write(str(chatIndex)+" in "+dialogTurn+"\n")
+                return dialogTurn
                 
         except:
             print("\n\nNO QUESTION FOUND! ",chatIndex)
             break
 
-def removeTags(fileStr):
-    current = 0
-    while True:
-        #print("Next char:",fileStr[current])
-        openAngleBracketIndex = fileStr.find('<',current)
-        if openAngleBracketIndex == -1:
-            break
-        spaceIndex = fileStr.find(' ', openAngleBracketIndex+1)
-        if spaceIndex == -1:
-            break
-        else:
-            current = spaceIndex
-        endStr = "</"+fileStr[openAngleBracketIndex+1:spaceIndex]+'>'
-
-        endIndex = fileStr.find(endStr, spaceIndex)
-        if endIndex == -1:
-            current = spaceIndex
-        else:
-            endIndex = endIndex+len(endStr)
-
-            #print(openAngleBracketIndex, endStr, endIndex+len(endStr))
-            fileStr = fileStr[:openAngleBracketIndex]+ \
-                      fileStr[endIndex:]
-            #print(fileStr)
-            current = openAngleBracketIndex
-    return fileStr
-
-def writeInitialQuestion(chatIndexInCSV, questionFile, questionTxtFile, question, questionCount):
-    """ Write a cleaned up version of the initial question to the question file. """
-
-    cleanQuestion = ""
-    question = question.lower()
-
-    colonCount = question.count(":")
-
-    if colonCount >= 3:  # time-stamp ##:##:## - person: question
-        colonOneIndex = question.find(":")
-        colonTwoIndex = question.find(":", colonOneIndex+1)
-        colonThreeIndex = question.find(":", colonTwoIndex+1)
-        question = question[colonThreeIndex+1:]
-    elif colonCount >= 1:
-        colonOneIndex = question.find(":")
-        question = question[colonOneIndex+1:]
-        
-    question = question.replace('&#x27;', "'")
-##    question = question.replace('&#x2F;', "/")  # replace with space since / used to separate words
-    question = question.replace('&#x2F;', " ")
-    question = question.replace('&nbsp;', " ")
-    question = question.replace('&quot;','"')
-
-    ### HERE CLEAN UP <xyz ......</xyz>, e.g., <a href.....</a>, <span ... </span>
-    question = removeTags(question)
-    
-    wordList = question.split()
-    for word in wordList:
-        cleanWord = ""
-        for char in word:
-            if char >= 'a' and char <= 'z':
-                cleanWord += char
-        if len(cleanWord) > 0:
-            cleanWord = lemmatizer.lemmatize(cleanWord)
-            if cleanWord not in stopWordsDict:
-                cleanQuestion += cleanWord + " "
-    if len(cleanQuestion) > 0:        
-        questionFile.write(str(chatIndexInCSV)+","+cleanQuestion[:-1]+"\n")
-        questionTxtFile.write(cleanQuestion[:-1]+"\n")
-        questionCount += 1
-
-    return questionCount
-    
-t = main()  # start main running
+def initCleaningWorker():
+    """ Runs once in each worker process so every worker holds its own lemmatizer. """
+    global lemmatizer
+    lemmatizer = lemmaCache.LemmaCache(nltk.WordNetLemmatizer(), LEMMA_CACHE_SIZE)
+    lemmatizer.load(LEMMA_CACHE_FILE_NAME)
+    if PROFILE_STAGES:
+        profileStages()
+
+def cleanQuestionBatch(transcriptDialogBatch):
+    """ Cleans the initial questions of a batch of chats (transcriptDialogList items, or any lists starting
+        with the excel index and initial question) and returns
+        [cleanQuestions, lemmaStats, stageStats] where cleanQuestions holds the excel index and cleaned initial
+        question of each chat, lemmaStats the lemma cache's takeStats() and stageStats the stage profiler's. """
+    cleanQuestions = [(transcriptDialog[0], cleanInitialQuestion(transcriptDialog[1]))
+                      for transcriptDialog in transcriptDialogBatch]
+    return [cleanQuestions, lemmatizer.takeStats(), stageProfiler.takeStats()]
+
+def cleanInitialQuestion(question):
+    """ Returns a cleaned up version of the initial question, an empty string if no words are left. """
+
+    cleanQuestion = []
+    for cleanWord in messageCleaning.cleanWords(messageCleaning.messageText(question)):
+        cleanWord = lemmatizer.lemmatize(cleanWord)
+        if cleanWord not in stopWordsDict:
+            cleanQuestion.append(cleanWord)
+    return " ".join(cleanQuestion)
+
+if __name__ == "__main__":
+    main()  # start main running
@@ -17,14 +17,62 @@
     2) wholeChatsFilePOS_N_ADJ_V.txt with only the processed text of each chat one per line
 
     Additional processing:  words are lemmatized using nltk.WordNetLemmatizer()
+
+    The chats are streamed through the read -> split dialog -> clean -> write stages one at a time,
+    so memory use stays flat however large the raw chat export is.  The .csv file is memory-mapped and
+    its quoted, multi-line fields parsed by rawChatReader.py.
+
+    Setting NUMBER_OF_WORKERS above 1 cleans the chats in a pool of worker processes.  The chats are
+    written back in their original order so the output files are identical to a serial run.
+
+    Setting PIPELINED to True runs the stages at the same time (see chatStreams.pipelinedBatchMap):  the
+    chats are read and split in a thread, cleaned by the NUMBER_OF_WORKERS worker processes and written in
+    another thread, with up to PIPELINE_QUEUE_BATCHES batches waiting between the stages.  The output files
+    are the same.
+
+    The POS tagger is loaded once per process and the sentences of CHATS_PER_BATCH chats are tagged
+    together in one call.  The number of tokens tagged per second is reported at the end of the run.
+
+    Lemmatization goes through a bounded LRU cache keyed on (word, POS) (see lemmaCache.py) which is
+    saved to LEMMA_CACHE_FILE_NAME at the end of a run so the next run starts warm.
+
+    The tagged sentences of each chat are cached on disk in CHAT_CACHE_DIRECTORY, keyed by a hash of the
+    chat's messages and TAGGING_SETTINGS, so rerunning a whole chat script after changing POS_LIST or the
+    stop words, or running another whole chat script, does not clean and tag the chats again.
+
+    Setting INCREMENTAL to True only processes the chats that are not yet in MANIFEST_FILE_NAME (see
+    chatManifest.py), e.g., the chats appended to the raw chat data .csv file since the last run, and appends
+    them to the existing output files.  The lines of a chat whose content changed since it was written are
+    rewritten in place.  Every run records the chats it writes in MANIFEST_FILE_NAME.
+
+    With WRITE_BINARY_CORPUS the chats are also written as a binary corpus of token ids (see binaryCorpus.py),
+    the files BINARY_CORPUS_NAME followed by _vocab.txt, _token_ids.int32, _doc_offsets.int64 and
+    _csv_line_index.int32, which the topic modeling scripts can memory-map.
+
+    Setting PROFILE_STAGES to True records the wall time, calls and tracemalloc peak of each stage, e.g.,
+    generateTranscriptDialogList, removeTags, POS tagging, lemmatization and writing the output files (see
+    stageProfiler.py), and writes them to PROFILE_REPORT_FILE_NAME as JSON at the end of the run.
 """
 
 import re
+import sys
+import multiprocessing
 import nltk
-import gensim
-from nltk.stem import WordNetLemmatizer
-
-lemmatizer = nltk.WordNetLemmatizer()
+from nltk.tag import PerceptronTagger
+from timeit import default_timer as timer
+
+import binaryCorpus
+import chatStreams
+import chatManifest
+import contentCache
+import lemmaCache
+import messageCleaning
+import rawChatReader
+import stageProfiler
+import tagStripping
+import timeStamps
+
+tagger = None  # POS tagger of this process, loaded by getTagger() when first needed
 
 # "constants"
 INPUT_CSV_FILE_NAME = "original_without_identifiable_info_chat_transcripts_9942_041015_053119.csv"
@@ -34,6 +82,35 @@ WHOLE_CHATS_OUTPUT_FILE_NAME_TXT = "wholeChatsFilePOS_N_ADJ.txt"
 POS_LIST = ['n','a']  # n - noun and a - adjective other possibilities: v -verb, r - adverb, 'other'
 STOP_WORD_FILE_NAME = "stop_words.txt"
 
+NUMBER_OF_WORKERS = 1  # worker processes used to clean chats, 1 cleans them serially in this process
+CHATS_PER_BATCH = 20  # chats POS tagged together in one call and handed to a worker process at a time
+PIPELINED = False  # True reads and writes the chats in threads of their own while worker processes clean them
+PIPELINE_QUEUE_BATCHES = 8  # batches of chats waiting between the stages when PIPELINED
+
+LEMMA_CACHE_FILE_NAME = "lemma_cache.txt"
+LEMMA_CACHE_SIZE = 100000  # maximum number of (word, POS) lemmas cached
+
+# directory of the content-addressed cache of the tagged sentences of each chat (see contentCache.py) shared
+# by the whole chat scripts, None to not cache them.  The cleaning and tagging of a chat only depend on its
+# messages and on TAGGING_SETTINGS, so changing POS_LIST or the stop words reuses the cached tagged sentences.
+CHAT_CACHE_DIRECTORY = "chat_cache"
+TAGGING_SETTINGS = "tagged sentences 1, words under 30 letters, nltk " + nltk.__version__
+
+INCREMENTAL = False  # True only processes the chats not in the manifest and appends them to the output files
+MANIFEST_FILE_NAME = WHOLE_CHATS_OUTPUT_FILE_NAME.replace(".csv", "_manifest.txt")
+
+WRITE_BINARY_CORPUS = True  # also write the chats as token ids with a vocabulary file (see binaryCorpus.py)
+BINARY_CORPUS_NAME = binaryCorpus.corpusName(WHOLE_CHATS_OUTPUT_FILE_NAME)
+
+PROFILE_STAGES = False  # True records the time, calls and memory of each stage, at some cost in speed
+PROFILE_REPORT_FILE_NAME = WHOLE_CHATS_OUTPUT_FILE_NAME.replace(".csv", "_profile.json")
+
+lemmatizer = lemmaCache.LemmaCache(nltk.WordNetLemmatizer(), LEMMA_CACHE_SIZE)
+
+chatCache = None
+if CHAT_CACHE_DIRECTORY is not None:
+    chatCache = contentCache.ContentCache(CHAT_CACHE_DIRECTORY, TAGGING_SETTINGS)
+
 def getStopWords(stopWordFileName):
     stopWordDict = {}
     stopWordFile = open(stopWordFileName, 'r')
@@ -49,91 +126,70 @@ stopWordsDict = getStopWords(STOP_WORD_FILE_NAME)
 
 
 def main():
-    transcriptList = readRawChats(INPUT_CSV_FILE_NAME)
+    if PROFILE_STAGES:
+        profileStages()
+    lemmatizer.load(LEMMA_CACHE_FILE_NAME)
+    chatRecords = rawChatReader.readChatRecords(INPUT_CSV_FILE_NAME)
+    transcriptDialogs = generateTranscriptDialogs(chatRecords)
+    chatLineFileNames = [WHOLE_CHATS_OUTPUT_FILE_NAME, WHOLE_CHATS_OUTPUT_FILE_NAME_TXT]
+    outputFileNames = []
+    if WRITE_BINARY_CORPUS:
+        outputFileNames = binaryCorpus.corpusFileNames(BINARY_CORPUS_NAME)
+    appendToFiles = INCREMENTAL and chatManifest.canAppend(MANIFEST_FILE_NAME, outputFileNames, chatLineFileNames)
+    changedChatIds = set()
+    if appendToFiles:
+        processedChats = chatManifest.readManifest(MANIFEST_FILE_NAME)
+        print(len(processedChats), "chats already processed according to", MANIFEST_FILE_NAME)
+        transcriptDialogs = chatManifest.generateUnprocessedChats(transcriptDialogs, processedChats, changedChatIds)
+    elif INCREMENTAL:
+        print("No", MANIFEST_FILE_NAME, "matching the output files to append to so all chats are processed")
+    writeWholeChatsToFile(transcriptDialogs, appendToFiles)
+    if changedChatIds:
+        print(len(changedChatIds), "chats changed since they were processed, their lines are rewritten")
+        chatManifest.rewriteChangedChats(MANIFEST_FILE_NAME, chatLineFileNames, changedChatIds)
+        if WRITE_BINARY_CORPUS:
+            binaryCorpus.writeCsvCorpus(BINARY_CORPUS_NAME, chatLineFileNames[0])
+    if PROFILE_STAGES:
+        stageProfiler.writeReport(PROFILE_REPORT_FILE_NAME, __file__)
+
+def profileStages():
+    """ Starts the stage profiler in this process and instruments the stages of this script. """
+    stageProfiler.start()
+    stageProfiler.instrument(rawChatReader, ["readChatRecords"])
+    stageProfiler.instrument(sys.modules[__name__], ["generateTranscriptDialogs", "generateTranscriptDialogList",
+                                                     "tagChatBatch", "splitMessageIntoSentences", "tagSentences",
+                                                     "preprocess", "writeCleanedChats"])
+    stageProfiler.instrument(messageCleaning, ["messageText", "sentenceWords", "simplePreprocess"])
+    stageProfiler.instrument(tagStripping, ["removeTags"])
+    stageProfiler.instrument(lemmatizer, ["lemmatize"])
+
+def generateTranscriptDialogs(chatRecords):
+    """ Generator that splits the Transcript of each chat yielded by rawChatReader.readChatRecords into its
+        chat dialog and yields [<excel index int>, "Initial question string", [Transcript split by chat
+        responses], "Timestamp"] for it, i.e., the items of the transcriptDialogList described above one at
+        a time followed by the chat's Timestamp column.
+    """
     initialQuestionCount = 0
     transIndex = 2  # Assumes Excel .cvs had a column-header in line 1
-    transcriptDialogList = []
-    for trans in transcriptList:
-        transDialogList = generateTranscriptDialogList(trans)
-        initialQuestion = findInitialQuestion(trans, transIndex)
-        if initialQuestion == None:
-            initialQuestion = findInitialQuestionInDialog(transDialogList,transIndex)           
+    for chatRecord in chatRecords:
+        transcript = chatRecord[rawChatReader.TRANSCRIPT]
+        transDialogList = generateTranscriptDialogList(rawChatReader.transcriptLines(transcript))
+        initialQuestion = chatRecord[rawChatReader.INITIAL_QUESTION]
+        if initialQuestion == "":
+            initialQuestion = findInitialQuestionInDialog(transDialogList,transIndex)
         else:
             initialQuestionCount+= 1
-            
-        transcriptDialogList.append([transIndex, initialQuestion, transDialogList])
-        transIndex += 1
-    writeWholeChatsToFile(transcriptDialogList)
-    
-    return transcriptDialogList
-
-def readRawChats(inFile):
-    """
-        Reads .csv file and split into transcripts by splitting on the Timestamp which includes the Date.
-        The returned transcriptList is a list-of-lists where each "outer" list item contains information about
-        a single chat.  
-    """
-
-    inFile = open(inFile, "r")  # NOTE .csv file assumed to have column-headings line
-
-    dateAtStartCount = 0
-    transcriptList = []
-    currentTranscriptLines = []
-
-    for line in inFile:
-        frontOfLine = line[:6]
-        if frontOfLine.count("/") == 2:
-            dateAtStartCount += 1
-            if dateAtStartCount == 1: #ignore header line
-                currentTranscriptLines = [line.strip()]
-            else:
-                transcriptList.append(currentTranscriptLines)
-                currentTranscriptLines = [line.strip()]
-        else:
-            currentTranscriptLines.append(line.strip())
-    transcriptList.append(currentTranscriptLines)
-    
-    return transcriptList
 
+        yield [transIndex, initialQuestion, transDialogList, chatRecord[rawChatReader.TIMESTAMP]]
+        transIndex += 1
 
-def findInitialQuestion(transList, transIndex):
-    """
-        Takes in transList which is a list of strings containing the information about a single chat.
-        The index 0 string will contain the Initial Question field, which it returns if it exists; otherwise
-        None is returned."
-    """
-    
-    firstCommaIndex = transList[0].find(",")
-    if firstCommaIndex == -1:
-        print("First comma not found")
-        return None
-    else:
-        secondCommaIndex = transList[0].find(",",firstCommaIndex+1)
-        if secondCommaIndex == -1:
-            print("Second comma not found")
-            return None
-        else:
-            thirdCommaIndex = transList[0].find(",",secondCommaIndex+1)
-            if thirdCommaIndex == -1:
-                thirdCommaIndex = len(transList[0])-1
-           
-            #print(secondCommaIndex, thirdCommaIndex)
-            if secondCommaIndex + 1 == thirdCommaIndex:
-                return None
-            else:
-                return transList[0][secondCommaIndex+1:thirdCommaIndex]
-
-            
 def generateTranscriptDialogList(trans):
     
     transcriptDialogList = []
     transStr = " ".join(trans)  # merge transcript back to a single string
 
     #split by time-stamps to get a dialogList
-    transTimeIndexList = []
-    for index in range(2,len(transStr)-6):
-        if transStr[index] == ":" and transStr[index+3] == ":" and transStr[index+1:index+3].isdigit() and transStr[index+4:index+6].isdigit():
-            transTimeIndexList.append(index-2)
+    transTimeIndexList = timeStamps.findTimeStampIndexes(transStr)
     dialogList = []
     for i in range(len(transTimeIndexList)-1):
         dialogList.append(transStr[transTimeIndexList[i]:transTimeIndexList[i+1]])
@@ -160,33 +216,6 @@ def findInitialQuestionInDialog(dialogList, chatIndex):
             print("\n\nNO QUESTION FOUND! ",chatIndex)
             break
 
-def removeTags(fileStr):
-    current = 0
-    while True:
-        #print("Next char:",fileStr[current])
-        openAngleBracketIndex = fileStr.find('<',current)
-        if openAngleBracketIndex == -1:
-            break
-        spaceIndex = fileStr.find(' ', openAngleBracketIndex+1)
-        if spaceIndex == -1:
-            break
-        else:
-            current = spaceIndex
-        endStr = "</"+fileStr[openAngleBracketIndex+1:spaceIndex]+'>'
-
-        endIndex = fileStr.find(endStr, spaceIndex)
-        if endIndex == -1:
-            current = spaceIndex
-        else:
-            endIndex = endIndex+len(endStr)
-
-            #print(openAngleBracketIndex, endStr, endIndex+len(endStr))
-            fileStr = fileStr[:openAngleBracketIndex]+ \
-                      fileStr[endIndex:]
-            #print(fileStr)
-            current = openAngleBracketIndex
-    return fileStr
-
 
 """
 NOTE: The nltk.pos_tag function returns the Penn Treebank tag for the word but we just want
@@ -210,105 +239,198 @@ def simplify(penn_tag):
     else:
         return 'other'
 
-def preprocess(text, stop_words):
-    """ Preprocesses the text to remove stopwords, lemmatizes each word and only includes
+def getTagger():
+    """ Returns the POS tagger of this process, loading it the first time it is needed.
+        Tagging with it gives the same tags as nltk.pos_tag."""
+    global tagger
+    if tagger is None:
+        tagger = PerceptronTagger()
+    return tagger
+
+def initCleaningWorker():
+    """ Runs once in each worker process so every worker holds its own POS tagger and lemmatizer. """
+    global lemmatizer, tagger
+    lemmatizer = lemmaCache.LemmaCache(nltk.WordNetLemmatizer(), LEMMA_CACHE_SIZE)
+    lemmatizer.load(LEMMA_CACHE_FILE_NAME)
+    tagger = PerceptronTagger()
+    if PROFILE_STAGES:
+        profileStages()
+
+def preprocess(taggedSentence, stop_words):
+    """ Preprocesses a POS tagged sentence to remove stopwords, lemmatizes each word and only includes
         words that are POS in the global POS_LIST"""
 
-    toks = gensim.utils.simple_preprocess(str(text), deacc=True)
-    wn = WordNetLemmatizer()
-    return [wn.lemmatize(tok, simplify(pos)) for tok, pos in nltk.pos_tag(toks)
+    return [lemmatizer.lemmatize(tok, simplify(pos)) for tok, pos in taggedSentence
             if tok not in stop_words and simplify(pos) in POS_LIST]
         
-def writeInitialQuestion(questionFile,  wholeChatsFileTxt, question):
-    """ Write a cleaned up version of the initial question to the question file. """
-    cleanQuestion = ""
-    question = question.lower()
-
-    colonCount = question.count(":")
-
-    if colonCount >= 3:  # time-stamp ##:##:## - person: question
-        colonOneIndex = question.find(":")
-        colonTwoIndex = question.find(":", colonOneIndex+1)
-        colonThreeIndex = question.find(":", colonTwoIndex+1)
-        question = question[colonThreeIndex+1:]
-    elif colonCount >= 1:
-        colonOneIndex = question.find(":")
-        question = question[colonOneIndex+1:]
-        
-    question = question.replace('&#x27;', "'")
-    question = question.replace('&#x2F;', " ")
-    question = question.replace('&nbsp;', " ")
-    question = question.replace('&quot;','"')
-
-    ### HERE CLEAN UP <xyz ......</xyz>, e.g., <a href.....</a>, <span ... </span>
-
-    question = removeTags(question)
-    question = question.replace('.','Z')
-    question = question.replace('!','Z')
-    question = question.replace('?','Z')
-    
-    masterWordList = []
-    sentenceList = question.split("Z")
-    for question in sentenceList:
-        wordList = question.split()
-        cleanQuestion = ""
-        for word in wordList:
-            cleanWord = ""
-            for char in word:
-                if char >= 'a' and char <= 'z':
-                    cleanWord += char
-            if len(cleanWord) > 0 and len(cleanWord) < 30:  #upper bound to eliminate url's
-                cleanQuestion += lemmatizer.lemmatize(cleanWord) + " "
-        pos_wordList = preprocess(cleanQuestion, stopWordsDict)
-          
-        masterWordList.extend(pos_wordList)
-    chatCleaned = " ".join(masterWordList)
-    questionFile.write(chatCleaned)
-    wholeChatsFileTxt.write(chatCleaned)
-
-def writeChatDialog(excelLineNumber, wholeChatsFile,  wholeChatsFileTxt, dialogList):
-    """ Writes a chat's dialog to a line in the text file. """
-    for i in range(len(dialogList)):
-        helpYouCount = dialogList[i].lower().count("help you")
-        welcomeCount = dialogList[i].lower().count("welcome")
-        infoDeskCount = dialogList[i].lower().count("info desk")
-            
-        writeInitialQuestion(wholeChatsFile,  wholeChatsFileTxt, dialogList[i])
-        wholeChatsFile.write(" ")  # separate end of this line with start of next line
-        wholeChatsFileTxt.write(" ")  # separate end of this line with start of next line
-        
-   
-def writeWholeChatsToFile(transcriptDialogList):
+def splitMessageIntoSentences(question):
+    """ Cleans up the initial question (or any other message of a chat) and returns the tokens of each of
+        its sentences, ready to be POS tagged. """
+    sentenceTokensList = []
+    for sentenceWords in messageCleaning.sentenceWords(messageCleaning.messageText(question)):
+        lemmas = [lemmatizer.lemmatize(cleanWord) for cleanWord in sentenceWords
+                  if len(cleanWord) < 30]  #upper bound to eliminate url's
+        sentenceTokensList.append(messageCleaning.simplePreprocess(lemmas))
+    return sentenceTokensList
+
+def chatMessages(transcriptDialog):
+    """ Returns the list of messages of a chat to be cleaned.  transcriptDialog is a
+        [<excel index int>, "Initial question string", dialogList] item of transcriptDialogList. """
+    messages = []
+
+    # check to see if initial question is already in the chat dialog
+    timeStampAndNameList = re.findall(r'[0-9][0-9]:[0-9][0-9]:[0-9][0-9] - [\w\s]+:', transcriptDialog[1])
+
+    if len(timeStampAndNameList) == 0:  # no time-stamp so from 'initial question' column of .csv
+        # write initial question to file since it is not part of the chat dialog
+        messages.append(transcriptDialog[1])
+    messages.extend(transcriptDialog[2])
+    return messages
+
+def tagSentences(sentenceTokensList):
+    """ The tagging stage:  POS tags every sentence of sentenceTokensList in one call to the tagger of
+        this process, giving the same tags as calling nltk.pos_tag on each sentence. """
+    return getTagger().tag_sents(sentenceTokensList)
+
+def tagChatBatch(transcriptDialogBatch):
+    """ The cleaning and tagging stages for a batch of chats (transcriptDialogList items).  Returns
+        [batchTaggedSentences, taggedTokenCount, taggingSeconds] where batchTaggedSentences holds, for each
+        chat, for each message, the POS tagged sentences.  The tagged sentences of chats already in the chat
+        cache are read from it and the sentences of all the other chats in the batch are POS tagged together
+        by one call to tagSentences and added to the cache.
+    """
+    batchMessages = [chatMessages(transcriptDialog) for transcriptDialog in transcriptDialogBatch]
+    if chatCache is None:
+        chatKeys = [None for messages in batchMessages]
+        batchTaggedSentences = [None for messages in batchMessages]
+    else:
+        chatKeys = [chatCache.key(messages) for messages in batchMessages]
+        batchTaggedSentences = [chatCache.get(chatKey) for chatKey in chatKeys]
+
+    batchSentences = {}  # for each chat not in the cache, for each message, the token list of each sentence
+    for i, messages in enumerate(batchMessages):
+        if batchTaggedSentences[i] is None:
+            batchSentences[i] = [splitMessageIntoSentences(message) for message in messages]
+    sentenceTokensList = [sentenceTokens for chatSentences in batchSentences.values()
+                          for messageSentences in chatSentences for sentenceTokens in messageSentences]
+
+    start = timer()
+    taggedSentences = iter(tagSentences(sentenceTokensList))
+    taggingSeconds = timer() - start
+    taggedTokenCount = sum(len(sentenceTokens) for sentenceTokens in sentenceTokensList)
+
+    for i, chatSentences in batchSentences.items():
+        batchTaggedSentences[i] = [[next(taggedSentences) for sentenceTokens in messageSentences]
+                                   for messageSentences in chatSentences]
+        if chatCache is not None:
+            chatCache.put(chatKeys[i], batchTaggedSentences[i])
+    return [batchTaggedSentences, taggedTokenCount, taggingSeconds]
+
+def cleanChatBatch(transcriptDialogBatch):
+    """ Cleans a batch of chats (transcriptDialogList items) and returns [cleanedChats, taggedTokenCount,
+        taggingSeconds, lemmaStats, chatCacheStats, stageStats] where cleanedChats holds the excel index, the
+        manifest line and the cleaned text of each chat exactly as they are written to the output files,
+        lemmaStats the lemma cache's takeStats(), chatCacheStats the chat cache's and stageStats the stage
+        profiler's.
+    """
+    batchTaggedSentences, taggedTokenCount, taggingSeconds = tagChatBatch(transcriptDialogBatch)
+
+    cleanedChats = []
+    for transcriptDialog, chatTaggedSentences in zip(transcriptDialogBatch, batchTaggedSentences):
+        chatCleaned = ""
+        for messageTaggedSentences in chatTaggedSentences:
+            masterWordList = []
+            for taggedSentence in messageTaggedSentences:
+                masterWordList.extend(preprocess(taggedSentence, stopWordsDict))
+            chatCleaned += " ".join(masterWordList) + " "  # separate end of this line with start of next line
+        cleanedChats.append((transcriptDialog[0], chatManifest.chatKey(transcriptDialog), chatCleaned))
+    return [cleanedChats, taggedTokenCount, taggingSeconds, lemmatizer.takeStats(), takeChatCacheStats(),
+            stageProfiler.takeStats()]
+
+def takeChatCacheStats():
+    """ Returns the chat cache's takeStats(), [0, 0] if chats are not cached. """
+    if chatCache is None:
+        return [0, 0]
+    return chatCache.takeStats()
+
+def writeWholeChatsToFile(transcriptDialogs, appendToFiles):
     """ Writes a whole chat's dialog one per line to a text file.  Removed from
         the line of text is:
         1) time-stamps and names:  e.g., '13:45:42 - Jordan:'
         2) all punctuations
+        transcriptDialogs is an iterable (e.g., the generateTranscriptDialogs generator) of the
+        transcriptDialogList items and each chat is written as soon as it is cleaned.
+        With NUMBER_OF_WORKERS > 1 or PIPELINED the chats are cleaned by a pool of worker processes and
+        written back in their original order.  With appendToFiles the chats are appended to the output
+        files and manifest instead of replacing them.
     """
+    chatsToWrite = (transcriptDialog for transcriptDialog in transcriptDialogs
+                    if transcriptDialog[1] is not None)
+
+    if PIPELINED:
+        with multiprocessing.Pool(NUMBER_OF_WORKERS, initializer=initCleaningWorker) as pool:
+            wholeChatsCount = chatStreams.pipelinedBatchMap(
+                pool, cleanChatBatch, chatsToWrite, CHATS_PER_BATCH, 2 * NUMBER_OF_WORKERS,
+                lambda cleanedBatches: writeCleanedChats(cleanedBatches, appendToFiles), PIPELINE_QUEUE_BATCHES)
+    elif NUMBER_OF_WORKERS > 1:
+        with multiprocessing.Pool(NUMBER_OF_WORKERS, initializer=initCleaningWorker) as pool:
+            cleanedBatches = chatStreams.orderedParallelBatchMap(pool, cleanChatBatch, chatsToWrite,
+                                                                 CHATS_PER_BATCH, 2 * NUMBER_OF_WORKERS)
+            wholeChatsCount = writeCleanedChats(cleanedBatches, appendToFiles)
+    else:
+        cleanedBatches = map(cleanChatBatch, chatStreams.chunked(chatsToWrite, CHATS_PER_BATCH))
+        wholeChatsCount = writeCleanedChats(cleanedBatches, appendToFiles)
+    print("Whole Chats Count:", wholeChatsCount)
 
-    wholeChatsFile = open(WHOLE_CHATS_OUTPUT_FILE_NAME, "w")
-    wholeChatsFileTxt = open(WHOLE_CHATS_OUTPUT_FILE_NAME_TXT, "w")
+def writeCleanedChats(cleanedBatches, appendToFiles):
+    """ Writes each (excel index, manifest line, cleaned chat text) of the cleanedChats of each cleanChatBatch result
+        in cleanedBatches to a line of the output files and records the chat in the manifest, appending to the
+        files if appendToFiles.  Reports the tagging speed and lemma cache hit rate, saves the lemma cache and
+        returns the number of chats written. """
+    fileMode = "a" if appendToFiles else "w"
+    wholeChatsFile = open(WHOLE_CHATS_OUTPUT_FILE_NAME, fileMode)
+    wholeChatsFileTxt = open(WHOLE_CHATS_OUTPUT_FILE_NAME_TXT, fileMode)
+    manifestFile = open(MANIFEST_FILE_NAME, fileMode)
+    corpusWriter = None
+    if WRITE_BINARY_CORPUS:
+        corpusWriter = binaryCorpus.BinaryCorpusWriter(BINARY_CORPUS_NAME, appendToFiles)
     wholeChatsCount = 0
-    for transcriptDialog in transcriptDialogList:
-
-        if transcriptDialog[1] is not None:
-            wholeChatsFile.write(str(transcriptDialog[0])+",")
-
-            # check to see if initial question is already in the chat dialog
-            timeStampAndNameList = re.findall(r'[0-9][0-9]:[0-9][0-9]:[0-9][0-9] - [\w\s]+:', transcriptDialog[1])
-            
-            if len(timeStampAndNameList) == 0:  # no time-stamp so from 'initial question' column of .csv
-                # write initial question to file since it is not part of the chat dialog
-                writeInitialQuestion(wholeChatsFile, wholeChatsFileTxt, transcriptDialog[1])
-                wholeChatsFile.write(" ")
-                wholeChatsFileTxt.write(" ")
-            writeChatDialog(transcriptDialog[0],wholeChatsFile,  wholeChatsFileTxt, transcriptDialog[2])
-            
-            #wholeChatsFile.write("\n")
+    totalTaggedTokens = 0
+    totalTaggingSeconds = 0.0
+    lemmaHits = 0
+    lemmaMisses = 0
+    chatCacheHits = 0
+    chatCacheMisses = 0
+    for cleanedChats, taggedTokenCount, taggingSeconds, lemmaStats, chatCacheStats, stageStats in cleanedBatches:
+        for transIndex, manifestKey, chatCleaned in cleanedChats:
+            wholeChatsFile.write(str(transIndex)+","+chatCleaned+"\n")
+            wholeChatsFileTxt.write(chatCleaned+"\n")
+            manifestFile.write(manifestKey+"\n")
+            if corpusWriter is not None:
+                corpusWriter.addDocument(transIndex, chatCleaned)
             wholeChatsCount += 1
-            wholeChatsFile.write("\n")
-            wholeChatsFileTxt.write("\n")
-    print("Whole Chats Count:", wholeChatsCount)
+        totalTaggedTokens += taggedTokenCount
+        totalTaggingSeconds += taggingSeconds
+        lemmaHits += lemmaStats[0]
+        lemmaMisses += lemmaStats[1]
+        lemmatizer.addEntries(lemmaStats[2])  # lemmas found by the worker processes
+        chatCacheHits += chatCacheStats[0]
+        chatCacheMisses += chatCacheStats[1]
+        stageProfiler.addStats(stageStats)  # stages run by the worker processes
     wholeChatsFile.close()
     wholeChatsFileTxt.close()
-    
-t = main()  # start main running
+    manifestFile.close()
+    if corpusWriter is not None:
+        corpusWriter.close()
+    lemmatizer.save(LEMMA_CACHE_FILE_NAME)
+
+    # with several worker processes the seconds are summed over the workers, i.e., this is tokens/sec per worker
+    print("POS tagged %d tokens in %.2f seconds: %.0f tokens/sec"
+          % (totalTaggedTokens, totalTaggingSeconds, totalTaggedTokens / max(totalTaggingSeconds, 1e-9)))
+    lemmaCache.printStats(lemmaHits, lemmaMisses, len(lemmatizer.lemmaDict), LEMMA_CACHE_FILE_NAME)
+    if chatCache is not None:
+        contentCache.printStats(chatCacheHits, chatCacheMisses, CHAT_CACHE_DIRECTORY)
+    return wholeChatsCount
+
+if __name__ == "__main__":
+    main()  # start main running
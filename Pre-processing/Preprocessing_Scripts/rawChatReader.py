@@ -0,0 +1,119 @@
+""" File:  rawChatReader.py
+    Description:  Reads the raw chat data .csv file exported from LibChat, e.g.,
+    original_without_identifiable_info_chat_transcripts_9942_041015_053119.csv, with columns:
+    Timestamp, Duration (seconds), Initial Question, Message Count, Transcript
+
+    The file is memory-mapped and scanned for the fields and records with precompiled regular expressions
+    over the raw bytes, so a multi-GB export is parsed without reading it into Python strings:  only the
+    fields of the chat being yielded are decoded.  Fields are parsed as in any .csv file, i.e., a field may
+    be quoted, a quoted field may contain commas and line breaks (the Transcript always does) and "" inside
+    a quoted field stands for ".  This replaces finding the start of each chat by a date at the start of a
+    line and splitting the first line of a chat on its commas, which went wrong when a transcript line
+    started with a date or an Initial Question contained a comma.
+
+    Where the OS supports it, it is asked to read the file READ_AHEAD_BYTES ahead of the parsing in the
+    background, so the parsing seldom stops to wait for the file, e.g., on a slow network share.  Waiting
+    for a page of a memory-mapped file holds up the other threads of the process too, as it happens inside
+    the regular expression matching.
+"""
+
+import mmap
+import re
+
+# index of each column in the fields of a chat
+TIMESTAMP = 0
+DURATION = 1
+INITIAL_QUESTION = 2
+MESSAGE_COUNT = 3
+TRANSCRIPT = 4
+NUMBER_OF_COLUMNS = 5
+
+QUOTED_FIELD_PATTERN = re.compile(rb'"([^"]*(?:""[^"]*)*)"')
+UNQUOTED_FIELD_PATTERN = re.compile(rb'[^,\r\n]*')
+
+# a whole line of NUMBER_OF_COLUMNS fields, each quoted or without quotes, matched in one step; other lines
+# are parsed a field at a time by parseRecord
+FIELD = rb'("[^"]*(?:""[^"]*)*"|[^,"\r\n]*)'
+RECORD_PATTERN = re.compile(rb",".join([FIELD] * NUMBER_OF_COLUMNS) + rb"(?:\r\n|\n|\r|$)")
+LINE_BREAK_PATTERN = re.compile(r"\r\n|\r|\n")
+
+READ_AHEAD_BYTES = 1 << 24  # bytes of the file the OS is asked to read in ahead of the parsing
+
+
+def readChatRecords(fileName, encoding='utf-8'):
+    """ Generator that yields the [Timestamp, Duration (seconds), Initial Question, Message Count, Transcript]
+        fields of each chat in the raw chat data .csv file fileName, skipping its column-headings line and
+        blank lines.  A line with more fields, e.g., an Initial Question with unquoted commas, has its middle
+        fields joined back into the Initial Question and a line with fewer has empty fields added. """
+    dataFile = open(fileName, 'rb')
+    try:
+        data = mmap.mmap(dataFile.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # an empty file cannot be memory-mapped
+        dataFile.close()
+        return
+    try:
+        position = parseRecord(data, 0)[1]  # skip the column headings
+        dataLength = len(data)
+        readAheadPosition = 0
+        while position < dataLength:
+            if position >= readAheadPosition:
+                readAheadPosition = adviseReadAhead(data, position)
+            match = RECORD_PATTERN.match(data, position)
+            if match is None:
+                fields, position = parseRecord(data, position)
+                if fields != [b""]:
+                    yield chatFields([field.decode(encoding, 'replace') for field in fields])
+            else:
+                position = match.end()
+                yield [(field[1:-1].replace(b'""', b'"') if field[:1] == b'"' else field).decode(encoding, 'replace')
+                       for field in match.groups()]
+    finally:
+        data.close()
+        dataFile.close()
+
+def adviseReadAhead(data, position):
+    """ Asks the OS to read the READ_AHEAD_BYTES of the memory-mapped file data from position into memory in
+        the background, if it can, and returns the position at which to ask again. """
+    if hasattr(mmap, "MADV_WILLNEED"):  # Python 3.8+ on Unix-like systems
+        start = position - position % mmap.PAGESIZE
+        data.madvise(mmap.MADV_WILLNEED, start, min(READ_AHEAD_BYTES, len(data) - start))
+    return position + READ_AHEAD_BYTES // 2
+
+def parseRecord(data, position):
+    """ Parses the record (line of fields) of data starting at position and returns [fields, position of the
+        next record]. """
+    fields = []
+    while True:
+        match = QUOTED_FIELD_PATTERN.match(data, position)
+        if match is None:  # unquoted, or a quote that is never closed taken as text
+            match = UNQUOTED_FIELD_PATTERN.match(data, position)
+            field = match.group()
+        else:
+            field = match.group(1).replace(b'""', b'"')
+        position = match.end()
+        if position < len(data) and data[position] not in b',\r\n':  # text after the closing quote
+            match = UNQUOTED_FIELD_PATTERN.match(data, position)
+            field += match.group()
+            position = match.end()
+        fields.append(field)
+        if position < len(data) and data[position] == ord(','):
+            position += 1
+        else:
+            break
+    if data[position:position+2] == b'\r\n':
+        position += 2
+    elif position < len(data):
+        position += 1
+    return [fields, position]
+
+def chatFields(fields):
+    """ Returns the fields of a line as the NUMBER_OF_COLUMNS columns of a chat. """
+    if len(fields) > NUMBER_OF_COLUMNS:
+        extraFieldCount = len(fields) - NUMBER_OF_COLUMNS
+        initialQuestion = ",".join(fields[INITIAL_QUESTION:INITIAL_QUESTION+extraFieldCount+1])
+        fields = fields[:INITIAL_QUESTION] + [initialQuestion] + fields[INITIAL_QUESTION+extraFieldCount+1:]
+    return fields + [""] * (NUMBER_OF_COLUMNS - len(fields))
+
+def transcriptLines(transcript):
+    """ Returns the lines of a Transcript field with the white space at both ends of each line removed. """
+    return [line.strip() for line in LINE_BREAK_PATTERN.split(transcript)]
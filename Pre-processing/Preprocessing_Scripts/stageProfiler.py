@@ -0,0 +1,173 @@
+""" File:  stageProfiler.py
+    Description:  Opt-in profiler of the stages of a preprocessing script, e.g., generateTranscriptDialogList,
+    removeTags, POS tagging, lemmatization and writing the output files.  For each stage it records the
+    number of calls, the wall time with and without the time spent in the other stages it calls, and the
+    tracemalloc peak, i.e., the most memory allocated during a call above what was allocated when it started.
+
+    A script turns it on by calling start() and then instrument() for the functions that are its stages,
+    which replaces each one by a wrapper recording it.  Nothing is replaced while the profiler is off, so it
+    then costs nothing.  A generator function's calls are the items it is asked for.  Tracing the
+    allocations slows Python down, so the times are for comparing the stages with each other rather than
+    with a run without the profiler.
+
+    Worker processes send their stage statistics back with each batch of chats (takeStats()) for the main
+    process to add to its own (addStats()), which writes them as a JSON report at the end of the run.  The
+    function returning a batch's statistics is therefore not itself a stage, as its call only ends after
+    them.
+
+    The stages of a pipelined run (see chatStreams.pipelinedBatchMap) run in several threads, each with its
+    own nesting of stages.  tracemalloc only has one peak for the whole process though, so a stage's peak
+    then also counts what the other threads allocated while it ran.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import tracemalloc
+from timeit import default_timer as timer
+
+# index of each statistic of a stage in stageStats
+CALLS = 0
+SECONDS = 1
+SELF_SECONDS = 2
+PEAK_BYTES = 3
+
+stageStats = {}  # stage name -> [calls, seconds, self seconds, peak bytes], empty while the profiler is off
+statsLock = threading.Lock()  # held while stageStats is changed, as stages may run in several threads
+threadStages = threading.local()  # .stack of each thread holds [start time, traced bytes at start, peak bytes
+                                  # of nested stages, seconds of nested stages] of each of its stage calls in
+                                  # progress, innermost last
+startTime = None
+runPeakBytes = 0  # tracemalloc peak of the run before the latest reset_peak()
+
+
+def start():
+    """ Starts tracing allocations and recording the instrumented stages of this process from scratch. """
+    global startTime, runPeakBytes
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    stageStats.clear()
+    threadStages.stack = []
+    startTime = timer()
+    runPeakBytes = 0
+
+def instrument(owner, functionNames):
+    """ Replaces each function functionNames of owner, a module or an object, by a wrapper recording its
+        calls as a stage named after the file and qualified name of the function, e.g.,
+        "tagStripping.removeTags" or "lemmaCache.LemmaCache.lemmatize".  Functions already instrumented are
+        left as they are. """
+    for functionName in functionNames:
+        function = getattr(owner, functionName)
+        if hasattr(function, "stageName"):
+            continue
+        fileName = os.path.splitext(os.path.basename(inspect.getfile(function)))[0]
+        stageName = fileName + "." + function.__qualname__
+        if inspect.isgeneratorfunction(function):
+            wrapper = generatorStageWrapper(stageName, function)
+        else:
+            wrapper = stageWrapper(stageName, function)
+        wrapper.stageName = stageName
+        setattr(owner, functionName, wrapper)
+
+def stageWrapper(stageName, function):
+    """ Returns a wrapper of function recording each call as stageName. """
+    @functools.wraps(function)  # keeps its name so a wrapped batch function can be sent to worker processes
+    def wrapper(*args, **kwargs):
+        enterStage()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            exitStage(stageName)
+    return wrapper
+
+def generatorStageWrapper(stageName, generatorFunction):
+    """ Returns a wrapper of generatorFunction recording the work for each item as a call of stageName. """
+    @functools.wraps(generatorFunction)
+    def wrapper(*args, **kwargs):
+        generator = generatorFunction(*args, **kwargs)
+        while True:
+            enterStage()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                exitStage(stageName)
+            yield item
+    return wrapper
+
+def getStageStack():
+    """ Returns the stack of the stage calls in progress in this thread. """
+    stageStack = getattr(threadStages, "stack", None)
+    if stageStack is None:
+        stageStack = threadStages.stack = []
+    return stageStack
+
+def enterStage():
+    global runPeakBytes
+    stageStack = getStageStack()
+    tracedBytes, peakBytes = tracemalloc.get_traced_memory()
+    runPeakBytes = max(runPeakBytes, peakBytes)
+    if len(stageStack) > 0:  # the peak is reset for this stage, so keep the enclosing stage's so far
+        stageStack[-1][2] = max(stageStack[-1][2], peakBytes)
+    tracemalloc.reset_peak()
+    stageStack.append([timer(), tracedBytes, 0, 0.0])
+
+def exitStage(stageName):
+    seconds = timer()
+    stageStack = getStageStack()
+    startSeconds, startBytes, nestedPeakBytes, nestedSeconds = stageStack.pop()
+    seconds -= startSeconds
+    peakBytes = max(tracemalloc.get_traced_memory()[1], nestedPeakBytes)
+
+    with statsLock:
+        stats = stageStats.get(stageName)
+        if stats is None:
+            stats = stageStats[stageName] = [0, 0.0, 0.0, 0]
+        stats[CALLS] += 1
+        stats[SECONDS] += seconds
+        stats[SELF_SECONDS] += seconds - nestedSeconds
+        stats[PEAK_BYTES] = max(stats[PEAK_BYTES], peakBytes - startBytes)
+    if len(stageStack) > 0:
+        stageStack[-1][2] = max(stageStack[-1][2], peakBytes)
+        stageStack[-1][3] += seconds
+
+def takeStats():
+    """ Returns the stage statistics since the previous call and starts counting again.  Worker processes
+        send these back with each batch of chats;  while the profiler is off they are empty. """
+    with statsLock:
+        if len(stageStats) == 0:
+            return {}
+        stats = dict(stageStats)
+        stageStats.clear()
+    return stats
+
+def addStats(stats):
+    """ Adds the stage statistics returned by takeStats(), e.g., in a worker process, to this process's. """
+    with statsLock:
+        for stageName, (calls, seconds, selfSeconds, peakBytes) in stats.items():
+            ownStats = stageStats.get(stageName)
+            if ownStats is None:
+                ownStats = stageStats[stageName] = [0, 0.0, 0.0, 0]
+            ownStats[CALLS] += calls
+            ownStats[SECONDS] += seconds
+            ownStats[SELF_SECONDS] += selfSeconds
+            ownStats[PEAK_BYTES] = max(ownStats[PEAK_BYTES], peakBytes)
+
+def writeReport(fileName, scriptName):
+    """ Writes the statistics of every stage, slowest first, to the JSON file fileName.  The seconds of the
+        stages run by worker processes are summed over the workers. """
+    stages = {}
+    for stageName, (calls, seconds, selfSeconds, peakBytes) in sorted(stageStats.items(),
+                                                                      key=lambda item: -item[1][SECONDS]):
+        stages[stageName] = {"calls": calls, "seconds": round(seconds, 6), "self seconds": round(selfSeconds, 6),
+                             "tracemalloc peak bytes": peakBytes}
+    report = {"script": scriptName, "wall seconds": round(timer() - startTime, 6),
+              "tracemalloc peak bytes": max(runPeakBytes, tracemalloc.get_traced_memory()[1]), "stages": stages}
+    reportFile = open(fileName, "w")
+    json.dump(report, reportFile, indent=2)
+    reportFile.write("\n")
+    reportFile.close()
+    print("Stage profile of", len(stages), "stages written to", fileName)
@@ -0,0 +1,96 @@
+""" File:  syntheticChats.py
+    Description:  Writes a synthetic raw chat data .csv file in the format exported from LibChat, e.g.,
+    original_without_identifiable_info_chat_transcripts_9942_041015_053119.csv, so the preprocessing scripts
+    can be run and timed without the real (unshareable) transcripts.  It has the columns:
+    Timestamp, Duration (seconds), Initial Question, Message Count, Transcript
+    and each Transcript is a quoted, multi-line field with one 'hh:mm:ss - Name: message' line per message.
+
+    The messages are made of library reference words with what the preprocessing has to clean up mixed in:
+    greetings, URLs, pasted <a href=...>...</a> links and other HTML tags, HTML entities, accented and other
+    non-ASCII letters, times and sentence punctuation.  Some chats have an Initial Question (a few with commas
+    in it) and a few have an empty Transcript.  The same seed always gives the same file.
+
+    Run it from this directory to write NUMBER_OF_CHATS chats to SYNTHETIC_CSV_FILE_NAME:
+    python syntheticChats.py
+"""
+
+import csv
+import random
+
+# "constants"
+SYNTHETIC_CSV_FILE_NAME = "synthetic_chat_transcripts.csv"
+NUMBER_OF_CHATS = 10000
+RANDOM_SEED = 7
+
+COLUMN_HEADINGS = ["Timestamp", "Duration (seconds)", "Initial Question", "Message Count", "Transcript"]
+
+WORDS = ("library book books article articles journal database databases access interlibrary loan loans request "
+         "hour hours time today floor librarian research camera digital hub account campus source sources topic "
+         "need find help looking renew renewing renewed study studies printer printing print citation citations "
+         "apa mla format search catalog reserve course password login off-campus thesis peer reviewed full text "
+         "the a an is was are and or but can could would you your my i we they it this that there for to of in "
+         "on with how where what do does").split()
+NAMES = ["Jordan", "Patron", "Librarian", "Alex Smith", "Guest 4821"]
+GREETINGS = ["Hi, welcome to the info desk. How can I help you?", "Hello!", "Thanks so much!",
+             "You're welcome, have a great day.", "Is there anything else I can help you with?"]
+URLS = ["http://www.example.edu/library/search?q=apa+citation&type=all",
+        "https://example.libguides.com/c.php?g=12345&p=67890", "www.example.org/catalog/record/1234567"]
+EXTRAS = ['<a href="https://www.example.edu/find/articles" target="_blank">Find Articles</a>',
+          '<span style="font-weight: bold;">important</span>', "<b>Note</b>", "<br>",
+          "don&#x27;t", "and&#x2F;or", "&quot;peer reviewed&quot;", "see&nbsp;below",
+          "caf\u00e9", "na\u00efve", "r\u00e9sum\u00e9", "\u00fcber", "\u2014", "\u2019s",
+          "3:45", "10:30am", "room 204", "2nd floor", "e.g.", "..."]
+
+
+def randomTime(rand):
+    return "%02d:%02d:%02d" % (rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59))
+
+def randomMessage(rand):
+    """ Returns the text of a message, after the time-stamp and name. """
+    if rand.random() < 0.2:
+        return rand.choice(GREETINGS)
+    sentences = []
+    for sentence in range(rand.randint(1, 3)):
+        words = [rand.choice(WORDS) for word in range(rand.randint(3, 16))]
+        if rand.random() < 0.15:
+            words.insert(rand.randint(0, len(words)), rand.choice(URLS))
+        if rand.random() < 0.3:
+            words.insert(rand.randint(0, len(words)), rand.choice(EXTRAS))
+        if rand.random() < 0.2:
+            words[0] += ","
+        words[0] = words[0].capitalize()
+        sentences.append(" ".join(words) + rand.choice([".", "?", "!", "", "..."]))
+    return " ".join(sentences)
+
+def randomChat(rand):
+    """ Returns the fields of a chat:  [Timestamp, Duration (seconds), Initial Question, Message Count,
+        Transcript]. """
+    timeStamp = "%d/%d/%d %d:%02d" % (rand.randint(1, 12), rand.randint(1, 28), rand.randint(2015, 2019),
+                                      rand.randint(0, 23), rand.randint(0, 59))
+    initialQuestion = ""
+    if rand.random() < 0.3:
+        initialQuestion = randomMessage(rand)
+
+    names = rand.sample(NAMES, 2)
+    lines = []
+    if rand.random() >= 0.02:  # a few chats have an empty transcript
+        for message in range(rand.randint(2, 16)):
+            lines.append(randomTime(rand) + " - " + names[message % 2] + ": " + randomMessage(rand))
+    return [timeStamp, str(rand.randint(10, 3600)), initialQuestion, str(len(lines)), "\n".join(lines)]
+
+def writeSyntheticChats(fileName, chatCount, seed=RANDOM_SEED):
+    """ Writes a raw chat data .csv file of chatCount synthetic chats to fileName. """
+    rand = random.Random(seed)
+    csvFile = open(fileName, "w", newline="", encoding="utf-8")
+    writer = csv.writer(csvFile)  # quoted where needed with "\r\n" line endings, as Excel writes them
+    writer.writerow(COLUMN_HEADINGS)
+    for chat in range(chatCount):
+        writer.writerow(randomChat(rand))
+    csvFile.close()
+
+def main():
+    writeSyntheticChats(SYNTHETIC_CSV_FILE_NAME, NUMBER_OF_CHATS)
+    print("Wrote", NUMBER_OF_CHATS, "synthetic chats to", SYNTHETIC_CSV_FILE_NAME)
+
+if __name__ == "__main__":
+    main()  # start main running
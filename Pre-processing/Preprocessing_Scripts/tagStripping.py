@@ -0,0 +1,97 @@
+""" File:  tagStripping.py
+    Description:  Removes the <xyz ......</xyz> spans, e.g., <a href.....</a> and <span ... </span>, pasted
+    into chat messages.  Shared by the preprocessing scripts.
+
+    removeTags gives exactly the same result as the original removeTags of the preprocessing scripts (kept in
+    benchmarkRemoveTags.py), including its handling of nested and unclosed tags:  a '<' followed later by a
+    space opens a tag named by the characters between them, and everything up to and including the first
+    '</name>' after that space is removed, so nested tags of the same name end at the inner closing tag.
+    A tag that is never closed is left in place and the scan continues from the space after its name.
+    The scan stops at a '<' with no space after it.
+
+    The original spliced each removed span out of the string and searched the rest of the string for the
+    closing tag of every unclosed tag, both quadratic in the number of tags.  Here the kept text is joined
+    once at the end, a search for a closing tag that succeeded is never repeated, and once a tag turns out
+    not to be closed the closing tags are indexed in one pass so unclosed tags are found without searching.
+"""
+
+
+def removeTags(fileStr):
+    """ Returns fileStr with its <xyz ......</xyz> spans removed. """
+    if '<' not in fileStr:
+        return fileStr
+    closingTags = None  # index of the closing tags, built the first time a tag is not closed
+    foundClosingTags = {}  # tag name -> the closing tag found by the last search for it
+    nextClosingTags = {}  # tag name -> index in closingTags[tag name] of the next closing tag
+    keptParts = []
+    keptStart = 0
+    current = 0
+    while True:
+        openAngleBracketIndex = fileStr.find('<', current)
+        if openAngleBracketIndex == -1:
+            break
+        spaceIndex = fileStr.find(' ', openAngleBracketIndex+1)
+        if spaceIndex == -1:
+            break
+        current = spaceIndex
+        tagName = fileStr[openAngleBracketIndex+1:spaceIndex]
+        if closingTags is not None and '>' not in tagName and '</' not in tagName:
+            endIndex = findIndexedClosingTag(tagName, spaceIndex, closingTags, nextClosingTags)
+        else:
+            endIndex = findClosingTag(fileStr, tagName, spaceIndex, foundClosingTags)
+            if endIndex == -1 and closingTags is None:
+                # searching for every unclosed tag would scan the rest of the string again and again
+                closingTags = indexClosingTags(fileStr)
+        if endIndex != -1:
+            keptParts.append(fileStr[keptStart:openAngleBracketIndex])
+            keptStart = current = endIndex + len(tagName) + 3  # skip past '</name>'
+    keptParts.append(fileStr[keptStart:])
+    return "".join(keptParts)
+
+def indexClosingTags(fileStr):
+    """ Returns a dictionary mapping tag names to the increasing positions of their '</name>' closing tags
+        in fileStr.  Only names without a space, '>' or '</' are indexed:  for those the closing tag is
+        '</' followed by the name up to the next '>', so every closing tag is found in a single pass. """
+    closingTags = {}
+    closeIndex = -1  # the first '>' at or after the current name
+    spaceIndex = -1  # the first ' ' at or after the current name
+    openIndex = fileStr.find('</')
+    while openIndex != -1:
+        nameStart = openIndex + 2
+        nextOpenIndex = fileStr.find('</', nameStart)
+        if closeIndex < nameStart:
+            closeIndex = fileStr.find('>', nameStart)
+            if closeIndex == -1:  # no more closing tags
+                break
+        if spaceIndex < nameStart:
+            spaceIndex = fileStr.find(' ', nameStart)
+            if spaceIndex == -1:
+                spaceIndex = len(fileStr)
+        if spaceIndex > closeIndex and (nextOpenIndex == -1 or nextOpenIndex + 2 > closeIndex):
+            closingTags.setdefault(fileStr[nameStart:closeIndex], []).append(openIndex)
+        openIndex = nextOpenIndex
+    return closingTags
+
+def findClosingTag(fileStr, tagName, start, foundClosingTags):
+    """ Returns fileStr.find('</' + tagName + '>', start).  removeTags only moves forward, so start never
+        decreases between calls for the same tagName and the result of the last search is reused while
+        it is still ahead of start. """
+    endIndex = foundClosingTags.get(tagName, -2)
+    if endIndex == -2 or (endIndex != -1 and endIndex < start):
+        endIndex = fileStr.find('</' + tagName + '>', start)
+        foundClosingTags[tagName] = endIndex
+    return endIndex
+
+def findIndexedClosingTag(tagName, start, closingTags, nextClosingTags):
+    """ Returns the position of the first closing tag of tagName at or after start in the closingTags
+        built by indexClosingTags, or -1 if there is none. """
+    positions = closingTags.get(tagName)
+    if positions is None:
+        return -1
+    i = nextClosingTags.get(tagName, 0)
+    while i < len(positions) and positions[i] < start:
+        i += 1
+    nextClosingTags[tagName] = i
+    if i == len(positions):
+        return -1
+    return positions[i]
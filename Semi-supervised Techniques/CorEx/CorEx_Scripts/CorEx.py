@@ -23,6 +23,9 @@ from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from corextopic import corextopic as ct
 import pandas as pd
 import nltk
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))  # for corpusLoader.py
+import corpusLoader
 
 from time import time
 
@@ -37,32 +40,8 @@ NUMBER_OF_TOPICS_PRINTED = 15
 NUMBER_OF_WORDS_PER_TOPICS = 5
 ##NUMBER_OF_WORDS_PER_TOPICS = 10
 
-### Load stop words from file stop_words.txt
-stopList = []
-stopFile = open('stop_words.txt', 'r')
-for line in stopFile:
-    stopList.append(line.strip().lower())
-stoplist = set(stopList)
-print("number of stop words in stop_words.txt file", len(stoplist))
-
-### Load selected preprocessed chat documents
-documentsFile = open(FILE_NAME_OF_CORPUS + ".csv", 'r')
-
-docIndexToIndexInCSVDict = {}
-documents = []
-docIndex = 0
-for line in documentsFile:
-    docLineSplit = line.split(",")
-    documentLine = docLineSplit[1]
-    newDoc = ""
-    for word in documentLine.strip().split():
-        if word not in stoplist:
-            newDoc += word + " "
-    if len(newDoc) > 0:
-        documents.append(newDoc)
-        #print(docLineSplit[0])
-        docIndexToIndexInCSVDict[docIndex] = int(docLineSplit[0].strip())
-        docIndex += 1
+### Load selected preprocessed chat documents without the stop words in stop_words.txt
+documents, docIndexToIndexInCSVDict = corpusLoader.loadCorpus(FILE_NAME_OF_CORPUS)
 n_samples = len(documents)
 print("len(documents)",len(documents))
 
@@ -80,10 +59,9 @@ vectorizer = TfidfVectorizer(
     sublinear_tf=False
 )
 
-# Fit chat corpus to TF-IDF vectorization
-vectorizer = vectorizer.fit(documents)
-tfidf = vectorizer.transform(documents)
-vocab = vectorizer.get_feature_names()
+# Fit chat corpus to TF-IDF vectorization, once per corpus and vectorizer settings, then loaded from the
+# cache (see corpusLoader.py)
+tfidf, vocab = corpusLoader.loadVectorized(FILE_NAME_OF_CORPUS, vectorizer, documents)
 print("len(vocab)",len(vocab))
 
 # Apply CorEx with no anchors for a comparison
@@ -22,12 +22,18 @@
 
 """
 
-import re, sys, random, math
+import sys
+import hashlib
+import json
+import logging
 import numpy as np
 from lda import guidedlda as glda
 from lda import glda_datasets as gldad
+from scipy import sparse
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))  # for corpusLoader.py
+import corpusLoader
 
-from collections import Counter
 from timeit import default_timer as timer
 
 from time import time
@@ -50,59 +56,121 @@ NUMBER_OF_WORDS_PER_TOPICS = 8
 SEED_CONFIDENCE = 0.75
 ##SEED_CONFIDENCE = 1.0
 
-
-### Load stop words from file stop_words.txt
-stopList = []
-stopFile = open('stop_words.txt', 'r')
-for line in stopFile:
-    stopList.append(line.strip().lower())
-stoplist = set(stopList)
-print("number of stop words in stop_words.txt file", len(stoplist))
-
-### Load selected preprocessed chat documents
-documentsFile = open(FILE_NAME_OF_CORPUS+".csv", 'r')
-
-docIndexToIndexInCSVDict = {}
-docs = []
-docIndex = 0
+CHECKPOINT_INTERVAL = 0  # iterations between saving a checkpoint of the sampler to resume from;  0 for none
+RESUME = False  # True to resume from the checkpoint of an earlier run of the same corpus and settings, if any
+TESTED_GUIDEDLDA_VERSION = "2.0.0.dev22"  # the guidedlda whose private sampling loop fitWithCheckpoints runs
+GUIDEDLDA_LOOP_ATTRIBUTES = ["_initialize", "_sample_topics", "_rands", "loglikelihood"]
+
+
+def saveCheckpoint(model, checkpointFileName, iteration, rands, randomState, settings):
+    """ Saves the topics and counts of model, the random numbers rands in their current order, the state of
+        the numpy RandomState randomState shuffling them and the number of the iteration just run to the
+        compressed .npz file checkpointFileName, written to a temporary file and renamed so a run killed
+        while saving it still leaves the previous checkpoint. """
+    bitGenerator, randomKeys, randomPosition, hasGauss, cachedGaussian = randomState.get_state()
+    tempFileName = checkpointFileName + ".%d.tmp.npz" % os.getpid()
+    np.savez_compressed(tempFileName, settings=np.array(settings), iteration=iteration,
+                        nzw=model.nzw_, ndz=model.ndz_, nz=model.nz_, ZS=model.ZS, rands=rands,
+                        loglikelihoods=np.array(model.loglikelihoods_, dtype=float), randomKeys=randomKeys,
+                        randomPosition=randomPosition, hasGauss=hasGauss, cachedGaussian=cachedGaussian)
+    os.replace(tempFileName, checkpointFileName)
+
+def loadCheckpoint(model, checkpointFileName, rands, randomState, settings):
+    """ Restores what saveCheckpoint saved to checkpointFileName into model, rands and randomState and
+        returns the number of the iteration it was saved after.  Raises ValueError if it was saved for
+        another corpus or settings, which would not sample the same topics. """
+    checkpoint = np.load(checkpointFileName, allow_pickle=False)
+    try:
+        if str(checkpoint["settings"]) != settings:
+            raise ValueError("Checkpoint " + checkpointFileName + " was saved for another corpus or settings")
+        model.nzw_[:] = checkpoint["nzw"]
+        model.ndz_[:] = checkpoint["ndz"]
+        model.nz_[:] = checkpoint["nz"]
+        model.ZS[:] = checkpoint["ZS"]
+        rands[:] = checkpoint["rands"]
+        model.loglikelihoods_ = checkpoint["loglikelihoods"].tolist()
+        randomState.set_state(("MT19937", checkpoint["randomKeys"], int(checkpoint["randomPosition"]),
+                               int(checkpoint["hasGauss"]), float(checkpoint["cachedGaussian"])))
+        return int(checkpoint["iteration"])
+    finally:
+        checkpoint.close()
+
+def fitWithCheckpoints(model, X, seed_topics, seed_confidence, checkpointFileName):
+    """ Fits model to X like model.fit(X, seed_topics=seed_topics, seed_confidence=seed_confidence), but runs
+        GuidedLDA's sampling loop here so that every CHECKPOINT_INTERVAL iterations its state is saved to
+        checkpointFileName, and if RESUME, continues from that checkpoint rather than from the start.  The
+        loop draws the same random numbers as GuidedLDA's, so a resumed run gives exactly the same model as
+        one that was never stopped.  Raises AttributeError if model lacks the private GUIDEDLDA_LOOP_ATTRIBUTES
+        of the TESTED_GUIDEDLDA_VERSION of guidedlda that the loop uses. """
+    missingAttributes = [name for name in GUIDEDLDA_LOOP_ATTRIBUTES if not hasattr(model, name)]
+    if missingAttributes:
+        raise AttributeError("Checkpointing runs the sampling loop of guidedlda " + TESTED_GUIDEDLDA_VERSION +
+                             ", but this guidedlda has no GuidedLDA." + ", ".join(missingAttributes) +
+                             ";  install guidedlda " + TESTED_GUIDEDLDA_VERSION +
+                             " or set CHECKPOINT_INTERVAL = 0 and RESUME = False to use its fit")
+    logger = getattr(sys.modules[type(model).__module__], "logger", logging.getLogger("guidedlda"))
+    if model.random_state is None:  # as guidedlda.utils.check_random_state
+        randomState = np.random.mtrand._rand
+    else:
+        randomState = np.random.RandomState(model.random_state)
+    rands = model._rands.copy()
+    model._initialize(X, seed_topics, seed_confidence)
+    settings = json.dumps({"corpus": hashlib.sha256(model.WS.tobytes() + model.DS.tobytes()).hexdigest(),
+                           "topics": model.n_topics, "alpha": model.alpha, "eta": model.eta,
+                           "seed confidence": seed_confidence, "seed topics": sorted(seed_topics.items())})
+    firstIteration = 0
+    if RESUME and os.path.exists(checkpointFileName):
+        firstIteration = loadCheckpoint(model, checkpointFileName, rands, randomState, settings) + 1
+        print("Resuming from", checkpointFileName, "after iteration", firstIteration - 1)
+
+    for iteration in range(firstIteration, model.n_iter):
+        randomState.shuffle(rands)
+        if iteration % model.refresh == 0:
+            model.loglikelihoods_.append(model.loglikelihood())
+            logger.info("<{}> log likelihood: {:.0f}".format(iteration, model.loglikelihoods_[-1]))
+        model._sample_topics(rands)
+        if CHECKPOINT_INTERVAL > 0 and (iteration + 1) % CHECKPOINT_INTERVAL == 0:
+            saveCheckpoint(model, checkpointFileName, iteration, rands, randomState, settings)
+    logger.info("<{}> log likelihood: {:.0f}".format(model.n_iter - 1, model.loglikelihood()))
+
+    # the distributions GuidedLDA's fit computes from the counts
+    model.components_ = (model.nzw_ + model.eta).astype(float)
+    model.components_ /= np.sum(model.components_, axis=1)[:, np.newaxis]
+    model.topic_word_ = model.components_
+    model.word_topic_ = (model.nzw_ + model.eta).astype(float)
+    model.word_topic_ /= np.sum(model.word_topic_, axis=0)[np.newaxis, :]
+    model.word_topic_ = model.word_topic_.T
+    model.doc_topic_ = (model.ndz_ + model.alpha).astype(float)
+    model.doc_topic_ /= np.sum(model.doc_topic_, axis=1)[:, np.newaxis]
+    del model.WS
+    del model.DS
+    del model.ZS
+    return model
+
+
+### Load selected preprocessed chat documents without the stop words in stop_words.txt
+docs, docIndexToIndexInCSVDict = corpusLoader.loadCorpus(FILE_NAME_OF_CORPUS)
+
+# number the words in the order they first appear in the documents and list the word id of each token
 word2id = {}
-id2word = {}
-wordList = []
-wordId = 0
-for line in documentsFile:
-    docLineSplit = line.split(",")
-    documentLine = docLineSplit[1]
-    newDoc = ""
-    for word in documentLine.strip().split():
-        if word not in stoplist:
-            if word not in word2id:
-                word2id[word] = wordId
-                id2word[wordId] = word
-                wordList.append(word)
-                wordId += 1
-            newDoc += word + " "
-    if len(newDoc) > 0:
-        docs.append(newDoc)
-        #print(docLineSplit[0])
-        docIndexToIndexInCSVDict[docIndex] = int(docLineSplit[0].strip())
-        docIndex += 1
+tokenIds = []
+docLengths = []
+for docLine in docs:
+    docWords = docLine.split()
+    tokenIds.extend([word2id.setdefault(word, len(word2id)) for word in docWords])
+    docLengths.append(len(docWords))
 numDocs = len(docs)
 numWords = len(word2id)
-vocab = tuple(wordList)
-
-X = np.ndarray(shape=(numDocs, numWords), dtype=int)
+vocab = tuple(word2id)
 
-word_counts = Counter()
-
-documents = []
-word_topics = {}
-topic_totals = np.zeros(NUMBER_OF_TOPICS_PRINTED)
-
-for docIndex, docLine in enumerate(docs):
-    
-    for word in docLine.strip().split():
-        wordId = word2id[word]
-        X[docIndex][wordId] += 1
+# sparse CSR document-term count matrix built in one step from the token ids of each document, so its memory
+# grows with the number of nonzero counts rather than with numDocs * numWords; the counts of a word repeated
+# in a document are summed by sum_duplicates()
+docOffsets = np.zeros(numDocs + 1, dtype=np.int64)
+np.cumsum(docLengths, out=docOffsets[1:])
+X = sparse.csr_matrix((np.ones(len(tokenIds), dtype=np.int64), np.array(tokenIds, dtype=np.int32), docOffsets),
+                      shape=(numDocs, numWords))
+X.sum_duplicates()
 
 seed_topic_list = [['interlibrary', 'loan', 'request'],
                    ['hour', 'time', 'today'],
@@ -121,8 +189,17 @@ for t_id, st in enumerate(seed_topic_list):
     for word in st:
         seed_topics[word2id[word]] = t_id
 
-
-model.fit(X, seed_topics=seed_topics, seed_confidence=SEED_CONFIDENCE)
+## the topics, counts and random state every CHECKPOINT_INTERVAL iterations, so a killed run can RESUME
+checkpointFileName = "checkpoint_GuidedLDA_seeds_"+str(len(seed_topic_list))+"_confidence_"+ \
+                     str(SEED_CONFIDENCE)+"_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED)+"topoics.npz"
+if not RESUME and os.path.exists(checkpointFileName):
+    os.remove(checkpointFileName)  # of an earlier run, which this run does not continue
+if CHECKPOINT_INTERVAL == 0 and not RESUME:
+    model.fit(X, seed_topics=seed_topics, seed_confidence=SEED_CONFIDENCE)
+else:
+    fitWithCheckpoints(model, X, seed_topics, SEED_CONFIDENCE, checkpointFileName)
+if os.path.exists(checkpointFileName):
+    os.remove(checkpointFileName)  # the model is fitted, so there is nothing to resume
 
 print("\nSeeds",str(seed_topic_list),"\n")
 print("\nTopics using seeds with confidence",SEED_CONFIDENCE,":")
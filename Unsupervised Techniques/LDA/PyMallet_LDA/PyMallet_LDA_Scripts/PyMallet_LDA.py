@@ -54,6 +54,10 @@ from collections import Counter
 from timeit import default_timer as timer
 
 from time import time
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".."))  # for corpusLoader.py
+import corpusLoader
+import ldaSampler
 
 #Global Variables - select appropriate chat file based on preprocessing
 ##FILE_NAME_OF_CORPUS = 'wholeChatsFilePOS_N_ADJ_V'
@@ -69,6 +73,18 @@ NUMBER_OF_WORDS_PER_TOPICS = 8
 doc_smoothing = 0.5
 word_smoothing = 0.01
 
+NUMBER_OF_ITERATIONS = 300  # at most, as the "arrays", "sparse" and "alias" samplers stop once the log likelihood converges
+DICTS_NUMBER_OF_ITERATIONS = 100  # iterations of the "dicts" sampler, which always runs them all
+LIKELIHOOD_INTERVAL = 10  # iterations between computing the log likelihood;  0 to always run NUMBER_OF_ITERATIONS
+CONVERGENCE_TOLERANCE = 5e-4  # relative increase of the log likelihood below which sampling stops
+RANDOM_SEED = 7  # seed of the random topics, so the same seed gives the same topics;  None for new ones every run
+SAMPLER = "arrays"  # "arrays" for ldaSampler.py's flat arrays, "dicts" for sample() below with a dict per token
+##SAMPLER = "sparse"  # ldaSampler.py's SparseLDA sampler, faster from around 100 topics on (see benchmarkSamplers.py)
+##SAMPLER = "alias"  # ldaSampler.py's approximate (as LightLDA) alias table sampler, as fast for 1000 topics as for 15
+NUM_WORKERS = 1  # processes sampling shards of the chats at the same time (AD-LDA, see ldaSampler.py), e.g., os.cpu_count()
+CHECKPOINT_INTERVAL = 0  # iterations between saving a checkpoint of the sampler to resume from (not "dicts");  0 for none
+RESUME = False  # True to resume from the checkpoint of an earlier run of the same corpus and settings, if any
+
 
 word_pattern = re.compile("\w[\w\-\']*\w|\w")
 
@@ -144,97 +160,105 @@ def print_all_topics():
         sorted_words = sorted(vocabulary, key=lambda w: word_topics[w][topic], reverse=True)
         print(" ".join(sorted_words[:20]))
 
-### Load stop words from file stop_words.txt
-stopList = []
-stopFile = open('stop_words.txt', 'r')
-for line in stopFile:
-    stopList.append(line.strip().lower())
-stoplist = set(stopList)
-print("number of stop words in stop_words.txt file", len(stoplist))
-
-documentsFile = open(FILE_NAME_OF_CORPUS+".csv", 'r')
-
-docIndexToIndexInCSVDict = {}
-docs = []
-docIndex = 0
-for line in documentsFile:
-    docLineSplit = line.split(",")
-    documentLine = docLineSplit[1]
-    newDoc = ""
-    for word in documentLine.strip().split():
-        if word not in stoplist:
-            newDoc += word + " "
-    if len(newDoc) > 0:
-        docs.append(newDoc)
-        docIndexToIndexInCSVDict[docIndex] = int(docLineSplit[0].strip())
-        docIndex += 1
-n_samples = len(docs)
-print("len(docs)",len(docs))
-
-word_counts = Counter()
-
-documents = []
-word_topics = {}
-topic_totals = np.zeros(NUMBER_OF_TOPICS_PRINTED)
-
-
-for line in docs:
-    #line = line.lower()
-    
+def tokenize(line):
     tokens = word_pattern.findall(line)
     
     ## remove stopwords, short words, and upper-cased words
-    tokens = [w for w in tokens if not w in stoplist and len(w) >= 3 and not w[0].isupper()]
-    word_counts.update(tokens)
-    
-    doc_topic_counts = np.zeros(NUMBER_OF_TOPICS_PRINTED)
-    token_topics = []
-    
-    for w in tokens:
-        
-        ## Generate a topic randomly
-        topic = random.randrange(NUMBER_OF_TOPICS_PRINTED)
-        token_topics.append({ "word": w, "topic": topic })
-        
-        ## If we haven't seen this word before, initialize it
-        if not w in word_topics:
-            word_topics[w] = np.zeros(NUMBER_OF_TOPICS_PRINTED)
-        
-        ## Update counts: 
-        word_topics[w][topic] += 1
-        topic_totals[topic] += 1
-        doc_topic_counts[topic] += 1
-    
-    documents.append({ "original": line, "token_topics": token_topics, "topic_counts": doc_topic_counts })
-
-## Now that we're done reading from disk, we can count the total
-##  number of words.
-vocabulary = list(word_counts.keys())
-vocabulary_size = len(vocabulary)
+    return [w for w in tokens if not w in stoplist and len(w) >= 3 and not w[0].isupper()]
+
+def main():
+    ## the globals tokenize() and the dicts sampler's sample(), print_topic() and print_all_topics() work on
+    global stoplist, documents, word_topics, topic_totals, vocabulary, smoothing_times_vocab_size
+
+    ### Load stop words from file stop_words.txt
+    stoplist = corpusLoader.loadStopWords()
+    print("number of stop words in stop_words.txt file", len(stoplist))
+
+    docs, docIndexToIndexInCSVDict = corpusLoader.loadCorpus(FILE_NAME_OF_CORPUS)
+    n_samples = len(docs)
+    print("len(docs)",len(docs))
+
+    random.seed(RANDOM_SEED)
+    if SAMPLER == "dicts":
+        word_counts = Counter()
+
+        documents = []
+        word_topics = {}
+        topic_totals = np.zeros(NUMBER_OF_TOPICS_PRINTED)
+
+
+        for line in docs:
+            #line = line.lower()
+
+            tokens = tokenize(line)
+            word_counts.update(tokens)
+
+            doc_topic_counts = np.zeros(NUMBER_OF_TOPICS_PRINTED)
+            token_topics = []
+
+            for w in tokens:
+
+                ## Generate a topic randomly
+                topic = random.randrange(NUMBER_OF_TOPICS_PRINTED)
+                token_topics.append({ "word": w, "topic": topic })
+
+                ## If we haven't seen this word before, initialize it
+                if not w in word_topics:
+                    word_topics[w] = np.zeros(NUMBER_OF_TOPICS_PRINTED)
+
+                ## Update counts: 
+                word_topics[w][topic] += 1
+                topic_totals[topic] += 1
+                doc_topic_counts[topic] += 1
+
+            documents.append({ "original": line, "token_topics": token_topics, "topic_counts": doc_topic_counts })
+
+        ## Now that we're done reading from disk, we can count the total
+        ##  number of words.
+        vocabulary = list(word_counts.keys())
+        vocabulary_size = len(vocabulary)
+
+        smoothing_times_vocab_size = word_smoothing * vocabulary_size
+        sample(DICTS_NUMBER_OF_ITERATIONS)
+    else:
+        samplerState = ldaSampler.SamplerState(NUMBER_OF_TOPICS_PRINTED, doc_smoothing, word_smoothing)
+        for line in docs:
+            samplerState.addDocument(tokenize(line))
+        vocabulary = samplerState.vocabulary
+        vocabulary_size = len(vocabulary)
+        print("tokens", samplerState.numTokens(), "vocabulary size", vocabulary_size)
+        ## the seconds, tokens/sec and log likelihood of every iteration
+        samplingLogFileName = "sampling_log_PyMallet_LDA_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED) \
+                              +"topoics.csv"
+        ## the topics, counts and random state every CHECKPOINT_INTERVAL iterations, so a killed run can RESUME
+        checkpointFileName = "checkpoint_PyMallet_LDA_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED) \
+                             +"topoics_"+SAMPLER+".npz"
+        ldaSampler.sample(samplerState, NUMBER_OF_ITERATIONS, SAMPLER, NUM_WORKERS, LIKELIHOOD_INTERVAL,
+                          CONVERGENCE_TOLERANCE, samplingLogFileName, checkpointFileName, CHECKPOINT_INTERVAL, RESUME)
+        ## the counts of each word as float rows, as written by the dicts sampler
+        word_topics = dict(zip(vocabulary, samplerState.wordTopicMatrix().astype(float)))
+    fileName = "PyMallet_LDA_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED) \
+               +"topoics_"+str(NUMBER_OF_WORDS_PER_TOPICS)+"words.txt"
+    outputFile = open(fileName, 'w')
+    outputFile.write("File: " + fileName +"\n\n")
+    rawFileName = "raw_PyMallet_LDA_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED) \
+               +"topoics_"+str(NUMBER_OF_WORDS_PER_TOPICS)+"words.txt"
+    outputFileRaw = open(rawFileName, 'w')
+    outputFileRaw.write("File: " + rawFileName +"\n\n")
 
-smoothing_times_vocab_size = word_smoothing * vocabulary_size
-
-
-sample(100)
-fileName = "PyMallet_LDA_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED) \
-           +"topoics_"+str(NUMBER_OF_WORDS_PER_TOPICS)+"words.txt"
-outputFile = open(fileName, 'w')
-outputFile.write("File: " + fileName +"\n\n")
-rawFileName = "raw_PyMallet_LDA_"+FILE_NAME_OF_CORPUS+"_"+str(NUMBER_OF_TOPICS_PRINTED) \
-           +"topoics_"+str(NUMBER_OF_WORDS_PER_TOPICS)+"words.txt"
-outputFileRaw = open(rawFileName, 'w')
-outputFileRaw.write("File: " + rawFileName +"\n\n")
-
-for topic in range(NUMBER_OF_TOPICS_PRINTED):
-    sorted_words = sorted(vocabulary, key=lambda w: word_topics[w][topic], reverse=True)
-    topicStr = " ".join(sorted_words[:NUMBER_OF_WORDS_PER_TOPICS])
-    outputFile.write(topicStr+"\n")
-    outputFileRaw.write(topicStr+"\n")
-    print(topicStr)
-    for i in range(NUMBER_OF_WORDS_PER_TOPICS):
-        w = sorted_words[i]
-        print("{}\t{}".format(word_topics[w][topic], w))
-        outputFileRaw.write("{}\t{}".format(word_topics[w][topic], w) +"\n")
-    
-outputFile.close()
-outputFileRaw.close()
+    for topic in range(NUMBER_OF_TOPICS_PRINTED):
+        sorted_words = sorted(vocabulary, key=lambda w: word_topics[w][topic], reverse=True)
+        topicStr = " ".join(sorted_words[:NUMBER_OF_WORDS_PER_TOPICS])
+        outputFile.write(topicStr+"\n")
+        outputFileRaw.write(topicStr+"\n")
+        print(topicStr)
+        for i in range(NUMBER_OF_WORDS_PER_TOPICS):
+            w = sorted_words[i]
+            print("{}\t{}".format(word_topics[w][topic], w))
+            outputFileRaw.write("{}\t{}".format(word_topics[w][topic], w) +"\n")
+
+    outputFile.close()
+    outputFileRaw.close()
+
+if __name__ == "__main__":  # not in the worker processes of NUM_WORKERS, which import this file
+    main()  # start main running
@@ -0,0 +1,175 @@
+""" File:  benchmarkSamplers.py
+    Description:  Throughput benchmark of the Gibbs samplers of ldaSampler.py (see SAMPLERS there) at each
+    number of topics of TOPIC_COUNTS, so a sampler can be picked for PyMallet_LDA.py's number of topics
+    and a change to one can be checked to help rather than hurt.  "arrays" samples the same topics as the
+    original sample() of PyMallet_LDA.py, only faster, so it is the one to compare the others with.
+
+    The corpus is synthetic unless CORPUS_NAME names a preprocessed chat corpus, e.g., "wholeChatsFile":
+    NUM_DOCUMENTS documents of a vocabulary of VOCABULARY_SIZE words, each drawn from one to three of
+    NUM_TRUE_TOPICS random topics, so the samplers have topics to find and the topic counts become as
+    sparse as they do on real chats.  Each sampler starts from the same random topics, runs
+    BURN_IN_ITERATIONS iterations untimed, as the sparse samplers only get fast once the topics have
+    formed, and is then timed for TIMED_ITERATIONS iterations.
+
+    It then times ldaSampler.ParallelSampler's AD-LDA with each number of worker processes of WORKER_COUNTS
+    up to the number of CPUs, with the sampler PARALLEL_SAMPLER_NAME and PARALLEL_NUM_TOPICS topics,
+    starting from the same burned in state, and reports its scaling efficiency:  its tokens/sec divided
+    by the number of workers times the tokens/sec of the sampler run in this process.  The first
+    iteration, which starts the worker processes, is not timed.
+
+    Run it from this directory:  python benchmarkSamplers.py
+    It prints the tokens/sec of every sampler and number of topics and saves them to
+    BENCHMARK_RESULTS_FILE_NAME, and those of every number of workers to PARALLEL_RESULTS_FILE_NAME.  Burning in 500 and 1000 topics with "arrays" takes a few minutes.
+"""
+
+import copy
+import itertools
+import os
+import random
+import re
+import sys
+from timeit import default_timer as timer
+
+import ldaSampler
+
+# "constants"
+TOPIC_COUNTS = [15, 100, 500, 1000]
+SAMPLER_NAMES = ["arrays", "sparse", "alias"]
+BURN_IN_ITERATIONS = 10
+TIMED_ITERATIONS = 3
+RANDOM_SEED = 7
+DOC_SMOOTHING = 0.5  # as in PyMallet_LDA.py
+WORD_SMOOTHING = 0.01
+BENCHMARK_RESULTS_FILE_NAME = "benchmark_samplers.csv"
+
+WORKER_COUNTS = [1, 2, 4, 8, 16, 32]
+PARALLEL_SAMPLER_NAME = "sparse"
+PARALLEL_NUM_TOPICS = 100
+PARALLEL_RESULTS_FILE_NAME = "benchmark_parallel.csv"
+
+CORPUS_NAME = None  # e.g., "wholeChatsFile" to benchmark on wholeChatsFile.csv instead of a synthetic corpus
+NUM_DOCUMENTS = 4000
+VOCABULARY_SIZE = 10000
+NUM_TRUE_TOPICS = 50
+MIN_DOCUMENT_LENGTH = 5
+MAX_DOCUMENT_LENGTH = 60
+
+WORD_PATTERN = re.compile("\\w[\\w\\-\\']*\\w|\\w")  # as in PyMallet_LDA.py
+
+
+def syntheticDocuments(seed):
+    """ Returns NUM_DOCUMENTS lists of words drawn from NUM_TRUE_TOPICS random topics, each of which
+        favors its own words with Zipf-like weights. """
+    generator = random.Random(seed)
+    vocabulary = ["word%d" % wordIndex for wordIndex in range(VOCABULARY_SIZE)]
+    cumulativeWeights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    trueTopics = []
+    for topic in range(NUM_TRUE_TOPICS):
+        topicWords = vocabulary[:]
+        generator.shuffle(topicWords)
+        trueTopics.append(topicWords)
+    documents = []
+    for doc in range(NUM_DOCUMENTS):
+        docTopics = generator.sample(trueTopics, generator.randint(1, 3))
+        words = []
+        for token in range(generator.randint(MIN_DOCUMENT_LENGTH, MAX_DOCUMENT_LENGTH)):
+            words.extend(generator.choices(generator.choice(docTopics), cum_weights=cumulativeWeights))
+        documents.append(words)
+    return documents
+
+def corpusDocuments(corpusName):
+    """ Returns the documents of the preprocessed chat corpus corpusName tokenized as in PyMallet_LDA.py. """
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".."))
+    import corpusLoader
+
+    stoplist = corpusLoader.loadStopWords()
+    docs = corpusLoader.loadCorpus(corpusName)[0]
+    return [[word for word in WORD_PATTERN.findall(line)
+             if word not in stoplist and len(word) >= 3 and not word[0].isupper()] for line in docs]
+
+def burnedInState(samplerName, numTopics, documents):
+    """ Returns the sampler state of documents after BURN_IN_ITERATIONS iterations of samplerName. """
+    random.seed(RANDOM_SEED)
+    state = ldaSampler.SamplerState(numTopics, DOC_SMOOTHING, WORD_SMOOTHING)
+    for words in documents:
+        state.addDocument(words)
+    for iteration in range(BURN_IN_ITERATIONS):
+        ldaSampler.SAMPLERS[samplerName](state)
+    return state
+
+def timeSampler(samplerName, numTopics, documents):
+    """ Returns the tokens/sec of TIMED_ITERATIONS iterations of the sampler samplerName after burning it
+        in on documents. """
+    sampleIterationFunction = ldaSampler.SAMPLERS[samplerName]
+    state = burnedInState(samplerName, numTopics, documents)
+    start = timer()
+    for iteration in range(TIMED_ITERATIONS):
+        sampleIterationFunction(state)
+    seconds = timer() - start
+    return state.numTokens() * TIMED_ITERATIONS / max(seconds, 1e-9)
+
+def timeParallel(burnedIn, numWorkers):
+    """ Returns the tokens/sec of TIMED_ITERATIONS AD-LDA iterations of PARALLEL_SAMPLER_NAME in numWorkers
+        worker processes, starting from a copy of the state burnedIn. """
+    state = copy.deepcopy(burnedIn)
+    random.seed(RANDOM_SEED)
+    parallelSampler = ldaSampler.ParallelSampler(state, numWorkers, PARALLEL_SAMPLER_NAME)
+    parallelSampler.sampleIteration()  # waits for the worker processes to start
+    start = timer()
+    for iteration in range(TIMED_ITERATIONS):
+        parallelSampler.sampleIteration()
+    seconds = timer() - start
+    parallelSampler.close()
+    return state.numTokens() * TIMED_ITERATIONS / max(seconds, 1e-9)
+
+def benchmarkParallel(documents):
+    """ Prints and saves the tokens/sec and scaling efficiency of ParallelSampler with each of WORKER_COUNTS. """
+    burnedIn = burnedInState(PARALLEL_SAMPLER_NAME, PARALLEL_NUM_TOPICS, documents)
+    state = copy.deepcopy(burnedIn)
+    start = timer()
+    for iteration in range(TIMED_ITERATIONS):
+        ldaSampler.SAMPLERS[PARALLEL_SAMPLER_NAME](state)
+    serialTokensPerSecond = state.numTokens() * TIMED_ITERATIONS / max(timer() - start, 1e-9)
+
+    print("\nAD-LDA with %s, %d topics, %d CPUs:  %.0f tokens/sec in this process" %
+          (PARALLEL_SAMPLER_NAME, PARALLEL_NUM_TOPICS, os.cpu_count(), serialTokensPerSecond))
+    resultsFile = open(PARALLEL_RESULTS_FILE_NAME, "w")
+    resultsFile.write("workers,tokens per second,speedup,scaling efficiency\n")
+    print("  %8s %14s %9s %11s" % ("workers", "tokens/sec", "speedup", "efficiency"))
+    for numWorkers in WORKER_COUNTS:
+        if numWorkers > os.cpu_count():
+            break
+        tokensPerSecond = timeParallel(burnedIn, numWorkers)
+        speedup = tokensPerSecond / serialTokensPerSecond
+        print("  %8d %14.0f %8.2fx %10.0f%%" % (numWorkers, tokensPerSecond, speedup, 100 * speedup / numWorkers))
+        resultsFile.write("%d,%.1f,%.3f,%.3f\n" % (numWorkers, tokensPerSecond, speedup, speedup / numWorkers))
+        resultsFile.flush()
+    resultsFile.close()
+    print("\nResults saved to", PARALLEL_RESULTS_FILE_NAME)
+
+def main():
+    if CORPUS_NAME is None:
+        documents = syntheticDocuments(RANDOM_SEED)
+    else:
+        documents = corpusDocuments(CORPUS_NAME)
+    print("%d documents, %d tokens" % (len(documents), sum(len(words) for words in documents)))
+    resultsFile = open(BENCHMARK_RESULTS_FILE_NAME, "w")
+    resultsFile.write("topics,sampler,tokens per second,speedup\n")
+    print("  %8s %-10s %14s %9s" % ("topics", "sampler", "tokens/sec", "speedup"))
+    for numTopics in TOPIC_COUNTS:
+        baseline = None
+        for samplerName in SAMPLER_NAMES:
+            tokensPerSecond = timeSampler(samplerName, numTopics, documents)
+            if baseline is None:
+                baseline = tokensPerSecond
+            speedup = tokensPerSecond / baseline
+            print("  %8d %-10s %14.0f %8.2fx" % (numTopics, samplerName, tokensPerSecond, speedup))
+            resultsFile.write("%d,%s,%.1f,%.3f\n" % (numTopics, samplerName, tokensPerSecond, speedup))
+            resultsFile.flush()
+    resultsFile.close()
+    print("\nResults saved to", BENCHMARK_RESULTS_FILE_NAME)
+
+    benchmarkParallel(documents)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+""" File:  compareSamplersExact.py
+    Description:  Test harness checking what the samplers of ldaSampler.py (see SAMPLERS there) sample
+    against the exact posterior of LDA's topics, on a corpus of DOCUMENTS so small that the probability of
+    every one of its NUM_TOPICS ** tokens topic assignments can be enumerated:
+        p(z | w) proportional to  prod_d prod_k Gamma(n_dk + a)  prod_k prod_w Gamma(n_wk + b) / Gamma(n_k + bV)
+    for a = DOC_SMOOTHING, b = WORD_SMOOTHING and V the vocabulary size.  Each sampler runs SWEEPS
+    iterations from the same start, and the total variation distance between how often it visited each
+    assignment and its exact probability is reported.
+
+    The distance of a sampler drawing exactly from the posterior only comes from having a finite number of
+    samples, so it is compared with the distance of SWEEPS independent draws from the exact posterior.  The
+    exact samplers, "arrays" and "sparse", fail the check if theirs is more than EXACT_DISTANCE_FACTOR times
+    that.  "alias" samples from stale proposals as LightLDA does, which is only approximately exact, and
+    its distance is reported rather than checked;  it stays above the exact samplers' however many SWEEPS
+    it runs.
+
+    Run it from this directory:  python compareSamplersExact.py
+    It prints the distance of every sampler and exits with status 1 if an exact sampler fails.  A million
+    SWEEPS take a few minutes.
+"""
+
+import collections
+import itertools
+import math
+import random
+import sys
+from timeit import default_timer as timer
+
+import ldaSampler
+
+# "constants"
+DOCUMENTS = [["a", "b", "a"], ["b", "c"], ["c"]]
+NUM_TOPICS = 3
+DOC_SMOOTHING = 0.5
+WORD_SMOOTHING = 0.3
+SWEEPS = 1000000
+RANDOM_SEED = 7
+EXACT_SAMPLER_NAMES = ["arrays", "sparse"]
+EXACT_DISTANCE_FACTOR = 2.0
+
+
+def startState():
+    """ Returns the sampler state of DOCUMENTS with the random topics of RANDOM_SEED. """
+    random.seed(RANDOM_SEED)
+    state = ldaSampler.SamplerState(NUM_TOPICS, DOC_SMOOTHING, WORD_SMOOTHING)
+    for words in DOCUMENTS:
+        state.addDocument(words)
+    return state
+
+def logJointProbability(state, topics):
+    """ Returns the log of the unnormalized posterior probability of the topic assignment topics of the tokens
+        of state. """
+    docTopicCounts = collections.Counter()
+    wordTopicCounts = collections.Counter()
+    topicTotals = collections.Counter()
+    for doc in range(state.numDocuments()):
+        for token in range(state.docOffsets[doc], state.docOffsets[doc + 1]):
+            docTopicCounts[doc, topics[token]] += 1
+            wordTopicCounts[state.tokenWordIds[token], topics[token]] += 1
+            topicTotals[topics[token]] += 1
+    vocabularySize = len(state.vocabulary)
+    logProbability = 0.0
+    for topic in range(NUM_TOPICS):
+        for doc in range(state.numDocuments()):
+            logProbability += math.lgamma(docTopicCounts[doc, topic] + DOC_SMOOTHING)
+        for wordId in range(vocabularySize):
+            logProbability += math.lgamma(wordTopicCounts[wordId, topic] + WORD_SMOOTHING)
+        logProbability -= math.lgamma(topicTotals[topic] + vocabularySize * WORD_SMOOTHING)
+    return logProbability
+
+def exactPosterior(state):
+    """ Returns a dict from each topic assignment of the tokens of state to its posterior probability. """
+    assignments = list(itertools.product(range(NUM_TOPICS), repeat=state.numTokens()))
+    logProbabilities = [logJointProbability(state, topics) for topics in assignments]
+    maxLogProbability = max(logProbabilities)
+    weights = [math.exp(logProbability - maxLogProbability) for logProbability in logProbabilities]
+    totalWeight = sum(weights)
+    return {topics: weight / totalWeight for topics, weight in zip(assignments, weights)}
+
+def totalVariationDistance(visits, sampleCount, posterior):
+    """ Returns the total variation distance between the frequencies visits / sampleCount and posterior. """
+    return sum(abs(visits[topics] / sampleCount - probability) for topics, probability in posterior.items()) / 2
+
+def independentDistance(posterior):
+    """ Returns the distance of SWEEPS independent draws from posterior, the least a sampler can expect. """
+    generator = random.Random(RANDOM_SEED)
+    assignments = list(posterior)
+    visits = collections.Counter(generator.choices(assignments, cum_weights=list(itertools.accumulate(
+        posterior[topics] for topics in assignments)), k=SWEEPS))
+    return totalVariationDistance(visits, SWEEPS, posterior)
+
+def samplerDistance(samplerName, posterior):
+    """ Returns the distance of SWEEPS iterations of the sampler samplerName. """
+    sampleIterationFunction = ldaSampler.SAMPLERS[samplerName]
+    state = startState()
+    visits = collections.Counter()
+    for sweep in range(SWEEPS):
+        sampleIterationFunction(state)
+        visits[tuple(state.tokenTopics)] += 1
+    return totalVariationDistance(visits, SWEEPS, posterior)
+
+def main():
+    posterior = exactPosterior(startState())
+    floor = independentDistance(posterior)
+    print("%d topic assignments, %d sweeps:  independent draws %.4f" % (len(posterior), SWEEPS, floor))
+    failed = False
+    for samplerName in ldaSampler.SAMPLERS:
+        start = timer()
+        distance = samplerDistance(samplerName, posterior)
+        if samplerName in EXACT_SAMPLER_NAMES:
+            passed = distance <= EXACT_DISTANCE_FACTOR * floor
+            failed = failed or not passed
+            verdict = "ok" if passed else "MISMATCH, more than %.1f times independent draws" % EXACT_DISTANCE_FACTOR
+        else:
+            verdict = "approximate sampler, not checked"
+        print("  %-8s %.4f  %s  (%.0f seconds)" % (samplerName, distance, verdict, timer() - start))
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
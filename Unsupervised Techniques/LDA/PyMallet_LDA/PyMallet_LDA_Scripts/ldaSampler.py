@@ -0,0 +1,840 @@
+""" File:  ldaSampler.py
+    Description:  Array-backed Gibbs sampler of PyMallet_LDA.py.  Instead of a dict per token and a numpy
+    array per word and document, the sampler state is kept in a few flat int32 arrays:
+    1) tokenWordIds and tokenTopics with the word id and topic of every token, the tokens of every document
+       one after the other,
+    2) docOffsets with the index of the first token of each document and then the total number of tokens,
+       so document d is tokens [docOffsets[d], docOffsets[d + 1]),
+    3) wordTopicCounts and docTopicCounts, the dense (vocabulary size x topics) and (documents x topics)
+       count matrices stored row by row, and topicTotals with the number of tokens of each topic.
+    A token therefore takes 8 bytes rather than a dict of its own.  The arrays are Python array.array's,
+    whose items are quick to read and update one at a time from Python;  wordTopicMatrix() and
+    docTopicMatrix() view them as 2-D numpy arrays without copying them.
+
+    sampleIteration() computes exactly the same sampling distribution of each token as the original
+    sample() of PyMallet_LDA.py, adding it up in the same order as numpy's np.sum (see pairwiseSum), and
+    draws the same random numbers, so for the same random seed it samples the same topics.  It only
+    recomputes the document and topic factors of the two topics a token moves between rather than all of
+    them, and works on plain Python floats rather than small numpy arrays, which is where the time went.
+    From VECTORIZED_MIN_TOPICS topics on, the per-topic Python loops cost more than numpy's overhead, so
+    each token's distribution is computed with numpy into preallocated arrays instead, and the topic is
+    found with np.subtract.accumulate, which subtracts the probabilities one after the other just like
+    the original walk.
+
+    sampleIterationSparse() is the SparseLDA sampler of Yao, Mimno and McCallum, "Efficient Methods for
+    Topic Model Inference on Streaming Document Collections" (KDD 2009), as in Mallet.  It samples from the
+    same distribution, but with its own random draws, so it samples different topics than the samplers
+    above.  The unnormalized probability of topic k for a token of word w in document d,
+        (a + n_dk) (b + n_wk) / (bV + n_k),
+    for a = docSmoothing, b = wordSmoothing and V the vocabulary size, splits into three buckets:
+    1) smoothing:  a b / (bV + n_k), whose sum over the topics only changes when two topic totals do,
+    2) document:  n_dk b / (bV + n_k), only nonzero for the topics of the document, and
+    3) topic-word:  (a + n_dk) n_wk / (bV + n_k), only nonzero for the topics of the word.
+    The sums of 1) and 2) are updated as a token moves and only 3) is summed for each token, so a token
+    costs time in proportion to the number of topics its word and document have rather than to the
+    number of topics, which pays off from around a hundred topics on, once the topics have become
+    sparse after the first iterations.  The nonzero topic counts of each word and document are kept in
+    dicts while it samples.
+
+    sampleIterationAlias() is a Metropolis-Hastings sampler in the style of AliasLDA (Li, Ahmed, Ravi and
+    Smola, "Reducing the Sampling Complexity of Topic Models", KDD 2014) and LightLDA (Yuan et al., "LightLDA:
+    Big Topic Models on Modest Computer Clusters", WWW 2015), whose time per token does not grow with the
+    number of topics, e.g., for a thousand topics.  Each of its ALIAS_MH_STEPS steps per token proposes
+    1) a topic from the word's proposal (n_wk + b) / (bV + n_k), drawn in constant time from alias tables:
+       one of the word's nonzero topics, n_wk / (bV + n_k), and one of the smoothing of every topic,
+       b / (bV + n_k), shared by all words.  The tables are stale, i.e., built from the counts when the
+       table was last built, and are built again once they have been drawn from as many times as they
+       have topics, so building them costs constant time per draw too, and
+    2) a topic from the document's proposal n_dk + a, drawn by taking the topic of another random token of
+       the document or, with probability proportional to a times the number of topics, a random topic,
+    and accepts it with the Metropolis-Hastings probability of the exact distribution above given the
+    proposal in force.  As in LightLDA, this is an approximation:  a stale table was built from counts that
+    included the topics the token and the other tokens of its word had then, so the proposal depends on the
+    state being sampled, and the topics it samples are slightly off the exact distribution however long it
+    runs.  On a corpus of a few tokens the difference is plain (see compareSamplersExact.py);  it shrinks as
+    the words have more tokens, since one token then hardly changes its word's table, so it is meant for
+    large corpora with many topics, where the exact samplers above are slow.
+
+    ParallelSampler runs any of these samplers on several cores as approximate distributed LDA (AD-LDA,
+    Newman, Asuncion, Smyth and Welling, "Distributed Algorithms for Topic Models", JMLR 2009).  The
+    documents are split into one shard per worker process, with about the same number of tokens each.
+    The token topics, document-topic counts and the word-topic counts and topic totals are kept in shared
+    memory;  in each iteration every worker samples its shard against the word-topic counts as they were
+    at the start of the iteration, i.e., a snapshot, and sends back how it changed them, and these deltas
+    are then added to the counts for the next iteration.  A worker only copies and compares the rows of
+    the words of its own shard, with the word ids renumbered, so its time per iteration grows with its
+    shard rather than with the vocabulary size times the number of topics, which would otherwise keep
+    many workers from speeding sampling up.  Workers do not see each other's changes until
+    then, which is the approximation, and it hardly matters as long as each shard has many tokens.  The
+    workers draw their random numbers from seeds drawn from random in this process, so a run gives the
+    same topics for the same seed and number of workers.  The workers are started with the platform's
+    default start method and are handed the shared arrays by initializeWorker, so they sample the same
+    topics whether they are forked or spawned;  a script using a ParallelSampler must only run its main
+    code under if __name__ == "__main__", as spawned workers import it.
+
+    sample() runs the iterations, in this process or with a ParallelSampler, and can compute the log
+    likelihood of the topics every so many iterations (see logLikelihood), which rises quickly at first
+    and then levels off.  It stops sampling once an increase is less than a tolerance, so a corpus that
+    converges early is not sampled for longer than it needs, and logs the seconds, tokens/sec and log
+    likelihood of every iteration to a .csv file for tuning runs.
+
+    Every so many iterations sample() can also save a checkpoint (see saveCheckpoint) of everything the
+    following iterations depend on:  the topic of every token, the count arrays, the state of random and
+    the iteration and last log likelihood.  A run killed, e.g., by a batch scheduler, can then resume from
+    its last checkpoint and samples exactly the same topics as if it had not been stopped, as long as it
+    uses the same corpus, sampler and number of workers.
+
+    SAMPLERS maps the names of the samplers, e.g., SAMPLER in PyMallet_LDA.py, to their iteration
+    functions.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+from array import array
+from timeit import default_timer as timer
+
+import numpy as np
+
+VECTORIZED_MIN_TOPICS = 32  # number of topics from which a token's distribution is computed with numpy
+CONVERGENCE_TOLERANCE = 5e-4  # relative increase of the log likelihood below which sample() stops
+ALIAS_MH_STEPS = 2  # Metropolis-Hastings steps, each a word and a document proposal, per token of sampleIterationAlias
+
+
+class SamplerState:
+
+    def __init__(self, numTopics, docSmoothing, wordSmoothing):
+        """ Starts an empty state of numTopics topics, with the given Dirichlet smoothing of the
+            document-topic and topic-word distributions. """
+        self.numTopics = numTopics
+        self.docSmoothing = docSmoothing
+        self.wordSmoothing = wordSmoothing
+        self.vocabulary = []  # word of each word id, in the order the words were first seen
+        self.corpusVocabularySize = None  # of the whole corpus, for a shard of ParallelSampler with only its own words
+        self.wordIds = {}
+        self.tokenWordIds = array("i")
+        self.tokenTopics = array("i")
+        self.docOffsets = array("q", [0])
+        self.wordTopicCounts = array("i")
+        self.docTopicCounts = array("i")
+        self.topicTotals = array("i", [0] * numTopics)
+        self.zeroCounts = array("i", [0] * numTopics)
+
+    def addDocument(self, words):
+        """ Adds a document of the tokens words, each given a topic with random.randrange in turn. """
+        numTopics = self.numTopics
+        docBase = len(self.docTopicCounts)
+        self.docTopicCounts.extend(self.zeroCounts)
+        for word in words:
+            wordId = self.wordIds.get(word)
+            if wordId is None:
+                wordId = self.wordIds[word] = len(self.vocabulary)
+                self.vocabulary.append(word)
+                self.wordTopicCounts.extend(self.zeroCounts)
+            topic = random.randrange(numTopics)
+            self.tokenWordIds.append(wordId)
+            self.tokenTopics.append(topic)
+            self.wordTopicCounts[wordId * numTopics + topic] += 1
+            self.topicTotals[topic] += 1
+            self.docTopicCounts[docBase + topic] += 1
+        self.docOffsets.append(len(self.tokenWordIds))
+
+    def numDocuments(self):
+        return len(self.docOffsets) - 1
+
+    def numTokens(self):
+        return len(self.tokenWordIds)
+
+    def vocabularySize(self):
+        """ Returns the number of words the topic-word distributions are smoothed over. """
+        if self.corpusVocabularySize is not None:
+            return self.corpusVocabularySize
+        return len(self.vocabulary)
+
+    def wordTopicMatrix(self):
+        """ Returns the (vocabulary size x topics) numpy int32 view of wordTopicCounts.  No word can be
+            added while it is in use. """
+        return np.frombuffer(self.wordTopicCounts, dtype=np.int32).reshape(-1, self.numTopics)
+
+    def nonzeroWordTopicCounts(self):
+        """ Returns a list of a dict per word id from each topic to the word's count of it, for the topics
+            with a nonzero count. """
+        wordIds, topics = np.nonzero(self.wordTopicMatrix())
+        counts = self.wordTopicMatrix()[wordIds, topics].tolist()
+        wordStarts = np.searchsorted(wordIds, np.arange(len(self.vocabulary) + 1)).tolist()
+        topics = topics.tolist()
+        return [dict(zip(topics[wordStart:wordEnd], counts[wordStart:wordEnd]))
+                for wordStart, wordEnd in zip(wordStarts, wordStarts[1:])]
+
+    def docTopicMatrix(self):
+        """ Returns the (documents x topics) numpy int32 view of docTopicCounts.  No document can be added
+            while it is in use. """
+        return np.frombuffer(self.docTopicCounts, dtype=np.int32).reshape(-1, self.numTopics)
+
+def pairwiseSum(values):
+    """ Returns the sum of the list of floats values added up in the same order as numpy's pairwise
+        summation in np.sum of a float64 array, so the result is the same to the last bit. """
+    count = len(values)
+    if count < 8:
+        total = 0.0
+        for value in values:
+            total += value
+        return total
+    if count <= 128:
+        partials = values[:8]
+        blockEnd = count - count % 8
+        for blockStart in range(8, blockEnd, 8):
+            partials = [partial + value for partial, value in zip(partials, values[blockStart:blockStart + 8])]
+        total = ((partials[0] + partials[1]) + (partials[2] + partials[3])) + \
+                ((partials[4] + partials[5]) + (partials[6] + partials[7]))
+        for value in values[blockEnd:]:
+            total += value
+        return total
+    half = count // 2
+    half -= half % 8
+    return pairwiseSum(values[:half]) + pairwiseSum(values[half:])
+
+def sampleIteration(state):
+    """ Resamples the topic of every token of state once, document by document. """
+    if state.numTopics >= VECTORIZED_MIN_TOPICS:
+        sampleIterationVectorized(state)
+        return
+    numTopics = state.numTopics
+    docSmoothing = state.docSmoothing
+    wordSmoothing = state.wordSmoothing
+    smoothingTimesVocabSize = wordSmoothing * state.vocabularySize()
+    tokenWordIds = state.tokenWordIds
+    tokenTopics = state.tokenTopics
+    docOffsets = state.docOffsets
+    wordTopicCounts = state.wordTopicCounts
+    docTopicCounts = state.docTopicCounts
+    randomValue = random.random  # random.uniform(0, x) is x * random.random()
+
+    topicTotals = state.topicTotals.tolist()
+    topicDenominators = [topicTotal + smoothingTimesVocabSize for topicTotal in topicTotals]
+    for doc in range(len(docOffsets) - 1):
+        docStart = docOffsets[doc]
+        docEnd = docOffsets[doc + 1]
+        if docStart == docEnd:
+            continue
+        docBase = doc * numTopics
+        docCounts = docTopicCounts[docBase:docBase + numTopics].tolist()
+        docDenominator = (docEnd - docStart) + numTopics * docSmoothing
+        docFactors = [(docCount + docSmoothing) / docDenominator for docCount in docCounts]
+        for token in range(docStart, docEnd):
+            wordBase = tokenWordIds[token] * numTopics
+            oldTopic = tokenTopics[token]
+
+            ## erase the effect of this token
+            wordTopicCounts[wordBase + oldTopic] -= 1
+            topicTotals[oldTopic] -= 1
+            topicDenominators[oldTopic] = topicTotals[oldTopic] + smoothingTimesVocabSize
+            docCounts[oldTopic] -= 1
+            docFactors[oldTopic] = (docCounts[oldTopic] + docSmoothing) / docDenominator
+
+            topicProbs = [docFactor * ((wordCount + wordSmoothing) / topicDenominator)
+                          for docFactor, wordCount, topicDenominator
+                          in zip(docFactors, wordTopicCounts[wordBase:wordBase + numTopics], topicDenominators)]
+
+            ## sample from an array that doesn't sum to 1.0
+            sample = pairwiseSum(topicProbs) * randomValue()
+            newTopic = 0
+            while sample > topicProbs[newTopic]:
+                sample -= topicProbs[newTopic]
+                newTopic += 1
+
+            ## add back in the effect of this token
+            wordTopicCounts[wordBase + newTopic] += 1
+            topicTotals[newTopic] += 1
+            topicDenominators[newTopic] = topicTotals[newTopic] + smoothingTimesVocabSize
+            docCounts[newTopic] += 1
+            docFactors[newTopic] = (docCounts[newTopic] + docSmoothing) / docDenominator
+            tokenTopics[token] = newTopic
+        docTopicCounts[docBase:docBase + numTopics] = array("i", docCounts)
+    state.topicTotals = array("i", topicTotals)
+
+def sampleIterationVectorized(state):
+    """ sampleIteration() computing the distribution of each token with numpy. """
+    numTopics = state.numTopics
+    docSmoothing = state.docSmoothing
+    wordSmoothing = state.wordSmoothing
+    smoothingTimesVocabSize = wordSmoothing * state.vocabularySize()
+    tokenWordIds = state.tokenWordIds
+    tokenTopics = state.tokenTopics
+    docOffsets = state.docOffsets
+    wordTopicCounts = state.wordTopicCounts
+    wordTopicMatrix = state.wordTopicMatrix()
+    docTopicCounts = state.docTopicCounts
+    randomValue = random.random
+
+    topicTotals = state.topicTotals.tolist()
+    topicDenominators = np.array(topicTotals, dtype=float) + smoothingTimesVocabSize
+    walk = np.empty(numTopics + 1)  # the sample followed by the topic probabilities
+    topicProbs = walk[1:]
+    remainders = np.empty(numTopics + 1)  # the sample left after subtracting each topic's probability
+    stopsAt = np.empty(numTopics, dtype=bool)
+    for doc in range(len(docOffsets) - 1):
+        docStart = docOffsets[doc]
+        docEnd = docOffsets[doc + 1]
+        if docStart == docEnd:
+            continue
+        docBase = doc * numTopics
+        docCounts = docTopicCounts[docBase:docBase + numTopics].tolist()
+        docDenominator = (docEnd - docStart) + numTopics * docSmoothing
+        docFactors = (np.array(docCounts, dtype=float) + docSmoothing) / docDenominator
+        for token in range(docStart, docEnd):
+            wordId = tokenWordIds[token]
+            wordBase = wordId * numTopics
+            oldTopic = tokenTopics[token]
+
+            wordTopicCounts[wordBase + oldTopic] -= 1
+            topicTotals[oldTopic] -= 1
+            topicDenominators[oldTopic] = topicTotals[oldTopic] + smoothingTimesVocabSize
+            docCounts[oldTopic] -= 1
+            docFactors[oldTopic] = (docCounts[oldTopic] + docSmoothing) / docDenominator
+
+            np.add(wordTopicMatrix[wordId], wordSmoothing, out=topicProbs)
+            np.divide(topicProbs, topicDenominators, out=topicProbs)
+            np.multiply(topicProbs, docFactors, out=topicProbs)
+            walk[0] = np.sum(topicProbs) * randomValue()
+            np.subtract.accumulate(walk, out=remainders)
+            np.less_equal(remainders[:numTopics], topicProbs, out=stopsAt)
+            newTopic = int(stopsAt.argmax())
+
+            wordTopicCounts[wordBase + newTopic] += 1
+            topicTotals[newTopic] += 1
+            topicDenominators[newTopic] = topicTotals[newTopic] + smoothingTimesVocabSize
+            docCounts[newTopic] += 1
+            docFactors[newTopic] = (docCounts[newTopic] + docSmoothing) / docDenominator
+            tokenTopics[token] = newTopic
+        docTopicCounts[docBase:docBase + numTopics] = array("i", docCounts)
+    state.topicTotals = array("i", topicTotals)
+
+def sampleIterationSparse(state):
+    """ Resamples the topic of every token of state once, document by document, with SparseLDA's
+        smoothing, document and topic-word buckets. """
+    numTopics = state.numTopics
+    docSmoothing = state.docSmoothing
+    wordSmoothing = state.wordSmoothing
+    smoothingTimesVocabSize = wordSmoothing * state.vocabularySize()
+    smoothingProduct = docSmoothing * wordSmoothing
+    tokenWordIds = state.tokenWordIds
+    tokenTopics = state.tokenTopics
+    docOffsets = state.docOffsets
+    wordTopicCounts = state.wordTopicCounts
+    docTopicCounts = state.docTopicCounts
+    wordTopicDicts = state.nonzeroWordTopicCounts()
+    randomValue = random.random
+
+    topicTotals = state.topicTotals.tolist()
+    topicDenominators = [topicTotal + smoothingTimesVocabSize for topicTotal in topicTotals]
+    smoothingMass = 0.0
+    for topicDenominator in topicDenominators:
+        smoothingMass += smoothingProduct / topicDenominator
+    ## (a + n_dk) / (bV + n_k), the topic-word bucket's factor of each topic, for the current document
+    topicWordCoefficients = [docSmoothing / topicDenominator for topicDenominator in topicDenominators]
+    for doc in range(len(docOffsets) - 1):
+        docStart = docOffsets[doc]
+        docEnd = docOffsets[doc + 1]
+        if docStart == docEnd:
+            continue
+        docBase = doc * numTopics
+        docCounts = {}
+        for topic, docCount in enumerate(docTopicCounts[docBase:docBase + numTopics]):
+            if docCount > 0:
+                docCounts[topic] = docCount
+        docMass = 0.0
+        for topic, docCount in docCounts.items():
+            docMass += wordSmoothing * docCount / topicDenominators[topic]
+            topicWordCoefficients[topic] = (docSmoothing + docCount) / topicDenominators[topic]
+
+        for token in range(docStart, docEnd):
+            wordBase = tokenWordIds[token] * numTopics
+            wordCounts = wordTopicDicts[tokenWordIds[token]]
+            oldTopic = tokenTopics[token]
+
+            ## erase the effect of this token
+            docCount = docCounts[oldTopic]
+            topicDenominator = topicDenominators[oldTopic]
+            smoothingMass -= smoothingProduct / topicDenominator
+            docMass -= wordSmoothing * docCount / topicDenominator
+            docCount -= 1
+            if docCount > 0:
+                docCounts[oldTopic] = docCount
+            else:
+                del docCounts[oldTopic]
+            topicTotals[oldTopic] -= 1
+            topicDenominator = topicDenominators[oldTopic] = topicTotals[oldTopic] + smoothingTimesVocabSize
+            smoothingMass += smoothingProduct / topicDenominator
+            docMass += wordSmoothing * docCount / topicDenominator
+            topicWordCoefficients[oldTopic] = (docSmoothing + docCount) / topicDenominator
+            wordCount = wordCounts[oldTopic] - 1
+            if wordCount > 0:
+                wordCounts[oldTopic] = wordCount
+            else:
+                del wordCounts[oldTopic]
+            wordTopicCounts[wordBase + oldTopic] -= 1
+
+            topicWordMass = 0.0
+            for topic, wordCount in wordCounts.items():
+                topicWordMass += topicWordCoefficients[topic] * wordCount
+
+            ## pick a bucket, then the topic within it
+            sample = (smoothingMass + docMass + topicWordMass) * randomValue()
+            newTopic = oldTopic  # only kept if rounding left the sample beyond the bucket's topics
+            if sample < topicWordMass:
+                for topic, wordCount in wordCounts.items():
+                    newTopic = topic
+                    sample -= topicWordCoefficients[topic] * wordCount
+                    if sample <= 0.0:
+                        break
+            elif sample < topicWordMass + docMass and len(docCounts) > 0:
+                sample = (sample - topicWordMass) / wordSmoothing
+                for topic, docCount in docCounts.items():
+                    newTopic = topic
+                    sample -= docCount / topicDenominators[topic]
+                    if sample <= 0.0:
+                        break
+            else:
+                sample = (sample - topicWordMass - docMass) / smoothingProduct
+                for topic in range(numTopics):
+                    newTopic = topic
+                    sample -= 1.0 / topicDenominators[topic]
+                    if sample <= 0.0:
+                        break
+
+            ## add back in the effect of this token
+            docCount = docCounts.get(newTopic, 0)
+            topicDenominator = topicDenominators[newTopic]
+            smoothingMass -= smoothingProduct / topicDenominator
+            docMass -= wordSmoothing * docCount / topicDenominator
+            docCount += 1
+            docCounts[newTopic] = docCount
+            topicTotals[newTopic] += 1
+            topicDenominator = topicDenominators[newTopic] = topicTotals[newTopic] + smoothingTimesVocabSize
+            smoothingMass += smoothingProduct / topicDenominator
+            docMass += wordSmoothing * docCount / topicDenominator
+            topicWordCoefficients[newTopic] = (docSmoothing + docCount) / topicDenominator
+            wordCounts[newTopic] = wordCounts.get(newTopic, 0) + 1
+            wordTopicCounts[wordBase + newTopic] += 1
+            tokenTopics[token] = newTopic
+
+        docRow = [0] * numTopics
+        for topic, docCount in docCounts.items():
+            docRow[topic] = docCount
+            topicWordCoefficients[topic] = docSmoothing / topicDenominators[topic]
+        docTopicCounts[docBase:docBase + numTopics] = array("i", docRow)
+    state.topicTotals = array("i", topicTotals)
+
+def aliasTable(weights):
+    """ Returns [probabilities, aliases] of Vose's alias method for the list of nonnegative weights, not
+        all zero.  Index i is then drawn with probability weights[i] / sum(weights) in constant time by
+        taking position = random.random() * len(weights) and i = int(position), and if position - i is not
+        less than probabilities[i], i = aliases[i] instead. """
+    count = len(weights)
+    total = 0.0
+    for weight in weights:
+        total += weight
+    scaled = [weight * count / total for weight in weights]
+    probabilities = [1.0] * count
+    aliases = list(range(count))
+    small = [index for index in range(count) if scaled[index] < 1.0]
+    large = [index for index in range(count) if scaled[index] >= 1.0]
+    while len(small) > 0 and len(large) > 0:
+        smallIndex = small.pop()
+        largeIndex = large.pop()
+        probabilities[smallIndex] = scaled[smallIndex]
+        aliases[smallIndex] = largeIndex
+        scaled[largeIndex] = (scaled[largeIndex] + scaled[smallIndex]) - 1.0
+        if scaled[largeIndex] < 1.0:
+            small.append(largeIndex)
+        else:
+            large.append(largeIndex)
+    return [probabilities, aliases]
+
+def sampleIterationAlias(state):
+    """ Resamples the topic of every token of state once, document by document, with ALIAS_MH_STEPS
+        Metropolis-Hastings steps of alias table word proposals and document proposals. """
+    numTopics = state.numTopics
+    docSmoothing = state.docSmoothing
+    wordSmoothing = state.wordSmoothing
+    smoothingTimesVocabSize = wordSmoothing * state.vocabularySize()
+    tokenWordIds = state.tokenWordIds
+    tokenTopics = state.tokenTopics
+    docOffsets = state.docOffsets
+    wordTopicCounts = state.wordTopicCounts
+    docTopicCounts = state.docTopicCounts
+    wordTopicDicts = state.nonzeroWordTopicCounts()
+    randomValue = random.random
+
+    topicTotals = state.topicTotals.tolist()
+    ## each word's stale table of its nonzero topics:  [draws left, total weight, weight of each topic,
+    ## topics, probabilities, aliases];  the smoothing table is the same for every word
+    wordTables = {}
+    smoothingTable = None
+    for doc in range(len(docOffsets) - 1):
+        docStart = docOffsets[doc]
+        docEnd = docOffsets[doc + 1]
+        if docStart == docEnd:
+            continue
+        docBase = doc * numTopics
+        docCounts = docTopicCounts[docBase:docBase + numTopics].tolist()
+        otherTokens = docEnd - docStart - 1  # of the document besides the token being sampled
+        docProposalMass = otherTokens + numTopics * docSmoothing
+        for token in range(docStart, docEnd):
+            wordId = tokenWordIds[token]
+            wordBase = wordId * numTopics
+            wordCounts = wordTopicDicts[wordId]
+            topic = tokenTopics[token]
+
+            ## erase the effect of this token
+            wordTopicCounts[wordBase + topic] -= 1
+            topicTotals[topic] -= 1
+            docCounts[topic] -= 1
+            wordCount = wordCounts[topic] - 1
+            if wordCount > 0:
+                wordCounts[topic] = wordCount
+            else:
+                del wordCounts[topic]
+
+            for step in range(ALIAS_MH_STEPS):
+                ## word proposal from the stale tables, built again once they are used up
+                wordTable = wordTables.get(wordId)
+                if wordTable is None or wordTable[0] == 0:
+                    weights = {}
+                    for candidate, wordCount in wordCounts.items():
+                        weights[candidate] = wordCount / (topicTotals[candidate] + smoothingTimesVocabSize)
+                    wordTable = wordTables[wordId] = [max(len(weights), 1), 0.0, weights, list(weights.keys())]
+                    if len(weights) > 0:
+                        wordTable.extend(aliasTable(list(weights.values())))
+                        for weight in weights.values():
+                            wordTable[1] += weight
+                if smoothingTable is None or smoothingTable[0] == 0:
+                    weights = [wordSmoothing / (topicTotal + smoothingTimesVocabSize) for topicTotal in topicTotals]
+                    smoothingTable = [numTopics, pairwiseSum(weights), weights] + aliasTable(weights)
+                if randomValue() * (wordTable[1] + smoothingTable[1]) < wordTable[1]:
+                    wordTable[0] -= 1
+                    probabilities = wordTable[4]
+                    position = randomValue() * len(probabilities)
+                    index = int(position)
+                    proposed = wordTable[3][index if position - index < probabilities[index] else wordTable[5][index]]
+                else:
+                    smoothingTable[0] -= 1
+                    probabilities = smoothingTable[3]
+                    position = randomValue() * numTopics
+                    proposed = int(position)
+                    if position - proposed >= probabilities[proposed]:
+                        proposed = smoothingTable[4][proposed]
+                if proposed != topic:
+                    ## accept with probability p(proposed) q(topic) / (p(topic) q(proposed))
+                    wordWeights = wordTable[2]
+                    smoothingWeights = smoothingTable[2]
+                    acceptance = ((docCounts[proposed] + docSmoothing)
+                                  * (wordTopicCounts[wordBase + proposed] + wordSmoothing)
+                                  / (topicTotals[proposed] + smoothingTimesVocabSize)
+                                  * (wordWeights.get(topic, 0.0) + smoothingWeights[topic]))
+                    rejection = ((docCounts[topic] + docSmoothing)
+                                 * (wordTopicCounts[wordBase + topic] + wordSmoothing)
+                                 / (topicTotals[topic] + smoothingTimesVocabSize)
+                                 * (wordWeights.get(proposed, 0.0) + smoothingWeights[proposed]))
+                    if randomValue() * rejection < acceptance:
+                        topic = proposed
+
+                ## document proposal n_dk + a from the topics of the document's other tokens
+                position = randomValue() * docProposalMass
+                if position < otherTokens:
+                    otherToken = docStart + int(position)
+                    if otherToken >= token:
+                        otherToken += 1
+                    proposed = tokenTopics[otherToken]
+                else:
+                    proposed = min(int((position - otherTokens) / docSmoothing), numTopics - 1)
+                if proposed != topic:  # the document factor n_dk + a of p and q cancels out
+                    acceptance = ((wordTopicCounts[wordBase + proposed] + wordSmoothing)
+                                  * (topicTotals[topic] + smoothingTimesVocabSize))
+                    rejection = ((wordTopicCounts[wordBase + topic] + wordSmoothing)
+                                 * (topicTotals[proposed] + smoothingTimesVocabSize))
+                    if randomValue() * rejection < acceptance:
+                        topic = proposed
+
+            ## add back in the effect of this token
+            wordTopicCounts[wordBase + topic] += 1
+            topicTotals[topic] += 1
+            docCounts[topic] += 1
+            wordCounts[topic] = wordCounts.get(topic, 0) + 1
+            tokenTopics[token] = topic
+        docTopicCounts[docBase:docBase + numTopics] = array("i", docCounts)
+    state.topicTotals = array("i", topicTotals)
+
+SAMPLERS = {"arrays": sampleIteration, "sparse": sampleIterationSparse, "alias": sampleIterationAlias}
+
+def arrayFromNumpy(typecode, values):
+    """ Returns an array.array of typecode holding a copy of the numpy array values of the same item type. """
+    copy = array(typecode)
+    copy.frombytes(values.tobytes())
+    return copy
+
+workerArrays = {}  # the shared arrays and settings of a worker process of ParallelSampler, set by initializeWorker
+
+def initializeWorker(numTopics, docSmoothing, wordSmoothing, vocabulary, sharedArrays):
+    """ Keeps the settings and numpy views of the shared arrays of ParallelSampler in this worker process. """
+    workerArrays["settings"] = [numTopics, docSmoothing, wordSmoothing, vocabulary]
+    for name, [dtype, sharedArray] in sharedArrays.items():
+        workerArrays[name] = np.frombuffer(sharedArray, dtype=dtype)
+
+def sampleShard(task):
+    """ Resamples the documents [docStart, docEnd) with the sampler samplerName against the shared
+        word-topic counts, seeding random with seed.  Their topics and document-topic counts are written
+        back to the shared arrays and [word-topic count indexes, changes of the counts there] returned.
+        Only the word-topic counts of the shard's words are copied, as the rows of a state of its own. """
+    samplerName, docStart, docEnd, seed = task
+    numTopics, docSmoothing, wordSmoothing, vocabulary = workerArrays["settings"]
+    docOffsets = workerArrays["docOffsets"]
+    tokenStart = docOffsets[docStart]
+    tokenEnd = docOffsets[docEnd]
+    shardTokenWordIds = workerArrays["tokenWordIds"][tokenStart:tokenEnd]
+    shardWordIds = np.unique(shardTokenWordIds).astype(np.int64)  # the corpus word id of each shard word id
+    wordTopicSnapshot = workerArrays["wordTopicCounts"].reshape(-1, numTopics)[shardWordIds]
+
+    state = SamplerState(numTopics, docSmoothing, wordSmoothing)
+    state.vocabulary = [vocabulary[wordId] for wordId in shardWordIds.tolist()]
+    state.corpusVocabularySize = len(vocabulary)
+    state.tokenWordIds = arrayFromNumpy("i", np.searchsorted(shardWordIds, shardTokenWordIds).astype(np.int32))
+    state.tokenTopics = arrayFromNumpy("i", workerArrays["tokenTopics"][tokenStart:tokenEnd])
+    state.docOffsets = arrayFromNumpy("q", docOffsets[docStart:docEnd + 1] - tokenStart)
+    state.docTopicCounts = arrayFromNumpy("i", workerArrays["docTopicCounts"][docStart * numTopics:docEnd * numTopics])
+    state.wordTopicCounts = arrayFromNumpy("i", wordTopicSnapshot)
+    state.topicTotals = arrayFromNumpy("i", workerArrays["topicTotals"])
+    random.seed(seed)
+    SAMPLERS[samplerName](state)
+
+    workerArrays["tokenTopics"][tokenStart:tokenEnd] = np.frombuffer(state.tokenTopics, dtype=np.int32)
+    workerArrays["docTopicCounts"][docStart * numTopics:docEnd * numTopics] = \
+        np.frombuffer(state.docTopicCounts, dtype=np.int32)
+    wordTopicChanges = state.wordTopicMatrix() - wordTopicSnapshot
+    changedWords, changedTopics = np.nonzero(wordTopicChanges)
+    return [shardWordIds[changedWords] * numTopics + changedTopics, wordTopicChanges[changedWords, changedTopics]]
+
+def shardBoundaries(docOffsets, numShards):
+    """ Returns the numShards + 1 document indexes splitting the documents of docOffsets into numShards
+        shards of about the same number of tokens. """
+    numDocuments = len(docOffsets) - 1
+    tokenTargets = np.linspace(0, docOffsets[-1], numShards + 1)
+    boundaries = np.searchsorted(np.asarray(docOffsets), tokenTargets).tolist()
+    boundaries[0] = 0
+    boundaries[-1] = numDocuments
+    for shard in range(1, numShards + 1):
+        boundaries[shard] = min(max(boundaries[shard], boundaries[shard - 1]), numDocuments)
+    return boundaries
+
+class ParallelSampler:
+
+    def __init__(self, state, numWorkers, samplerName="arrays"):
+        """ Copies the arrays of state to shared memory and starts numWorkers worker processes sampling
+            their shards of its documents with the sampler samplerName of SAMPLERS. """
+        context = multiprocessing.get_context()  # the platform's default start method
+        self.state = state
+        self.numWorkers = numWorkers
+        self.samplerName = samplerName
+        self.sharedArrays = {}
+        self.views = {}
+        for name, dtype in [["tokenWordIds", np.int32], ["tokenTopics", np.int32], ["docOffsets", np.int64],
+                            ["docTopicCounts", np.int32], ["wordTopicCounts", np.int32], ["topicTotals", np.int32]]:
+            values = getattr(state, name)
+            sharedArray = context.RawArray(values.typecode, len(values))
+            self.views[name] = np.frombuffer(sharedArray, dtype=dtype)
+            self.views[name][:] = np.frombuffer(values, dtype=dtype)
+            self.sharedArrays[name] = [dtype, sharedArray]
+        self.boundaries = shardBoundaries(state.docOffsets, numWorkers)
+        self.pool = context.Pool(numWorkers, initializeWorker, (state.numTopics, state.docSmoothing,
+                                                                state.wordSmoothing, state.vocabulary,
+                                                                self.sharedArrays))
+
+    def sampleIteration(self):
+        """ Runs one AD-LDA iteration:  the workers sample their shards against the shared word-topic counts,
+            whose changes are then added to them. """
+        wordTopicCounts = self.views["wordTopicCounts"]
+        topicTotals = self.views["topicTotals"]
+        tasks = [[self.samplerName, self.boundaries[shard], self.boundaries[shard + 1], random.getrandbits(64)]
+                 for shard in range(self.numWorkers)]
+        for changedIndexes, changes in self.pool.map(sampleShard, tasks):
+            wordTopicCounts[changedIndexes] += changes
+            np.add.at(topicTotals, changedIndexes % self.state.numTopics, changes)
+
+    def countMatrices(self):
+        """ Returns [word-topic counts, document-topic counts] as 2-D views of the shared arrays. """
+        numTopics = self.state.numTopics
+        return [self.views["wordTopicCounts"].reshape(-1, numTopics), self.views["docTopicCounts"].reshape(-1, numTopics)]
+
+    def copyToState(self):
+        """ Copies the shared arrays back to the state, e.g., to save a checkpoint of it. """
+        for name in self.sharedArrays:
+            values = getattr(self.state, name)
+            values[:] = arrayFromNumpy(values.typecode, self.views[name])
+
+    def close(self):
+        """ Stops the worker processes and copies the shared arrays back to the state. """
+        self.pool.close()
+        self.pool.join()
+        self.copyToState()
+
+def logLikelihood(wordTopicCounts, docTopicCounts, docSmoothing, wordSmoothing):
+    """ Returns the log of the joint probability of the words and topics of the tokens, given the numpy
+        (vocabulary size x topics) wordTopicCounts and (documents x topics) docTopicCounts, with the topic
+        and word distributions integrated out.  Only the nonzero counts need their log gamma, as the terms
+        of the others are 0. """
+    from scipy.special import gammaln  # only needed for the log likelihood
+
+    vocabularySize, numTopics = wordTopicCounts.shape
+    topicTotals = wordTopicCounts.sum(axis=0)
+    docLengths = docTopicCounts.sum(axis=1)
+    nonzeroWordCounts = wordTopicCounts[wordTopicCounts > 0]
+    nonzeroDocCounts = docTopicCounts[docTopicCounts > 0]
+    docLikelihood = (len(docLengths) * gammaln(numTopics * docSmoothing)
+                     - gammaln(docLengths + numTopics * docSmoothing).sum()
+                     + gammaln(nonzeroDocCounts + docSmoothing).sum() - len(nonzeroDocCounts) * gammaln(docSmoothing))
+    wordLikelihood = (numTopics * gammaln(vocabularySize * wordSmoothing)
+                      - gammaln(topicTotals + vocabularySize * wordSmoothing).sum()
+                      + gammaln(nonzeroWordCounts + wordSmoothing).sum() - len(nonzeroWordCounts) * gammaln(wordSmoothing))
+    return float(docLikelihood + wordLikelihood)
+
+def corpusHash(state):
+    """ Returns the SHA-256 hash of the vocabulary and the word ids of the tokens of every document of state,
+        which a checkpoint is only resumed for. """
+    corpusHasher = hashlib.sha256()
+    corpusHasher.update("\n".join(state.vocabulary).encode('utf-8'))
+    corpusHasher.update(state.tokenWordIds.tobytes())
+    corpusHasher.update(state.docOffsets.tobytes())
+    return corpusHasher.hexdigest()
+
+def saveCheckpoint(state, checkpointFileName, iteration, previousLikelihood, samplerName, numWorkers):
+    """ Saves the topics and counts of state, the state of random, the number of the iteration just run
+        and the log likelihood last computed to the compressed .npz file checkpointFileName, written to a
+        temporary file and renamed so a run killed while saving it still leaves the previous checkpoint. """
+    randomVersion, randomInternalState, gaussNext = random.getstate()
+    settings = {"iteration": iteration, "previous likelihood": previousLikelihood, "sampler": samplerName,
+                "workers": numWorkers, "topics": state.numTopics, "doc smoothing": state.docSmoothing,
+                "word smoothing": state.wordSmoothing, "corpus": corpusHash(state),
+                "random version": randomVersion, "gauss next": gaussNext}
+    tempFileName = checkpointFileName + ".%d.tmp.npz" % os.getpid()
+    np.savez_compressed(tempFileName, settings=np.array(json.dumps(settings)),
+                        tokenTopics=np.frombuffer(state.tokenTopics, dtype=np.int32),
+                        wordTopicCounts=np.frombuffer(state.wordTopicCounts, dtype=np.int32),
+                        docTopicCounts=np.frombuffer(state.docTopicCounts, dtype=np.int32),
+                        topicTotals=np.frombuffer(state.topicTotals, dtype=np.int32),
+                        randomState=np.array(randomInternalState, dtype=np.uint32))
+    os.replace(tempFileName, checkpointFileName)
+
+def loadCheckpoint(state, checkpointFileName, samplerName, numWorkers):
+    """ Restores the topics and counts of state and the state of random from the checkpoint
+        checkpointFileName saved by saveCheckpoint, and returns [iteration, previousLikelihood] of it.
+        Raises ValueError if it was saved for another corpus, number of topics, smoothing, sampler or
+        number of workers, which would not sample the same topics. """
+    checkpoint = np.load(checkpointFileName, allow_pickle=False)
+    try:
+        settings = json.loads(str(checkpoint["settings"]))
+        expected = {"sampler": samplerName, "workers": numWorkers, "topics": state.numTopics,
+                    "doc smoothing": state.docSmoothing, "word smoothing": state.wordSmoothing,
+                    "corpus": corpusHash(state)}
+        for name, value in expected.items():
+            if settings[name] != value:
+                raise ValueError("Checkpoint %s was saved with %s %r rather than %r" %
+                                 (checkpointFileName, name, settings[name], value))
+        for name in ["tokenTopics", "wordTopicCounts", "docTopicCounts", "topicTotals"]:
+            getattr(state, name)[:] = arrayFromNumpy("i", checkpoint[name].astype(np.int32))
+        random.setstate((settings["random version"], tuple(checkpoint["randomState"].tolist()),
+                         settings["gauss next"]))
+    finally:
+        checkpoint.close()
+    return [settings["iteration"], settings["previous likelihood"]]
+
+def truncateLog(logFileName, lastIteration):
+    """ Removes the lines of the iterations after lastIteration, e.g., those run after the checkpoint
+        being resumed, from the .csv file logFileName. """
+    logFile = open(logFileName, "r")
+    lines = logFile.readlines()
+    logFile.close()
+    keptLines = lines[:1] + [line for line in lines[1:] if int(line.split(",", 1)[0]) <= lastIteration]
+    logFile = open(logFileName, "w")
+    logFile.write("".join(keptLines))
+    logFile.close()
+
+def sample(state, maxIterations, samplerName="arrays", numWorkers=1, likelihoodInterval=0,
+           convergenceTolerance=CONVERGENCE_TOLERANCE, logFileName=None, checkpointFileName=None,
+           checkpointInterval=0, resume=False):
+    """ Runs up to maxIterations Gibbs sampling iterations over state with the sampler samplerName of
+        SAMPLERS, in numWorkers worker processes if more than one (see ParallelSampler), printing the
+        seconds and tokens/sec of each.  Every likelihoodInterval iterations, unless it is 0, the log
+        likelihood is computed too, and sampling stops once it has gone up by less than
+        convergenceTolerance times its size since it was last computed.  Every iteration is logged to the
+        .csv file logFileName, if any.  Every checkpointInterval iterations, unless it is 0, a checkpoint
+        is saved to checkpointFileName, and if resume is True and it exists, sampling resumes from it
+        rather than from state, as if it had never stopped.  Otherwise an earlier checkpointFileName is
+        deleted before sampling, and it is deleted once sampling has finished, so only a run that was
+        stopped leaves a checkpoint.  Returns the seconds of every iteration run. """
+    firstIteration = 1
+    previousLikelihood = None
+    if not resume and checkpointFileName is not None and os.path.exists(checkpointFileName):
+        os.remove(checkpointFileName)  # of an earlier run, which this run does not continue
+    if resume and checkpointFileName is not None and os.path.exists(checkpointFileName):
+        lastIteration, previousLikelihood = loadCheckpoint(state, checkpointFileName, samplerName, numWorkers)
+        firstIteration = lastIteration + 1
+        print("Resuming from", checkpointFileName, "after iteration", lastIteration)
+    parallelSampler = None
+    if numWorkers > 1:
+        parallelSampler = ParallelSampler(state, numWorkers, samplerName)
+    logFile = None
+    if logFileName is not None:
+        if firstIteration > 1 and os.path.exists(logFileName):
+            truncateLog(logFileName, firstIteration - 1)
+            logFile = open(logFileName, "a")
+        else:
+            logFile = open(logFileName, "w")
+            logFile.write("iteration,seconds,tokens per second,log likelihood\n")
+    iterationSeconds = []
+    try:
+        for iteration in range(firstIteration, maxIterations + 1):
+            start = timer()
+            if parallelSampler is None:
+                SAMPLERS[samplerName](state)
+            else:
+                parallelSampler.sampleIteration()
+            seconds = timer() - start
+            iterationSeconds.append(seconds)
+            tokensPerSecond = state.numTokens() / max(seconds, 1e-9)
+
+            likelihood = None
+            if likelihoodInterval > 0 and iteration % likelihoodInterval == 0:
+                if parallelSampler is None:
+                    wordTopicCounts, docTopicCounts = [state.wordTopicMatrix(), state.docTopicMatrix()]
+                else:
+                    wordTopicCounts, docTopicCounts = parallelSampler.countMatrices()
+                likelihood = logLikelihood(wordTopicCounts, docTopicCounts, state.docSmoothing, state.wordSmoothing)
+            print("iteration %d:  %.3f seconds, %.0f tokens/sec" % (iteration, seconds, tokensPerSecond) +
+                  ("" if likelihood is None else ", log likelihood %.1f" % likelihood))
+            if logFile is not None:
+                logFile.write("%d,%.6f,%.1f,%s\n" % (iteration, seconds, tokensPerSecond,
+                                                     "" if likelihood is None else "%.3f" % likelihood))
+                logFile.flush()
+
+            if likelihood is not None:
+                if previousLikelihood is not None and \
+                        likelihood - previousLikelihood < convergenceTolerance * abs(previousLikelihood):
+                    print("Log likelihood converged after", iteration, "iterations")
+                    break
+                previousLikelihood = likelihood
+
+            if checkpointFileName is not None and checkpointInterval > 0 and iteration % checkpointInterval == 0:
+                if parallelSampler is not None:
+                    parallelSampler.copyToState()
+                saveCheckpoint(state, checkpointFileName, iteration, previousLikelihood, samplerName, numWorkers)
+    finally:
+        if logFile is not None:
+            logFile.close()
+        if parallelSampler is not None:
+            parallelSampler.close()
+    if checkpointFileName is not None and os.path.exists(checkpointFileName):
+        os.remove(checkpointFileName)  # sampling finished, so there is nothing to resume
+    return iterationSeconds
@@ -21,6 +21,9 @@ from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
 import pandas as pd
 import numpy as np
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".."))  # for corpusLoader.py
+import corpusLoader
 
 from sklearn.pipeline import Pipeline
 from time import time
@@ -70,42 +73,16 @@ def write_file_top_words(model, feature_names, n_top_words, fileName):
     outputFile.close()
     outputFileTopics.close()
 
-### Read stop words from file stop_words.txt
-stopList = []
-stopFile = open('stop_words.txt', 'r')
-for line in stopFile:
-    stopList.append(line.strip().lower())
-stoplist = set(stopList)
-print("number of stop words in stop_words.txt file", len(stoplist))
-
-## Read specified chat corpus
-documentsFile = open(FILE_NAME_OF_CORPUS+".csv", 'r')
-
-docIndexToIndexInCSVDict = {}
-documents = []
-docCSVLines = []
-docIndex = 0
-for line in documentsFile:
-    docLineSplit = line.split(",")
-    docCSVLine = int(docLineSplit[0])
-    documentLine = docLineSplit[1]
-    newDoc = ""
-    for word in documentLine.strip().split():
-        if word not in stoplist:
-            newDoc += word + " "
-    if len(newDoc) > 0:
-        documents.append(newDoc)
-        docCSVLines.append(docCSVLine)
-        #print(docLineSplit[0])
-        docIndexToIndexInCSVDict[docIndex] = int(docLineSplit[0].strip())
-        docIndex += 1
+## Read specified chat corpus without the stop words in stop_words.txt
+documents, docIndexToIndexInCSVDict = corpusLoader.loadCorpus(FILE_NAME_OF_CORPUS)
+docCSVLines = list(docIndexToIndexInCSVDict.values())
 N_SAMPLES = len(documents)
 print("N_SAMPLES",N_SAMPLES, "len(docIndexToIndexInCSVDict)",len(docIndexToIndexInCSVDict))
 
 # LDA can only use raw term counts for LDA because it is a probabilistic graphical model
 tf_vectorizer = CountVectorizer(max_df=0.95, min_df=2, max_features=N_FEATURES, stop_words='english')
-tf = tf_vectorizer.fit_transform(documents)
-tf_feature_names = tf_vectorizer.get_feature_names()
+# fitted once per corpus and vectorizer settings, then loaded from the cache (see corpusLoader.py)
+tf, tf_feature_names = corpusLoader.loadVectorized(FILE_NAME_OF_CORPUS, tf_vectorizer, documents)
 
 #no_topics = 15
 
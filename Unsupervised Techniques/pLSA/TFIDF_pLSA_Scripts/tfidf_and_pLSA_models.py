@@ -36,6 +36,9 @@ from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from sklearn.decomposition import NMF
 from sklearn.pipeline import Pipeline
 from time import time
+import os, sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))  # for corpusLoader.py
+import corpusLoader
 
 #Global Variables - select appropriate chat file based on preprocessing
 ##FILE_NAME_OF_CORPUS = 'wholeChatsFilePOS_N_ADJ_V'
@@ -82,32 +85,8 @@ def write_file_top_words(model, feature_names, n_top_words, fileName):
     outputFile.close()
     outputFileTopics.close()
 
-### Read stop words from file stop_words.txt
-stopList = []
-stopFile = open('stop_words.txt', 'r')
-for line in stopFile:
-    stopList.append(line.strip().lower())
-stoplist = set(stopList)
-print("number of stop words in stop_words.txt file", len(stoplist))
-
-## Read specified chat corpus
-documentsFile = open(FILE_NAME_OF_CORPUS+".csv", 'r')
-
-docIndexToIndexInCSVDict = {}
-documents = []
-docIndex = 0
-for line in documentsFile:
-    docLineSplit = line.split(",")
-    documentLine = docLineSplit[1]
-    newDoc = ""
-    for word in documentLine.strip().split():
-        if word not in stoplist:
-            newDoc += word + " "
-    if len(newDoc) > 0:
-        documents.append(newDoc)
-        #print(docLineSplit[0])
-        docIndexToIndexInCSVDict[docIndex] = int(docLineSplit[0].strip())
-        docIndex += 1
+## Read specified chat corpus without the stop words in stop_words.txt
+documents, docIndexToIndexInCSVDict = corpusLoader.loadCorpus(FILE_NAME_OF_CORPUS)
 N_SAMPLES = len(documents)
 print("N_SAMPLES",N_SAMPLES, "len(docIndexToIndexInCSVDict)",len(docIndexToIndexInCSVDict))
 
@@ -116,7 +95,8 @@ tfidf_vectorizer = TfidfVectorizer(stop_words='english',
                                    use_idf=True,
                                    smooth_idf=True)
 t0 = time()
-tfidf = tfidf_vectorizer.fit_transform(documents)
+# fitted once per corpus and vectorizer settings, then loaded from the cache (see corpusLoader.py)
+tfidf, tfidf_feature_names = corpusLoader.loadVectorized(FILE_NAME_OF_CORPUS, tfidf_vectorizer, documents)
 print("fit_transform done in %0.3fs." % (time() - t0))
 
 # Fit the NMF pLSA model (Frobenius norm)
@@ -130,7 +110,6 @@ print("done in %0.3fs." % (time() - t0))
 
 # Print topics to screen and write topics to files
 print("\nTopics in NMF model (Frobenius norm):")
-tfidf_feature_names = tfidf_vectorizer.get_feature_names()
 print_top_words(nmf, tfidf_feature_names, NUMBER_OF_WORDS_PER_TOPICS)
 fileName = "TFIDF_pLSA_"+FILE_NAME_OF_CORPUS+"_NMF-model_FrobeniusNorm_" \
            +str(NUMBER_OF_TOPICS_PRINTED)+"topoics_"+str(NUMBER_OF_WORDS_PER_TOPICS)+"words.txt"
@@ -148,7 +127,6 @@ print("done in %0.3fs." % (time() - t0))
 
 # Print topics to screen and write topics to files
 print("\nTopics in NMF model (generalized Kullback-Leibler divergence):")
-tfidf_feature_names = tfidf_vectorizer.get_feature_names()
 print_top_words(nmf, tfidf_feature_names, NUMBER_OF_WORDS_PER_TOPICS)
 fileName = "TFIDF_pLSA_"+FILE_NAME_OF_CORPUS+"_NMF-model_Kullbac-Leibler_" \
            +str(NUMBER_OF_TOPICS_PRINTED)+"topoics_"+str(NUMBER_OF_WORDS_PER_TOPICS)+"words.txt"
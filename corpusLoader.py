@@ -0,0 +1,256 @@
+""" File:  corpusLoader.py
+    Description:  Loads a previously created preprocessed chat corpus for the topic modeling scripts
+    (LDA_model.py, tfidf_and_pLSA_models.py, PyMallet_LDA.py, CorEx.py and GuidedLDA.py), which each used to
+    repeat the same loop over the corpus .csv file.  The corpus is one of:
+    1) wholeChatsFilePOS_N_ADJ_V.csv -- preprocessing keeping nouns, adjectives, and verbs
+    2) wholeChatsFilePOS_N_ADJ.csv -- preprocessing keeping nouns and adjectives
+    3) wholeChatsFile.csv -- NO POS preprocessing so all parts of speech
+    4) onlyQuestionsFile.csv -- Only initial question of chats
+    with one chat per line formatted as:  chat line # in original .csv, cleaned chat text
+
+    Each document is the words of a line's chat text that are not in stop_words.txt, each followed by a
+    space, and lines left without words are skipped.  docIndexToIndexInCSVDict maps the index of each
+    document to its chat line # in the original .csv file.
+
+    When the preprocessing script also wrote the corpus as a binary corpus of token ids (see
+    Pre-processing/Preprocessing_Scripts/binaryCorpus.py) and it is up to date, i.e., written no earlier
+    than the .csv file and with a document per line of it, the documents are read from its memory-mapped
+    arrays instead of splitting every line of the .csv file, and each stop word is only looked up once per
+    vocabulary word rather than once per token.
+
+    The documents are cached in CACHE_DIRECTORY, one file per corpus, so later runs load them without
+    reading and filtering the corpus again.  The cache records the modification time, size and SHA-256
+    hash of the corpus file and the stop word file.  When the times and sizes are unchanged the documents
+    are loaded straight away;  otherwise the files are hashed and the documents are only filtered again if
+    a hash changed.
+
+    loadVectorized caches the sparse document-term matrix and vocabulary of fitting a scikit-learn
+    vectorizer, e.g., a CountVectorizer or TfidfVectorizer, to the documents, keyed by the documents and
+    the vectorizer's settings.  Rerunning a model, e.g., with another number of topics, then loads them
+    instead of tokenizing the documents and fitting the vectorizer again.  Only the latest vectorization of
+    each corpus with each vectorizer class is kept:  caching a new one, e.g., after the corpus, the stop words
+    or the vectorizer's settings changed, deletes the older ones.
+
+    The scripts are each in a directory of their own, so they look for this file in the top directory of
+    the repository (or next to the script).
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Pre-processing", "Preprocessing_Scripts"))
+try:
+    import binaryCorpus
+except ImportError:  # e.g., a copy of this file next to a script, without the preprocessing scripts
+    binaryCorpus = None
+
+# "constants"
+STOP_WORD_FILE_NAME = "stop_words.txt"
+CACHE_DIRECTORY = "corpus_cache"  # None to not cache the documents
+CACHE_SETTINGS = "filtered documents 1"  # changed whenever the documents are filtered differently
+VECTORIZED_CACHE_SETTINGS = "vectorized documents 1"  # changed whenever the vectorization is cached differently
+
+HASH_CHUNK_BYTES = 1 << 20  # also the bytes read at a time when counting the lines of a file
+
+
+def loadStopWords(stopWordFileName=STOP_WORD_FILE_NAME):
+    """ Returns the set of the lower case stop words in stopWordFileName, one per line. """
+    stopFile = open(stopWordFileName, 'r')
+    stoplist = set(line.strip().lower() for line in stopFile)
+    stopFile.close()
+    return stoplist
+
+def loadCorpus(corpusName, stopWordFileName=STOP_WORD_FILE_NAME, cacheDirectory=CACHE_DIRECTORY):
+    """ Returns [documents, docIndexToIndexInCSVDict] of the corpus corpusName, e.g., "wholeChatsFilePOS_N_ADJ"
+        for wholeChatsFilePOS_N_ADJ.csv, without the words in stopWordFileName. """
+    corpusFileName = corpusName + ".csv"
+    if cacheDirectory is None:
+        documents, csvLineIndexes = filterCorpus(corpusFileName, stopWordFileName)
+        return [documents, dict(enumerate(csvLineIndexes))]
+
+    cacheFileName = os.path.join(cacheDirectory, corpusName + ".pickle")
+    fileNames = [corpusFileName, stopWordFileName]
+    fileStats = [fileStat(fileName) for fileName in fileNames]
+    cached = readCache(cacheFileName)
+    if cached is not None and cached["settings"] == CACHE_SETTINGS and cached["files"] == fileStats:
+        print("Corpus", corpusFileName, "loaded from", cacheFileName)
+    else:
+        fileHashes = [fileHash(fileName) for fileName in fileNames]
+        if cached is None or cached["settings"] != CACHE_SETTINGS or cached["hashes"] != fileHashes:
+            documents, csvLineIndexes = filterCorpus(corpusFileName, stopWordFileName)
+            cached = {"settings": CACHE_SETTINGS, "hashes": fileHashes,
+                      "documents": documents, "csvLineIndexes": csvLineIndexes}
+            print("Corpus", corpusFileName, "filtered and cached in", cacheFileName)
+        else:  # e.g., a copied or touched file with the same contents
+            print("Corpus", corpusFileName, "loaded from", cacheFileName)
+        cached["files"] = fileStats
+        writeCache(cacheFileName, cached)
+    return [cached["documents"], dict(enumerate(cached["csvLineIndexes"]))]
+
+def filterCorpus(corpusFileName, stopWordFileName):
+    """ Returns [documents, chat line # in the original .csv file of each document] of corpusFileName, read
+        from its binary corpus if it is up to date. """
+    stoplist = loadStopWords(stopWordFileName)
+    binaryCorpusName = os.path.splitext(corpusFileName)[0]
+    if binaryCorpusIsCurrent(binaryCorpusName, corpusFileName):
+        print("Corpus", corpusFileName, "read from its binary corpus")
+        return filterBinaryCorpus(binaryCorpusName, stoplist)
+    documents = []
+    csvLineIndexes = []
+    documentsFile = open(corpusFileName, 'r')
+    for line in documentsFile:
+        docLineSplit = line.split(",", 2)
+        words = [word for word in docLineSplit[1].split() if word not in stoplist]
+        if len(words) > 0:
+            documents.append(" ".join(words) + " ")
+            csvLineIndexes.append(int(docLineSplit[0].strip()))
+    documentsFile.close()
+    return [documents, csvLineIndexes]
+
+def binaryCorpusIsCurrent(binaryCorpusName, corpusFileName):
+    """ Returns True if the files of the binary corpus binaryCorpusName all exist, none was written before
+        corpusFileName and it has as many documents as corpusFileName has lines, e.g., not if a
+        preprocessing script rewrote the .csv file without it. """
+    if binaryCorpus is None:
+        return False
+    binaryFileNames = binaryCorpus.corpusFileNames(binaryCorpusName)
+    if not all(os.path.exists(fileName) for fileName in binaryFileNames):
+        return False
+    corpusModified = os.stat(corpusFileName).st_mtime_ns
+    if any(os.stat(fileName).st_mtime_ns < corpusModified for fileName in binaryFileNames):
+        return False
+    documentCount = os.path.getsize(binaryCorpusName + binaryCorpus.CSV_LINE_INDEX_SUFFIX) // 4
+    return documentCount == countLines(corpusFileName)
+
+def filterBinaryCorpus(binaryCorpusName, stoplist):
+    """ Returns [documents, chat line # in the original .csv file of each document] of the binary corpus
+        binaryCorpusName, the same as filterCorpus returns for its .csv file. """
+    vocabulary, tokenIds, docOffsets, csvLineIndex = binaryCorpus.loadBinaryCorpus(binaryCorpusName)
+    keptWords = [None if word in stoplist else word + " " for word in vocabulary]
+    docWords = [keptWords[tokenId] for tokenId in tokenIds.tolist()]
+    docOffsets = docOffsets.tolist()
+    documents = []
+    csvLineIndexes = []
+    for doc, csvLineIndexOfDoc in enumerate(csvLineIndex.tolist()):
+        words = [word for word in docWords[docOffsets[doc]:docOffsets[doc + 1]] if word is not None]
+        if len(words) > 0:
+            documents.append("".join(words))
+            csvLineIndexes.append(csvLineIndexOfDoc)
+    return [documents, csvLineIndexes]
+
+def loadVectorized(corpusName, vectorizer, documents, cacheDirectory=CACHE_DIRECTORY):
+    """ Returns [matrix, featureNames] where matrix is vectorizer.fit_transform(documents), the sparse
+        document-term matrix of the documents of the corpus corpusName, and featureNames the words (or
+        n-grams) of its columns.  They are cached in cacheDirectory for the documents and the class and
+        parameters of vectorizer, which is only fitted if they are not cached yet. """
+    from scipy import sparse  # only needed by the scripts vectorizing the corpus
+
+    if cacheDirectory is None:
+        return fitVectorizer(vectorizer, documents)
+    settings = vectorizerSettings(vectorizer)
+    key = hashlib.sha256((settings + "\n" + "\n".join(documents)).encode('utf-8')).hexdigest()
+    cacheFileName = os.path.join(cacheDirectory, corpusName + "_" + type(vectorizer).__name__ + "_" + key)
+    try:
+        matrix = sparse.load_npz(cacheFileName + ".npz")
+    except FileNotFoundError:
+        matrix = None
+    if matrix is not None:  # the vocabulary file is written before the matrix file
+        vocabularyFile = open(cacheFileName + "_vocab.txt", 'r', encoding='utf-8')
+        featureNames = [featureName.rstrip("\n") for featureName in vocabularyFile]
+        vocabularyFile.close()
+        print("Vectorized corpus", corpusName, "loaded from", cacheFileName + ".npz")
+        return [matrix, featureNames]
+
+    matrix, featureNames = fitVectorizer(vectorizer, documents)
+    os.makedirs(cacheDirectory, exist_ok=True)
+    tempFileName = cacheFileName + "_vocab.%d.tmp" % os.getpid()
+    vocabularyFile = open(tempFileName, 'w', encoding='utf-8')
+    vocabularyFile.write("".join(featureName + "\n" for featureName in featureNames))
+    vocabularyFile.close()
+    os.replace(tempFileName, cacheFileName + "_vocab.txt")
+    tempFileName = cacheFileName + ".%d.tmp.npz" % os.getpid()
+    sparse.save_npz(tempFileName, matrix)
+    os.replace(tempFileName, cacheFileName + ".npz")
+    print("Vectorized corpus", corpusName, "cached in", cacheFileName + ".npz")
+    removeOlderVectorized(cacheDirectory, corpusName + "_" + type(vectorizer).__name__ + "_", key)
+    return [matrix, featureNames]
+
+def removeOlderVectorized(cacheDirectory, prefix, key):
+    """ Deletes the .npz and vocabulary files of the vectorizations cached in cacheDirectory under prefix,
+        i.e., of the same corpus and vectorizer class, other than the one of key. """
+    for fileName in os.listdir(cacheDirectory):
+        if not fileName.startswith(prefix):
+            continue
+        for suffix in [".npz", "_vocab.txt"]:
+            otherKey = fileName[len(prefix):-len(suffix)]
+            if fileName.endswith(suffix) and otherKey != key and len(otherKey) == len(key) and \
+                    all(character in "0123456789abcdef" for character in otherKey):
+                try:
+                    os.remove(os.path.join(cacheDirectory, fileName))
+                except FileNotFoundError:  # e.g., removed by another run at the same time
+                    pass
+
+def fitVectorizer(vectorizer, documents):
+    """ Returns [vectorizer.fit_transform(documents), the feature names of vectorizer]. """
+    matrix = vectorizer.fit_transform(documents)
+    if hasattr(vectorizer, "get_feature_names_out"):  # scikit-learn 1.0 and later
+        featureNames = vectorizer.get_feature_names_out()
+    else:
+        featureNames = vectorizer.get_feature_names()
+    return [matrix, [str(featureName) for featureName in featureNames]]
+
+def vectorizerSettings(vectorizer):
+    """ Returns a string of everything about vectorizer that affects its fit:  its class, parameters and
+        scikit-learn version. """
+    import sklearn
+
+    parameters = sorted(vectorizer.get_params().items())
+    return " ".join([VECTORIZED_CACHE_SETTINGS, type(vectorizer).__name__, sklearn.__version__, repr(parameters)])
+
+def fileStat(fileName):
+    """ Returns [modification time in ns, size] of fileName. """
+    stat = os.stat(fileName)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def countLines(fileName):
+    """ Returns the number of lines of fileName. """
+    lineCount = 0
+    countedFile = open(fileName, 'rb')
+    for chunk in iter(lambda: countedFile.read(HASH_CHUNK_BYTES), b""):
+        lineCount += chunk.count(b"\n")
+    countedFile.close()
+    return lineCount
+
+def fileHash(fileName):
+    """ Returns the SHA-256 hash of the contents of fileName. """
+    fileHasher = hashlib.sha256()
+    hashedFile = open(fileName, 'rb')
+    for chunk in iter(lambda: hashedFile.read(HASH_CHUNK_BYTES), b""):
+        fileHasher.update(chunk)
+    hashedFile.close()
+    return fileHasher.hexdigest()
+
+def readCache(cacheFileName):
+    """ Returns the cache entry stored in cacheFileName, or None if there is none. """
+    try:
+        cacheFile = open(cacheFileName, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        return pickle.load(cacheFile)
+    except (pickle.UnpicklingError, EOFError):  # e.g., a cache file left half written
+        return None
+    finally:
+        cacheFile.close()
+
+def writeCache(cacheFileName, cached):
+    """ Stores the cache entry cached in cacheFileName, written to a temporary file and renamed so a
+        script loading the corpus at the same time never reads it half written. """
+    os.makedirs(os.path.dirname(cacheFileName), exist_ok=True)
+    tempFileName = cacheFileName + ".%d.tmp" % os.getpid()
+    cacheFile = open(tempFileName, 'wb')
+    pickle.dump(cached, cacheFile, protocol=pickle.HIGHEST_PROTOCOL)
+    cacheFile.close()
+    os.replace(tempFileName, cacheFileName)